@@ -0,0 +1,345 @@
+"""
+Модуль хранимого в памяти каталога задач.
+
+Весь каталог Codeforces помещается в память, поэтому выбор случайных задач по
+тегу и диапазону рейтинга можно выполнять без обращения к базе данных: для
+каждого тега хранится список задач, упорядоченный по рейтингу, и диапазон
+находится двоичным поиском. Так же, по очкам, упорядочен второй список задач
+каждого тега для выбора по диапазону очков.
+
+Для выражений над несколькими тегами и для исключения уже показанных
+пользователю задач используются битовые множества (целые числа Python) над
+идентификаторами задач: для каждого тега и для каждого префикса значений
+рейтинга. Выражение, диапазон рейтинга и исключение вычисляются несколькими
+побитовыми операциями над машинными словами, после чего из результата
+выбираются случайные установленные биты.
+
+Идентификаторы задач сохраняются при инкрементальном обновлении каталога;
+полная перезагрузка может их переназначить, поэтому хранимые битовые
+множества задач помечаются поколением каталога (см. app.generation).
+
+Этот модуль отвечает за:
+1. Загрузку каталога из базы данных
+2. Выбор случайных задач по тегу и диапазону рейтинга или очков
+3. Выбор случайных задач по выражению над тегами
+4. Исключение заданного множества задач при выборе
+"""
+
+import logging
+import random
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Problem, Tag, problem_tags
+from app.refresh import on_catalog_refresh
+from app.tag_query import Node, evaluate_bitset
+from constants import CATALOG_ENGINE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _sample_bits(bits: int, limit: int) -> List[int]:
+    """
+    Выбирает до limit случайных установленных битов.
+
+    Если установленных битов много больше limit, используется выборка с
+    отклонением по отрезку от младшего до старшего установленного бита
+    (ожидаемое число попыток limit * длина / count мало по сравнению с числом
+    байтов отрезка), иначе — перечисление установленных битов по байтам.
+
+    Args:
+        bits (int): Битовое множество
+        limit (int): Максимальное количество номеров
+
+    Returns:
+        List[int]: Номера установленных битов
+    """
+    count = bits.bit_count()
+    if count == 0 or limit <= 0:
+        return []
+    start, end = (bits & -bits).bit_length() - 1, bits.bit_length()
+    data = bits.to_bytes((end + 7) // 8, 'little')
+    if count >= 64 * limit:
+        chosen = set()
+        while len(chosen) < limit:
+            position = random.randrange(start, end)
+            if data[position >> 3] >> (position & 7) & 1:
+                chosen.add(position)
+        return list(chosen)
+    positions = [
+        (offset << 3) + bit
+        for offset in range(start >> 3, len(data)) if data[offset]
+        for bit in _BYTE_BITS[data[offset]]
+    ]
+    return random.sample(positions, min(limit, count))
+
+
+class CatalogEngine:
+    """
+    Каталог задач в памяти.
+
+    Attributes:
+        enabled (bool): Разрешено ли отвечать на запросы из памяти
+        loaded (bool): Загружен ли каталог
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Инициализация каталога.
+
+        Args:
+            enabled (bool): Разрешено ли отвечать на запросы из памяти
+        """
+        self.enabled = enabled
+        self.loaded = False
+        # Для каждого тега: отсортированные рейтинги и задачи в том же порядке
+        self._by_tag: Dict[str, Tuple[List[int], List[Problem]]] = {}
+        # Для каждого тега: отсортированные очки и задачи с очками в том же порядке
+        self._by_tag_points: Dict[str, Tuple[List[float], List[Problem]]] = {}
+        # Задачи с рейтингом по идентификатору
+        self._by_id: List[Optional[Problem]] = []
+        # Различные значения рейтинга по возрастанию и для каждого — битовое
+        # множество задач с рейтингом не больше него
+        self._ratings: List[int] = []
+        self._rating_prefixes: List[int] = []
+        # Битовое множество идентификаторов задач для каждого тега
+        self._bitsets: Dict[str, int] = {}
+
+    @property
+    def ready(self) -> bool:
+        """
+        Может ли каталог отвечать на запросы.
+        """
+        return self.enabled and self.loaded
+
+    def build(self, problems: Iterable[Problem], tags_by_problem: Dict[int, List[str]]) -> None:
+        """
+        Строит индексы каталога и атомарно заменяет ими текущие.
+
+        Задачи без рейтинга попадают только в индекс по очкам, задачи без
+        очков — только в индексы по рейтингу.
+
+        Args:
+            problems (Iterable[Problem]): Задачи каталога
+            tags_by_problem (Dict[int, List[str]]): Названия тегов по идентификатору задачи
+        """
+        problems = list(problems)
+        rated = sorted((problem for problem in problems if problem.rating is not None), key=lambda problem: problem.rating)
+        by_id: List[Optional[Problem]] = [None] * (max((problem.id for problem in rated), default=0) + 1)
+        grouped: Dict[str, List[Problem]] = {}
+        ids: Dict[str, bytearray] = {}
+        rating_ids: Dict[int, bytearray] = {}
+        size = (len(by_id) + 7) // 8
+        for problem in rated:
+            by_id[problem.id] = problem
+            byte, bit = problem.id >> 3, 1 << (problem.id & 7)
+            rating_ids.setdefault(problem.rating, bytearray(size))[byte] |= bit
+            for tag_name in tags_by_problem.get(problem.id, ()):
+                grouped.setdefault(tag_name, []).append(problem)
+                ids.setdefault(tag_name, bytearray(size))[byte] |= bit
+
+        scored = sorted((problem for problem in problems if problem.points is not None), key=lambda problem: problem.points)
+        grouped_points: Dict[str, List[Problem]] = {}
+        for problem in scored:
+            for tag_name in tags_by_problem.get(problem.id, ()):
+                grouped_points.setdefault(tag_name, []).append(problem)
+
+        prefix = 0
+        prefixes = []
+        for rating in sorted(rating_ids):
+            prefix |= int.from_bytes(rating_ids[rating], 'little')
+            prefixes.append(prefix)
+
+        self._by_tag = {
+            tag_name: ([problem.rating for problem in tagged], tagged)
+            for tag_name, tagged in grouped.items()
+        }
+        self._by_tag_points = {
+            tag_name: ([problem.points for problem in tagged], tagged)
+            for tag_name, tagged in grouped_points.items()
+        }
+        self._by_id = by_id
+        self._ratings = sorted(rating_ids)
+        self._rating_prefixes = prefixes
+        self._bitsets = {tag_name: int.from_bytes(data, 'little') for tag_name, data in ids.items()}
+        self.loaded = True
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Загружает каталог из базы данных.
+
+        Args:
+            session (AsyncSession): Асинхронная сессия SQLAlchemy
+        """
+        problems = (await session.execute(select(Problem))).scalars().all()
+        tags_by_problem: Dict[int, List[str]] = {}
+        links = await session.execute(
+            select(problem_tags.c.problem_id, Tag.name).join(Tag, Tag.id == problem_tags.c.tag_id)
+        )
+        for problem_id, tag_name in links:
+            tags_by_problem.setdefault(problem_id, []).append(tag_name)
+        session.expunge_all()
+
+        self.build(problems, tags_by_problem)
+        logger.info("Каталог загружен в память: %d задач, %d тегов", len(problems), len(self._by_tag))
+
+    def _rating_mask(self, min_rating: int, max_rating: Optional[int]) -> int:
+        """
+        Возвращает битовое множество задач с рейтингом из диапазона.
+        """
+        low = bisect_left(self._ratings, min_rating)
+        high = len(self._ratings) if max_rating is None else bisect_right(self._ratings, max_rating)
+        if low >= high:
+            return 0
+        # Префиксы вложены друг в друга, поэтому разность — исключающее ИЛИ
+        return self._rating_prefixes[high - 1] ^ (self._rating_prefixes[low - 1] if low else 0)
+
+    def _pick_bits(self, pool: int, exclude: int, limit: int) -> List[Problem]:
+        """
+        Выбирает до limit случайных задач из битового множества, сначала не из exclude.
+
+        Если задач вне exclude меньше limit, недостающие выбираются из exclude,
+        чтобы пользователь, которому показаны все подходящие задачи, снова их получал.
+        """
+        fresh = pool & ~exclude
+        chosen = _sample_bits(fresh, limit)
+        if len(chosen) < limit and fresh != pool:
+            chosen += _sample_bits(pool & exclude, limit - len(chosen))
+        return [self._by_id[i] for i in chosen]
+
+    def pick(
+            self,
+            tag_name: str,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Выбирает случайные задачи по тегу и диапазону рейтинга.
+
+        Args:
+            tag_name (str): Название тега
+            min_rating (int): Минимальный рейтинг задачи
+            max_rating (Optional[int]): Максимальный рейтинг задачи
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        entry = self._by_tag.get(tag_name)
+        if entry is None:
+            return []
+        keys, problems = entry
+        start = bisect_left(keys, min_rating)
+        end = len(keys) if max_rating is None else bisect_right(keys, max_rating)
+        if start >= end:
+            return []
+        if exclude and end - start > limit:
+            picked = self._pick_fresh(problems, start, end, exclude, limit)
+            if picked is not None:
+                return picked
+            return self._pick_bits(
+                self._bitsets.get(tag_name, 0) & self._rating_mask(min_rating, max_rating), exclude, limit
+            )
+        return [problems[i] for i in random.sample(range(start, end), min(limit, end - start))]
+
+    def pick_points(
+            self,
+            tag_name: str,
+            min_points: float,
+            max_points: Optional[float] = None,
+            limit: int = 10
+    ) -> List[Problem]:
+        """
+        Выбирает случайные задачи по тегу и диапазону очков.
+
+        Args:
+            tag_name (str): Название тега
+            min_points (float): Минимальное количество очков
+            max_points (Optional[float]): Максимальное количество очков
+            limit (int): Максимальное количество задач
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        keys, problems = self._by_tag_points.get(tag_name, ([], []))
+        start = bisect_left(keys, min_points)
+        end = len(keys) if max_points is None else bisect_right(keys, max_points)
+        if start >= end:
+            return []
+        return [problems[i] for i in random.sample(range(start, end), min(limit, end - start))]
+
+    @staticmethod
+    def _pick_fresh(problems: List[Problem], start: int, end: int, exclude: int, limit: int) -> Optional[List[Problem]]:
+        """
+        Выбирает limit задач среза problems[start:end] не из exclude выборкой с отклонением.
+
+        Обычно показанные задачи — малая доля диапазона, и отклонение дешевле
+        перечисления битового множества. Если за ограниченное число попыток
+        задачи не набраны, возвращает None.
+        """
+        chosen: List[Problem] = []
+        tried = set()
+        for _ in range(4 * limit):
+            i = random.randrange(start, end)
+            if i in tried:
+                continue
+            tried.add(i)
+            if not exclude >> problems[i].id & 1:
+                chosen.append(problems[i])
+                if len(chosen) == limit:
+                    return chosen
+        return None
+
+    def pick_expression(
+            self,
+            expression: Node,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Выбирает случайные задачи по выражению над тегами и диапазону рейтинга.
+
+        Args:
+            expression (Node): Дерево выражения из parse_tag_expression
+            min_rating (int): Минимальный рейтинг задачи
+            max_rating (Optional[int]): Максимальный рейтинг задачи
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        range_mask = self._rating_mask(min_rating, max_rating)
+        if not range_mask:
+            return []
+        return self._pick_bits(evaluate_bitset(expression, self._bitsets, range_mask) & range_mask, exclude, limit)
+
+
+# Общий экземпляр каталога приложения
+catalog = CatalogEngine(enabled=CATALOG_ENGINE_ENABLED)
+
+
+@on_catalog_refresh
+async def reload_catalog() -> None:
+    """
+    Перезагружает каталог из базы данных, если он включён.
+    """
+    if not catalog.enabled:
+        return
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await catalog.load(session)
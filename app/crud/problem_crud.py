@@ -8,8 +8,11 @@ from typing import List, Optional, Type
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.catalog import catalog
 from app.models import Problem
+from app.search import name_index
 from app.service.problem_service import ProblemService
+from app.tag_query import Node
 
 
 class ProblemCRUD:
@@ -37,7 +40,8 @@ class ProblemCRUD:
             category: str,
             points: Optional[float] = None,
             solved_count: int = 0,
-            tags: List[str] = None
+            tags: List[str] = None,
+            rating: Optional[int] = None
     ) -> Problem:
         """
         Создание новой задачи.
@@ -50,6 +54,7 @@ class ProblemCRUD:
             points (Optional[float]): Количество очков
             solved_count (int): Количество решений
             tags (List[str]): Список тегов
+            rating (Optional[int]): Рейтинг задачи
         
         Returns:
             Problem: Созданная задача
@@ -61,7 +66,8 @@ class ProblemCRUD:
             category=category,
             points=points,
             solved_count=solved_count,
-            tags=tags
+            tags=tags,
+            rating=rating
         )
 
     async def get(self, contest_id: int, index: str) -> Optional[Problem]:
@@ -98,6 +104,24 @@ class ProblemCRUD:
         """
         return await self.session.get_by_tag(tag_name)
 
+    async def search_by_name(self, query: str, limit: int = 10) -> List[Problem]:
+        """
+        Поиск задач по названию.
+
+        Если индекс названий построен, выполняется нечёткий поиск по триграммам
+        без обращения к базе данных, иначе — поиск подстроки в базе.
+
+        Args:
+            query (str): Текст запроса
+            limit (int): Максимальное количество задач
+
+        Returns:
+            List[Problem]: Найденные задачи, самые похожие первыми
+        """
+        if name_index.ready:
+            return name_index.search(query, limit)
+        return await self.session.search_by_name(query, limit)
+
     async def get_random_by_tag_and_points_range(
             self,
             tag_name: str,
@@ -106,17 +130,84 @@ class ProblemCRUD:
             limit: int = 10
     ) -> List[Problem]:
         """
-        Получение случайных задач по тегу и диапазону сложности.
-        
+        Получение случайных задач по тегу и диапазону очков.
+
+        Если каталог в памяти включён и загружен, задачи выбираются из него
+        без обращения к базе данных.
+
         Args:
             tag_name (str): Название тега
-            min_points (float): Минимальная сложность
-            max_points (Optional[float]): Максимальная сложность
+            min_points (float): Минимальное количество очков
+            max_points (Optional[float]): Максимальное количество очков
             limit (int): Максимальное количество задач
         
         Returns:
             List[Problem]: Список случайных задач
         """
+        if catalog.ready:
+            return catalog.pick_points(tag_name, min_points, max_points, limit)
         return await self.session.get_random_by_tag_and_points_range(
             tag_name, min_points, max_points, limit
         )
+
+    async def get_random_by_tag_and_rating_range(
+            self,
+            tag_name: str,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Получение случайных задач по тегу и диапазону рейтинга.
+
+        Если каталог в памяти включён и загружен, задачи выбираются из него
+        без обращения к базе данных.
+
+        Args:
+            tag_name (str): Название тега
+            min_rating (int): Минимальный рейтинг
+            max_rating (Optional[int]): Максимальный рейтинг
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных (например, уже показанные пользователю)
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        if catalog.ready:
+            return catalog.pick(tag_name, min_rating, max_rating, limit, exclude)
+        return await self.session.get_random_by_tag_and_rating_range(
+            tag_name, min_rating, max_rating, limit, exclude
+        )
+
+    async def get_random_by_tag_expression(
+            self,
+            expression: Node,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Получение случайных задач по выражению над тегами и диапазону рейтинга.
+
+        Если каталог в памяти включён и загружен, выражение вычисляется над
+        битовыми множествами тегов без обращения к базе данных.
+
+        Args:
+            expression (Node): Дерево выражения из parse_tag_expression
+            min_rating (int): Минимальный рейтинг
+            max_rating (Optional[int]): Максимальный рейтинг
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных (например, уже показанные пользователю)
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        if catalog.ready:
+            return catalog.pick_expression(expression, min_rating, max_rating, limit, exclude)
+        return await self.session.get_random_by_tag_expression(
+            expression, min_rating, max_rating, limit, exclude
+        )
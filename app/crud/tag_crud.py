@@ -4,7 +4,7 @@
 Этот модуль предоставляет интерфейс для работы с тегами в базе данных через слой сервисов.
 """
 
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -73,3 +73,12 @@ class TagCRUD:
             List[Tag]: Список всех тегов
         """
         return await self.service.get_all()
+
+    async def get_problem_counts(self) -> List[Tuple[str, int]]:
+        """
+        Получение тегов с количеством задач.
+
+        Returns:
+            List[Tuple[str, int]]: Пары (название тега, количество задач) по убыванию количества
+        """
+        return await self.service.get_problem_counts()
@@ -2,24 +2,167 @@
 Модуль настройки и инициализации базы данных.
 
 Этот модуль отвечает за:
-1. Создание асинхронного движка SQLAlchemy
+1. Создание асинхронного движка SQLAlchemy с настройками пула и кэша
+   подготовленных запросов из профиля запуска
 2. Настройку фабрики сессий для работы с базой данных
+3. Подключение метрик SQL-запросов и ожидания соединения из пула
+4. Построение INSERT ... ON CONFLICT для диалекта базы данных
+
+Движок приложения создаётся при первом обращении (get_engine или первая
+сессия AsyncSessionLocal), поэтому импорт модуля не загружает драйвер
+базы данных и не создаёт пул соединений.
+
+SQL-запросы записываются в журнал через логгер sqlalchemy.engine (см.
+app.logging_config), а не через echo движка, поэтому в профиле production
+они не форматируются вовсе.
 """
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Any, Dict, Union
+from uuid import uuid4
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from constants import DB_USER, PASSWORD, HOST, PORT, DATABASE
+from app.metrics import TimedQueuePool, instrument_engine
+from constants import (
+    DB_USER,
+    PASSWORD,
+    HOST,
+    PORT,
+    DATABASE,
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER,
+    DB_POOL_PRE_PING,
+    DB_POOL_SIZE,
+    DB_STATEMENT_CACHE_SIZE,
+    METRICS_ENABLED,
+)
 
 # Формирование URL для подключения к базе данных
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
 
-# Создание асинхронного движка SQLAlchemy
-engine = create_async_engine(DATABASE_URL, echo=True)
 
-# Создание фабрики асинхронных сессий
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
+def engine_options(
+        url: str = DATABASE_URL,
+        pool_size: int = DB_POOL_SIZE,
+        max_overflow: int = DB_MAX_OVERFLOW,
+        pool_pre_ping: bool = DB_POOL_PRE_PING,
+        statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+        pgbouncer: bool = DB_PGBOUNCER,
+        metrics: bool = METRICS_ENABLED
+) -> Dict[str, Any]:
+    """
+    Формирует параметры create_async_engine.
+
+    Args:
+        url (str): URL подключения к базе данных
+        pool_size (int): Количество постоянных соединений в пуле
+        max_overflow (int): Количество дополнительных соединений сверх пула
+        pool_pre_ping (bool): Проверять соединение перед выдачей из пула
+        statement_cache_size (int): Размер кэша подготовленных запросов asyncpg на соединение
+        pgbouncer (bool): Не кэшировать подготовленные запросы и давать им уникальные имена,
+            чтобы соединение можно было использовать через PgBouncer в режиме пулинга транзакций
+        metrics (bool): Замерять ожидание соединения из пула
+
+    Returns:
+        Dict[str, Any]: Именованные параметры create_async_engine
+    """
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        if pgbouncer:
+            connect_args = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        else:
+            connect_args = {
+                "statement_cache_size": statement_cache_size,
+                "prepared_statement_cache_size": statement_cache_size,
+            }
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_pre_ping": pool_pre_ping,
+        "connect_args": connect_args,
+    }
+    if metrics:
+        options["poolclass"] = TimedQueuePool
+    return options
+
+
+def build_engine(url: str = DATABASE_URL, **options: Any) -> AsyncEngine:
+    """
+    Создаёт асинхронный движок SQLAlchemy.
+
+    Args:
+        url (str): URL подключения к базе данных
+        **options (Any): Параметры engine_options; не переданные берутся из профиля запуска
+
+    Returns:
+        AsyncEngine: Асинхронный движок
+    """
+    options = engine_options(url, **options)
+    engine = create_async_engine(url, **options)
+    if options.get("poolclass") is TimedQueuePool:
+        instrument_engine(engine.sync_engine)
+    return engine
+
+
+class LazySessionmaker(sessionmaker):
+    """
+    Фабрика сессий, которая привязывается к движку приложения при создании первой сессии.
+
+    Если движок задан явно (параметром bind или через configure), используется он.
+    """
+
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+# Фабрика асинхронных сессий
+AsyncSessionLocal = LazySessionmaker(
     class_=AsyncSession,
     expire_on_commit=False
 )
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Возвращает асинхронный движок приложения, создавая его при первом вызове.
+
+    Движок приложения — тот, к которому привязана AsyncSessionLocal, поэтому
+    AsyncSessionLocal.configure(bind=...) в тестах и бенчмарках заменяет его
+    и для истории показанных задач и хранилища состояний.
+
+    Returns:
+        AsyncEngine: Асинхронный движок с параметрами профиля запуска
+    """
+    engine = AsyncSessionLocal.kw.get("bind")
+    if engine is None:
+        engine = build_engine()
+        AsyncSessionLocal.configure(bind=engine)
+    return engine
+
+
+def dialect_insert(bind: Union[AsyncEngine, AsyncConnection], target: Table):
+    """
+    Возвращает INSERT с поддержкой ON CONFLICT для диалекта базы данных.
+
+    Рабочая база — PostgreSQL, тесты и бенчмарки используют SQLite; у обоих
+    диалектов одинаковые on_conflict_do_update и on_conflict_do_nothing.
+
+    Args:
+        bind (Union[AsyncEngine, AsyncConnection]): Асинхронный движок или соединение
+        target (Table): Таблица
+
+    Returns:
+        Insert: INSERT диалекта postgresql или sqlite
+    """
+    dialect = postgresql if bind.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(target)
@@ -0,0 +1,175 @@
+"""
+Модуль асинхронной загрузки списка задач с Codeforces API.
+
+Ответ API сохраняется на диск в сжатом виде вместе с метаданными, что позволяет
+отправлять условные запросы (If-None-Match/If-Modified-Since) и пропускать
+обновление каталога, если данные не изменились.
+
+Загрузка выполняется в цикле событий бота, поэтому файлы снимка пишутся и
+читаются в потоках asyncio.to_thread: цикл событий не ждёт диск, а сжатие
+ответа при записи выполняется вне его.
+
+Этот модуль отвечает за:
+1. Условную загрузку problemset.problems через aiohttp
+2. Хранение последнего ответа API в сжатом файле
+3. Определение, требуется ли обновление каталога
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Адрес метода API со списком задач
+PROBLEMSET_URL = "https://codeforces.com/api/problemset.problems"
+# Размер фрагмента, которым читается и сохраняется ответ API
+CHUNK_SIZE = 64 * 1024
+# Ограничение времени загрузки ответа API, в секундах
+FETCH_TIMEOUT = 120
+
+
+class ProblemsetSnapshot:
+    """
+    Сохранённый на диске ответ problemset.problems.
+
+    Метаданные хранят ETag и Last-Modified последнего ответа, хэш его содержимого
+    и хэш содержимого, которое уже записано в базу данных.
+
+    Attributes:
+        path (Path): Путь к сжатому файлу с ответом API
+        meta_path (Path): Путь к файлу метаданных
+        meta (dict): Метаданные снимка
+    """
+
+    def __init__(self, directory: str, url: str = PROBLEMSET_URL):
+        """
+        Инициализация снимка.
+
+        Args:
+            directory (str): Каталог для хранения снимка
+            url (str): Адрес метода API
+        """
+        self.url = url
+        self.path = Path(directory) / "problemset.json.gz"
+        self.meta_path = Path(directory) / "problemset.meta.json"
+        self.meta = self._load_meta()
+
+    def _load_meta(self) -> dict:
+        try:
+            return json.loads(self.meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_meta(self) -> None:
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.meta))
+        os.replace(tmp_path, self.meta_path)
+
+    @property
+    def is_ingested(self) -> bool:
+        """
+        Записано ли содержимое текущего снимка в базу данных.
+        """
+        return self.path.exists() and self.meta.get("sha256") == self.meta.get("ingested_sha256")
+
+    def _conditional_headers(self) -> dict:
+        if not self.path.exists():
+            return {}
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    async def fetch(self, session: Optional[aiohttp.ClientSession] = None) -> bool:
+        """
+        Загружает ответ API, если он изменился с прошлого раза.
+
+        Args:
+            session (Optional[aiohttp.ClientSession]): HTTP-сессия; если не передана, создаётся временная
+
+        Returns:
+            bool: True, если снимок содержит данные, ещё не записанные в базу
+        """
+        if session is None:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)) as own_session:
+                return await self.fetch(own_session)
+
+        await asyncio.to_thread(self.path.parent.mkdir, parents=True, exist_ok=True)
+        async with session.get(self.url, headers=self._conditional_headers()) as response:
+            if response.status == 304:
+                logger.info("Список задач не изменился (304 Not Modified)")
+                return not self.is_ingested
+            if response.status != 200:
+                logger.error("Ошибка при загрузке данных: HTTP %d", response.status)
+                return False
+
+            digest = hashlib.sha256()
+            tmp_path = self.path.with_suffix(".tmp")
+            file = await asyncio.to_thread(gzip.open, tmp_path, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    digest.update(chunk)
+                    await asyncio.to_thread(file.write, chunk)
+            finally:
+                await asyncio.to_thread(file.close)
+            await asyncio.to_thread(os.replace, tmp_path, self.path)
+
+            self.meta.update(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                sha256=digest.hexdigest(),
+            )
+            await asyncio.to_thread(self._save_meta)
+
+        if self.is_ingested:
+            logger.info("Содержимое списка задач совпадает с записанным в базу")
+            return False
+        return True
+
+    async def chunks(self) -> Iterator[bytes]:
+        """
+        Читает снимок и возвращает его распакованное содержимое фрагментами.
+
+        Сжатый файл (несколько мегабайт) читается в потоке целиком, а
+        распаковывается по CHUNK_SIZE байт по мере перебора фрагментов, поэтому
+        распакованный ответ целиком в памяти не находится.
+
+        Returns:
+            Iterator[bytes]: Фрагменты ответа API
+        """
+        return _decompress(await asyncio.to_thread(self.path.read_bytes))
+
+    async def mark_ingested(self) -> None:
+        """
+        Отмечает содержимое снимка как записанное в базу данных.
+        """
+        self.meta["ingested_sha256"] = self.meta.get("sha256")
+        await asyncio.to_thread(self._save_meta)
+
+
+def _decompress(data: bytes) -> Iterator[bytes]:
+    """
+    Распаковывает содержимое gzip фрагментами не больше CHUNK_SIZE байт.
+
+    Raises:
+        EOFError: Если сжатые данные обрываются
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    while not decompressor.eof:
+        chunk = decompressor.decompress(data, CHUNK_SIZE)
+        data = decompressor.unconsumed_tail
+        if chunk:
+            yield chunk
+        elif not data:
+            raise EOFError("Снимок списка задач обрывается")
@@ -2,80 +2,202 @@
 Модуль для заполнения базы данных данными с Codeforces API.
 
 Этот модуль отвечает за:
-1. Получение данных о задачах с Codeforces API
-2. Создание и обновление таблиц в базе данных
-3. Заполнение базы данных информацией о задачах и тегах
+1. Разбор сохранённого ответа Codeforces API со списком задач
+2. Инкрементальное обновление изменившихся задач
+3. Полную загрузку каталога в теневые таблицы с атомарной подменой рабочих
+   и увеличением поколения каталога (см. app.generation)
+4. Метрики длительности этапов обновления и количества обработанных задач
+
+Обновление — корутина на асинхронном движке приложения: оно выполняется в
+цикле событий бота, без отдельного потока и синхронного драйвера базы данных.
 """
 
-import requests
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import get_engine
+from app.generation import bump_generation
+from app.ingest import apply_statistics, bulk_insert_problems, delta_sync_problems
+from app.metrics import FILL_DB_PHASE_SECONDS, FILL_DB_ROWS
+from app.models import Problem
+from app.problemset_stream import ProblemsetStream
+from app.shadow import (
+    SHADOW_TRANSLATE_MAP,
+    SWAP_ATTEMPTS,
+    SWAP_LOCK_TIMEOUT,
+    SWAP_RETRY_DELAY,
+    create_shadow_tables,
+    drop_stale_schemas,
+    is_lock_timeout,
+    swap_shadow_tables,
+)
+from constants import FILL_DB_MODE
+
+logger = logging.getLogger(__name__)
+
+
+def _delta_supported(connection: Connection) -> bool:
+    """
+    Проверяет, что рабочие таблицы существуют, содержат все столбцы модели
+    и имеют уникальный ключ (contest_id, index).
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy (через AsyncConnection.run_sync)
+
+    Returns:
+        bool: True, если возможно инкрементальное обновление
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table(Problem.__tablename__):
+        return False
+    columns = {column['name'] for column in inspector.get_columns(Problem.__tablename__)}
+    if not columns.issuperset(Problem.__table__.columns.keys()):
+        return False
+    return any(
+        index['name'] == 'uq_problems_contest_id_index'
+        for index in inspector.get_indexes(Problem.__tablename__)
+    )
+
+
+async def _delta_refresh(stream: ProblemsetStream, bind: AsyncEngine) -> None:
+    """
+    Инкрементально обновляет рабочие таблицы в одной транзакции.
+
+    Args:
+        stream (ProblemsetStream): Потоковый разборщик ответа API
+        bind (AsyncEngine): Асинхронный движок SQLAlchemy
+    """
+    started = time.perf_counter()
+    async with bind.begin() as connection:
+        report = await delta_sync_problems(connection, stream.problems(), stream.statistics())
+    elapsed = time.perf_counter() - started
+
+    FILL_DB_PHASE_SECONDS.observe(elapsed, "delta")
+    FILL_DB_ROWS.inc(report.inserted, "inserted")
+    FILL_DB_ROWS.inc(report.updated, "updated")
+    FILL_DB_ROWS.inc(report.unchanged, "unchanged")
+
+    logger.info(
+        "Инкрементальное обновление завершено за %.2f с: добавлено %d, изменено %d, без изменений %d",
+        elapsed, report.inserted, report.updated, report.unchanged
+    )
+
+
+async def _swap(bind: AsyncEngine) -> bool:
+    """
+    Подменяет рабочие таблицы теневыми и увеличивает поколение каталога,
+    повторяя подмену, прерванную по lock_timeout.
 
-from app.models import Base, Problem, Tag
-from constants import DB_USER, PASSWORD, HOST, PORT, DATABASE
+    Args:
+        bind (AsyncEngine): Асинхронный движок SQLAlchemy
 
-# URL для подключения к базе данных
-DATABASE_URL = f"postgresql://{DB_USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+    Returns:
+        bool: True, если таблицы подменены
+    """
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            async with bind.begin() as connection:
+                swapped = await connection.run_sync(swap_shadow_tables)
+                if swapped:
+                    # Новые идентификаторы задач и новое поколение видны одновременно
+                    await connection.run_sync(bump_generation)
+                return swapped
+        except DBAPIError as error:
+            if not is_lock_timeout(error):
+                raise
+            logger.warning(
+                "Подмена таблиц каталога не дождалась блокировок за %s (попытка %d из %d)",
+                SWAP_LOCK_TIMEOUT, attempt, SWAP_ATTEMPTS
+            )
+        if attempt < SWAP_ATTEMPTS:
+            await asyncio.sleep(SWAP_RETRY_DELAY)
+    logger.error("Таблицы каталога не подменены: блокировки заняты, каталог обновится при следующем запуске")
+    return False
 
-# Создание синхронного движка SQLAlchemy
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
 
+async def _full_refresh(stream: ProblemsetStream, bind: AsyncEngine) -> bool:
+    """
+    Загружает каталог в теневые таблицы и подменяет ими рабочие.
 
-def fill_db_sync():
+    Args:
+        stream (ProblemsetStream): Потоковый разборщик ответа API
+        bind (AsyncEngine): Асинхронный движок SQLAlchemy
+
+    Returns:
+        bool: True, если рабочие таблицы подменены
     """
-    Синхронная функция для заполнения базы данных.
-    
+    with FILL_DB_PHASE_SECONDS.time("create_shadow"):
+        async with bind.begin() as connection:
+            await connection.run_sync(create_shadow_tables)
+
+    started = time.perf_counter()
+    async with bind.begin() as connection:
+        shadow = await connection.execution_options(schema_translate_map=SHADOW_TRANSLATE_MAP)
+        count = await bulk_insert_problems(shadow, stream.problems())
+        await apply_statistics(shadow, stream.statistics())
+    elapsed = time.perf_counter() - started
+
+    FILL_DB_PHASE_SECONDS.observe(elapsed, "load")
+    FILL_DB_ROWS.inc(count, "loaded")
+
+    logger.info(
+        "Загрузка каталога завершена: %d задач за %.2f с (%.0f строк/с)",
+        count, elapsed, count / elapsed if elapsed else 0.0
+    )
+
+    with FILL_DB_PHASE_SECONDS.time("swap"):
+        swapped = await _swap(bind)
+
+    with FILL_DB_PHASE_SECONDS.time("cleanup"):
+        async with bind.begin() as connection:
+            await connection.run_sync(drop_stale_schemas)
+
+    if swapped:
+        logger.info("Заполнение БД завершено.")
+    return swapped
+
+
+async def fill_db(chunks: Iterable[bytes], mode: str = FILL_DB_MODE, bind: Optional[AsyncEngine] = None) -> bool:
+    """
+    Заполнение базы данных в цикле событий бота.
+
     Процесс:
-    1. Удаляет все существующие таблицы
-    2. Создает новые таблицы
-    3. Получает данные о задачах с Codeforces API
-    4. Заполняет базу данных задачами и тегами
-    5. Связывает задачи с соответствующими тегами
+    1. Потоково разбирает ответ Codeforces API со списком задач
+    2. В режиме delta записывает только новые и изменённые задачи и связи с тегами
+    3. В режиме full (а также если рабочих таблиц ещё нет) загружает каталог
+       в теневые таблицы и в одной транзакции подменяет ими рабочие
+
+    Рабочие таблицы остаются доступными для чтения на всём протяжении
+    обновления, кроме короткой подмены таблиц при полной загрузке (не дольше
+    SWAP_LOCK_TIMEOUT, см. app.shadow), а запись уступает цикл событий между
+    пачками, поэтому обработчики бота в том же процессе продолжают отвечать.
+
+    Args:
+        chunks (Iterable[bytes]): Фрагменты ответа метода problemset.problems
+        mode (str): Режим обновления: delta или full
+        bind (Optional[AsyncEngine]): Асинхронный движок; по умолчанию — движок приложения
+
+    Returns:
+        bool: True, если каталог обновлён
     """
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    session = SessionLocal()
-
-    # Получение данных с Codeforces API
-    res = requests.get("https://codeforces.com/api/problemset.problems")
-    data = res.json()
-
-    if data['status'] != 'OK':
-        print("Ошибка при загрузке данных")
-        return
-
-    problems = data['result']['problems']
-    # Создание словаря статистики решений задач
-    stats = {(s['contestId'], s['index']): s['solvedCount'] for s in data['result']['problemStatistics']}
-
-    for problem in problems:
-        contest_id = problem['contestId']
-        index = problem['index']
-        solved_count = stats.get((contest_id, index), 0)
-        unique_tags = list(set(problem.get('tags', [])))
-
-        # Создание объекта задачи
-        db_problem = Problem(
-            contest_id=contest_id,
-            index=index,
-            name=problem['name'],
-            category=problem.get('type', 'unknown'),
-            points=problem.get('points'),
-            solved_count=solved_count
-        )
-        session.add(db_problem)
-        session.flush()
-
-        # Добавление тегов к задаче
-        for tag_name in unique_tags:
-            tag = session.query(Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                session.add(tag)
-                session.flush()
-            db_problem.tags.append(tag)
-
-    session.commit()
-    session.close()
-    print("Заполнение БД завершено.")
+    bind = bind or get_engine()
+    stream = ProblemsetStream(chunks)
+
+    if stream.status != 'OK':
+        logger.error("Ошибка при загрузке данных: %s", stream.comment)
+        return False
+
+    if mode == 'delta':
+        async with bind.connect() as connection:
+            supported = await connection.run_sync(_delta_supported)
+        if supported:
+            await _delta_refresh(stream, bind)
+            return True
+    return await _full_refresh(stream, bind)
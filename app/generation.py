@@ -0,0 +1,106 @@
+"""
+Модуль поколения каталога задач.
+
+Идентификаторы задач сохраняются при инкрементальном обновлении каталога, а
+полная перезагрузка через теневые таблицы может их переназначить. Поэтому
+каждая подмена рабочих таблиц теневыми в той же транзакции увеличивает
+поколение каталога в таблице catalog_generation. Хранимые битовые множества
+задач (истории показанных задач, решённые задачи) помечаются поколением, в
+котором записаны, и считаются пустыми в другом поколении.
+
+Поколение хранится в базе, поэтому одинаково во всех процессах бота и не
+зависит от того, загружен ли каталог в память.
+
+Этот модуль отвечает за:
+1. Чтение и увеличение поколения каталога в базе данных
+2. Хранение текущего поколения в памяти и его обновление после обновления каталога
+"""
+
+import logging
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models import GenerationRecord
+from app.refresh import on_catalog_refresh
+
+logger = logging.getLogger(__name__)
+
+# Номер единственной строки таблицы catalog_generation
+_ROW_ID = 1
+
+
+def read_generation(connection: Connection) -> int:
+    """
+    Возвращает текущее поколение каталога.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy
+
+    Returns:
+        int: Поколение каталога или 0, если каталог ещё не загружался целиком
+    """
+    return connection.scalar(select(GenerationRecord.generation).where(GenerationRecord.id == _ROW_ID)) or 0
+
+
+def bump_generation(connection: Connection) -> int:
+    """
+    Увеличивает поколение каталога.
+
+    Вызывается в транзакции, подменяющей таблицы каталога, чтобы новое
+    поколение стало видно одновременно с новыми идентификаторами задач.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy
+
+    Returns:
+        int: Новое поколение каталога
+    """
+    table = GenerationRecord.__table__
+    result = connection.execute(
+        update(table).where(table.c.id == _ROW_ID).values(generation=table.c.generation + 1)
+    )
+    if not result.rowcount:
+        connection.execute(table.insert().values(id=_ROW_ID, generation=1))
+    return read_generation(connection)
+
+
+class CatalogGeneration:
+    """
+    Текущее поколение каталога в памяти процесса.
+
+    Attributes:
+        value (int): Поколение каталога, прочитанное из базы при последнем обновлении
+    """
+
+    def __init__(self):
+        """
+        Инициализация поколения.
+        """
+        self.value = 0
+
+    async def load(self, connection: AsyncConnection) -> None:
+        """
+        Читает поколение каталога из базы данных.
+
+        Args:
+            connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        """
+        self.value = await connection.run_sync(read_generation)
+        logger.info("Поколение каталога: %d", self.value)
+
+
+# Общее поколение каталога приложения
+catalog_generation = CatalogGeneration()
+
+
+@on_catalog_refresh
+async def reload_generation() -> None:
+    """
+    Перечитывает поколение каталога из базы данных.
+    """
+    from app.database import get_engine
+
+    async with get_engine().connect() as connection:
+        await catalog_generation.load(connection)
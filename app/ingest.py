@@ -0,0 +1,465 @@
+"""
+Модуль пакетной записи каталога задач в базу данных.
+
+Задачи и статистика решений принимаются итераторами (например, из
+ProblemsetStream), поэтому каталог пишется пачками без загрузки ответа API
+в память целиком.
+
+Запись выполняется корутинами на асинхронном соединении, в том же цикле
+событий, что и обработчики бота. Разбор ответа и подготовка строк уступают
+цикл каждые YIELD_EVERY элементов, а ожидание базы не блокирует его вовсе,
+поэтому обновление каталога не задерживает ответы пользователям.
+
+С драйвером asyncpg задачи и связи с тегами загружаются двоичным COPY, а
+количество решений — COPY во временную таблицу и одним UPDATE ... FROM по
+ней; с другими драйверами (SQLite в тестах) — многострочными INSERT и UPDATE.
+
+Этот модуль отвечает за:
+1. Разрешение тегов через словарь name→id, загружаемый один раз
+2. Запись задач и связей задача–тег через COPY или многострочные INSERT
+3. Пакетное обновление количества решений через временную таблицу
+4. Инкрементальное обновление каталога по ключу (contest_id, index)
+"""
+
+import asyncio
+import random
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import Integer, String, bindparam, column, delete, func, insert, select, table, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import dialect_insert
+from app.models import Problem, Tag, problem_tags
+
+# Количество задач, записываемых одним COPY или многострочным INSERT
+BATCH_SIZE = 5000
+# Через сколько разобранных элементов запись уступает цикл событий другим задачам
+YIELD_EVERY = 500
+
+# Столбцы задачи, которые берутся из result.problems
+_PROBLEM_COLUMNS = ('name', 'category', 'points', 'rating')
+
+
+async def _batches(items: Iterable, size: int) -> AsyncIterator[List]:
+    """
+    Разбивает последовательность на списки длиной не более size.
+
+    Перебор элементов (например, потоковый разбор ответа API) занимает
+    процессор, поэтому каждые YIELD_EVERY элементов цикл событий отдаётся
+    другим задачам.
+
+    Args:
+        items (Iterable): Исходная последовательность
+        size (int): Размер пачки
+
+    Yields:
+        List: Очередная пачка элементов
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_supported(connection: AsyncConnection) -> bool:
+    """
+    Проверяет, можно ли загружать строки через COPY драйвера asyncpg.
+    """
+    return connection.dialect.driver == 'asyncpg'
+
+
+def _schema(connection: AsyncConnection) -> Optional[str]:
+    """
+    Возвращает схему таблиц каталога с учётом карты подмены схем соединения.
+    """
+    translate = connection.sync_connection.get_execution_options().get('schema_translate_map') or {}
+    return translate.get(None)
+
+
+async def _copy(connection: AsyncConnection, name: str, columns: Tuple[str, ...], records: List[tuple],
+                schema: Optional[str] = None) -> None:
+    """
+    Загружает строки в таблицу двоичным COPY в текущей транзакции соединения.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение с драйвером asyncpg
+        name (str): Имя таблицы
+        columns (Tuple[str, ...]): Столбцы в порядке значений строк
+        records (List[tuple]): Строки
+        schema (Optional[str]): Схема таблицы; по умолчанию — схема поиска соединения
+    """
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(name, records=records, columns=columns, schema_name=schema)
+
+
+async def load_tag_ids(connection: AsyncConnection) -> Dict[str, int]:
+    """
+    Загружает все существующие теги в словарь name→id одним запросом.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+
+    Returns:
+        Dict[str, int]: Соответствие названия тега его идентификатору
+    """
+    return dict((await connection.execute(select(Tag.name, Tag.id))).all())
+
+
+async def _ensure_tags(connection: AsyncConnection, tag_ids: Dict[str, int], names: Iterable[str]) -> None:
+    """
+    Добавляет в базу теги, которых ещё нет в tag_ids, и дополняет словарь.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        tag_ids (Dict[str, int]): Словарь name→id, обновляется на месте
+        names (Iterable[str]): Названия тегов очередной пачки задач
+    """
+    missing = sorted(set(names) - tag_ids.keys())
+    if not missing:
+        return
+    result = await connection.execute(
+        insert(Tag).returning(Tag.name, Tag.id, sort_by_parameter_order=True),
+        [{'name': name} for name in missing]
+    )
+    tag_ids.update(result.all())
+
+
+def _problem_row(problem: dict) -> dict:
+    """
+    Преобразует задачу из ответа API в строку таблицы problems.
+
+    Args:
+        problem (dict): Задача в формате ответа problemset.problems
+
+    Returns:
+        dict: Значения столбцов задачи
+    """
+    return {
+        'contest_id': problem['contestId'],
+        'index': problem['index'],
+        'name': problem['name'],
+        'category': problem.get('type', 'unknown'),
+        'points': problem.get('points'),
+        'rating': problem.get('rating'),
+    }
+
+
+# Столбцы задачи, загружаемые через COPY
+_COPY_COLUMNS = ('id', 'contest_id', 'index', 'name', 'category', 'points', 'rating', 'solved_count', 'random_key')
+
+
+async def _insert_batch(connection: AsyncConnection, rows: List[dict], next_id: Optional[int]) -> List[int]:
+    """
+    Записывает пачку задач и возвращает их идентификаторы в порядке строк.
+
+    Если next_id задан, идентификаторы назначаются подряд начиная с него и
+    задачи загружаются через COPY, иначе — INSERT ... RETURNING.
+    """
+    if next_id is None:
+        return (await connection.scalars(
+            insert(Problem).returning(Problem.id, sort_by_parameter_order=True), rows
+        )).all()
+
+    problem_ids = list(range(next_id, next_id + len(rows)))
+    await _copy(connection, Problem.__tablename__, _COPY_COLUMNS, [
+        (problem_id, row['contest_id'], row['index'], row['name'], row['category'], row['points'], row['rating'],
+         0, random.random())
+        for problem_id, row in zip(problem_ids, rows)
+    ], _schema(connection))
+    return problem_ids
+
+
+async def bulk_insert_problems(
+        connection: AsyncConnection,
+        problems: Iterable[dict],
+        batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Пакетная запись задач и связей задача–тег.
+
+    Теги разрешаются через словарь name→id, загруженный один раз, задачи и
+    строки problem_tags пишутся по batch_size задач: с asyncpg — двоичным
+    COPY с идентификаторами, назначенными после текущего максимального (после
+    загрузки последовательность идентификаторов сдвигается за них), с
+    другими драйверами — многострочными INSERT. Количество решений
+    записывается отдельно функцией apply_statistics.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        problems (Iterable[dict]): Задачи в формате ответа problemset.problems
+        batch_size (int): Количество задач в одной пачке
+
+    Returns:
+        int: Количество записанных задач
+    """
+    tag_ids = await load_tag_ids(connection)
+    copy = _copy_supported(connection)
+    next_id = (await connection.scalar(select(func.coalesce(func.max(Problem.id), 0)))) + 1 if copy else None
+    total = 0
+
+    async for batch in _batches(problems, batch_size):
+        batch_tags = [sorted(set(problem.get('tags', []))) for problem in batch]
+        await _ensure_tags(connection, tag_ids, (name for names in batch_tags for name in names))
+
+        problem_ids = await _insert_batch(connection, [_problem_row(problem) for problem in batch], next_id)
+        links = [(problem_id, tag_ids[name]) for problem_id, names in zip(problem_ids, batch_tags) for name in names]
+        if links and copy:
+            await _copy(connection, problem_tags.name, ('problem_id', 'tag_id'), links, _schema(connection))
+        elif links:
+            await connection.execute(
+                insert(problem_tags), [{'problem_id': problem_id, 'tag_id': tag_id} for problem_id, tag_id in links]
+            )
+        if next_id is not None:
+            next_id += len(batch)
+        total += len(batch)
+
+    if copy and total:
+        schema = _schema(connection) or 'public'
+        await connection.execute(
+            text("SELECT setval(pg_get_serial_sequence(:name, 'id'), :value)"),
+            {'name': f'{schema}.{Problem.__tablename__}', 'value': next_id - 1}
+        )
+    return total
+
+
+# Обновление количества решений задачи по ключу (contest_id, index)
+_update_solved_count = (
+    update(Problem.__table__)
+    .where(Problem.contest_id == bindparam('s_contest_id'), Problem.index == bindparam('s_index'))
+    .values(solved_count=bindparam('s_solved_count'))
+)
+
+# Временная таблица для количества решений, загружаемого через COPY; схема
+# pg_temp указана явно, чтобы карта подмены схем не относила её к теневой
+_solved_stage = table(
+    'solved_stage',
+    column('contest_id', Integer),
+    column('index', String),
+    column('solved_count', Integer),
+    schema='pg_temp'
+)
+
+# Перенос количества решений из временной таблицы одним запросом
+_merge_solved_count = (
+    update(Problem.__table__)
+    .where(Problem.contest_id == _solved_stage.c.contest_id, Problem.index == _solved_stage.c.index)
+    .values(solved_count=_solved_stage.c.solved_count)
+)
+
+
+def _statistic_params(statistic: dict) -> dict:
+    return {
+        's_contest_id': statistic['contestId'],
+        's_index': statistic['index'],
+        's_solved_count': statistic['solvedCount'],
+    }
+
+
+async def _write_solved_counts(connection: AsyncConnection, statistics: List[dict], staged: bool) -> None:
+    """
+    Записывает количество решений пачки задач.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        statistics (List[dict]): Статистика в формате result.problemStatistics
+        staged (bool): Создана ли временная таблица solved_stage (см. _create_stage)
+    """
+    if not staged:
+        await connection.execute(_update_solved_count, [_statistic_params(statistic) for statistic in statistics])
+        return
+    await _copy(connection, _solved_stage.name, ('contest_id', 'index', 'solved_count'), [
+        (statistic['contestId'], statistic['index'], statistic['solvedCount']) for statistic in statistics
+    ])
+    await connection.execute(_merge_solved_count)
+    await connection.execute(text('TRUNCATE pg_temp.solved_stage'))
+
+
+async def _create_stage(connection: AsyncConnection) -> bool:
+    """
+    Создаёт временную таблицу для количества решений, если поддерживается COPY.
+
+    Returns:
+        bool: True, если таблица создана и запись пойдёт через неё
+    """
+    if not _copy_supported(connection):
+        return False
+    await connection.execute(text(
+        'CREATE TEMP TABLE IF NOT EXISTS solved_stage (contest_id integer, "index" varchar, solved_count integer) '
+        'ON COMMIT DROP'
+    ))
+    return True
+
+
+async def apply_statistics(
+        connection: AsyncConnection,
+        statistics: Iterable[dict],
+        batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Пакетно записывает количество решений задач.
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        statistics (Iterable[dict]): Статистика в формате result.problemStatistics
+        batch_size (int): Количество строк в одной пачке
+
+    Returns:
+        int: Количество обработанных записей статистики
+    """
+    staged = await _create_stage(connection)
+    total = 0
+    async for batch in _batches(statistics, batch_size):
+        await _write_solved_counts(connection, batch, staged)
+        total += len(batch)
+    return total
+
+
+class SyncReport(NamedTuple):
+    """
+    Итог инкрементального обновления каталога.
+
+    Атрибуты:
+        inserted (int): Количество добавленных задач
+        updated (int): Количество изменённых задач
+        unchanged (int): Количество задач, оставшихся без изменений
+    """
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+async def _load_stored_problems(connection: AsyncConnection) -> Tuple[Dict[tuple, tuple], Dict[int, Set[str]]]:
+    """
+    Загружает текущее состояние каталога для сравнения с ответом API.
+
+    Строки читаются потоком пачками по BATCH_SIZE, между пачками цикл
+    событий отдаётся другим задачам.
+
+    Returns:
+        Tuple: Словарь (contest_id, index)→(id, значения столбцов, количество решений)
+            и словарь id→названия тегов
+    """
+    stored = {}
+    async with connection.stream(select(
+            Problem.id, Problem.contest_id, Problem.index, Problem.solved_count,
+            *(getattr(Problem, name) for name in _PROBLEM_COLUMNS)
+    )) as result:
+        async for rows in result.partitions(BATCH_SIZE):
+            for row in rows:
+                stored[(row.contest_id, row.index)] = (
+                    row.id,
+                    tuple(getattr(row, name) for name in _PROBLEM_COLUMNS),
+                    row.solved_count
+                )
+            await asyncio.sleep(0)
+
+    links: Dict[int, Set[str]] = {}
+    async with connection.stream(
+            select(problem_tags.c.problem_id, Tag.name).join(Tag, Tag.id == problem_tags.c.tag_id)
+    ) as result:
+        async for rows in result.partitions(BATCH_SIZE):
+            for problem_id, tag_name in rows:
+                links.setdefault(problem_id, set()).add(tag_name)
+            await asyncio.sleep(0)
+    return stored, links
+
+
+async def delta_sync_problems(
+        connection: AsyncConnection,
+        problems: Iterable[dict],
+        statistics: Iterable[dict],
+        batch_size: int = BATCH_SIZE
+) -> SyncReport:
+    """
+    Инкрементальное обновление каталога.
+
+    Сравнивает ответ API с сохранёнными задачами и записывает только новые и
+    изменённые задачи через INSERT ... ON CONFLICT по ключу (contest_id, index),
+    для связей задача–тег добавляет и удаляет только различающиеся пары, а
+    количество решений обновляет только там, где оно изменилось (с asyncpg —
+    через временную таблицу и UPDATE ... FROM).
+
+    Args:
+        connection (AsyncConnection): Асинхронное соединение SQLAlchemy
+        problems (Iterable[dict]): Задачи в формате result.problems
+        statistics (Iterable[dict]): Статистика в формате result.problemStatistics,
+            перебирается после задач
+        batch_size (int): Количество задач в одной пачке
+
+    Returns:
+        SyncReport: Количество добавленных, изменённых и неизменных задач
+    """
+    stored, links = await _load_stored_problems(connection)
+    tag_ids = await load_tag_ids(connection)
+    inserted: Set[tuple] = set()
+    updated: Set[tuple] = set()
+    seen = 0
+
+    upsert = dialect_insert(connection, Problem.__table__)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=['contest_id', 'index'],
+        set_={name: upsert.excluded[name] for name in _PROBLEM_COLUMNS}
+    ).returning(Problem.id, Problem.contest_id, Problem.index)
+    link_insert = dialect_insert(connection, problem_tags).on_conflict_do_nothing()
+    link_delete = delete(problem_tags).where(
+        problem_tags.c.problem_id == bindparam('p_id'),
+        problem_tags.c.tag_id == bindparam('t_id')
+    )
+
+    async for batch in _batches(problems, batch_size):
+        seen += len(batch)
+        changed_rows = []
+        wanted_tags: Dict[tuple, Set[str]] = {}
+        for problem in batch:
+            row = _problem_row(problem)
+            key = (row['contest_id'], row['index'])
+            tags = set(problem.get('tags', []))
+            current = stored.get(key)
+            if current is None:
+                inserted.add(key)
+            elif current[1] != tuple(row[name] for name in _PROBLEM_COLUMNS) or links.get(current[0], set()) != tags:
+                updated.add(key)
+            else:
+                continue
+            changed_rows.append(row)
+            wanted_tags[key] = tags
+
+        if not changed_rows:
+            continue
+
+        await _ensure_tags(connection, tag_ids, (name for names in wanted_tags.values() for name in names))
+        added, removed = [], []
+        for problem_id, contest_id, index in await connection.execute(upsert, changed_rows):
+            tags = wanted_tags[(contest_id, index)]
+            current_tags = links.get(problem_id, set())
+            added += [{'problem_id': problem_id, 'tag_id': tag_ids[name]} for name in tags - current_tags]
+            removed += [{'p_id': problem_id, 't_id': tag_ids[name]} for name in current_tags - tags]
+
+        if removed:
+            await connection.execute(link_delete, removed)
+        if added:
+            await connection.execute(link_insert, added)
+
+    staged = await _create_stage(connection)
+    async for batch in _batches(statistics, batch_size):
+        changed = []
+        for statistic in batch:
+            key = (statistic['contestId'], statistic['index'])
+            current = stored.get(key)
+            if current is None and key not in inserted:
+                continue
+            if statistic['solvedCount'] == (current[2] if current else 0):
+                continue
+            changed.append(statistic)
+            if key not in inserted:
+                updated.add(key)
+        if changed:
+            await _write_solved_counts(connection, changed, staged)
+
+    return SyncReport(len(inserted), len(updated), seen - len(inserted) - len(updated))
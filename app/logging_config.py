@@ -0,0 +1,85 @@
+"""
+Модуль настройки журналирования.
+
+В профиле production записи журнала передаются через очередь в отдельный
+поток, который форматирует их и пишет в поток вывода, поэтому обработчики
+бота не ждут ввода-вывода журнала.
+
+Этот модуль отвечает за:
+1. Настройку корневого логгера по профилю запуска
+2. Запись журнала в отдельном потоке через очередь
+3. Уровни журналов SQLAlchemy и asyncpg
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Optional
+
+from constants import DB_ECHO, LOG_LEVEL, LOG_QUEUE
+
+# Формат записей журнала
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Обработчик, который кладёт записи в очередь без форматирования.
+
+    Очередь читает поток того же процесса, поэтому запись не нужно готовить
+    к передаче между процессами: сообщение форматируется уже в потоке записи.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    """
+    Дописывает накопленные записи и останавливает поток, если он ещё работает.
+    """
+    if listener._thread is not None:
+        listener.stop()
+
+
+def configure_logging(
+        level: str = LOG_LEVEL,
+        queued: bool = LOG_QUEUE,
+        sql_echo: bool = DB_ECHO,
+        stream: Optional[IO[str]] = None
+) -> Optional[QueueListener]:
+    """
+    Настраивает корневой логгер, заменяя ранее установленные обработчики.
+
+    Args:
+        level (str): Уровень журнала
+        queued (bool): Писать журнал в отдельном потоке через очередь
+        sql_echo (bool): Записывать в журнал SQL-запросы
+        stream (Optional[IO[str]]): Поток вывода журнала (по умолчанию sys.stderr)
+
+    Returns:
+        Optional[QueueListener]: Поток записи журнала, если включена очередь; он
+        останавливается при завершении процесса
+    """
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.setLevel(level)
+
+    listener = None
+    if queued:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, handler)
+        listener.start()
+        atexit.register(_stop_listener, listener)
+        root.addHandler(_DeferredQueueHandler(records))
+    else:
+        root.addHandler(handler)
+
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if sql_echo else logging.WARNING)
+    logging.getLogger("asyncpg").setLevel(logging.DEBUG if level == "DEBUG" else logging.WARNING)
+    return listener
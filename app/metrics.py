@@ -0,0 +1,299 @@
+"""
+Модуль метрик приложения в текстовом формате Prometheus.
+
+Метрики хранятся в памяти процесса: наблюдение — это двоичный поиск корзины
+гистограммы и увеличение счётчика под блокировкой, поэтому их можно не
+отключать в рабочем режиме. Значения отдаются по HTTP на /metrics.
+
+Этот модуль отвечает за:
+1. Счётчики, текущие значения и гистограммы с метками
+2. Метрики обработчиков бота, запросов к Bot API и их очереди, SQL-запросов, кэша и обновления каталога
+3. Замер длительности SQL-запросов и ожидания соединения из пула
+4. Отдачу метрик в текстовом формате Prometheus
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин гистограммы длительности этапов обновления каталога, в секундах
+PHASE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# Все созданные метрики в порядке создания
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Общая часть метрик: имя, описание, метки и регистрация.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """
+    Монотонно растущий счётчик.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        """
+        Увеличивает счётчик.
+
+        Args:
+            amount (float): Величина увеличения
+            *labels (str): Значения меток в порядке labelnames
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        """
+        Возвращает текущее значение счётчика.
+        """
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Текущее значение, которое может как расти, так и уменьшаться.
+    """
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        """
+        Устанавливает значение.
+
+        Args:
+            value (float): Новое значение
+            *labels (str): Значения меток в порядке labelnames
+        """
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма значений с фиксированными границами корзин.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Для каждого набора меток: количество значений в каждой корзине (последняя — +Inf) и их сумма
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Добавляет значение.
+
+        Args:
+            value (float): Значение
+            *labels (str): Значения меток в порядке labelnames
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        """
+        Возвращает количество добавленных значений.
+        """
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """
+        Замеряет длительность блока и добавляет её в гистограмму.
+
+        Args:
+            *labels (str): Значения меток в порядке labelnames
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total[0]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+# Метрики приложения
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Длительность обработчиков бота", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Количество ошибок обработчиков бота", ("handler",))
+BOT_API_SECONDS = Histogram("bot_api_seconds", "Длительность запросов к Bot API", ("method",))
+BOT_SEND_WAIT_SECONDS = Histogram(
+    "bot_send_wait_seconds", "Ожидание запроса к Bot API в очереди планировщика", ("method",)
+)
+BOT_SEND_RETRIES = Counter("bot_send_retries_total", "Повторы запросов к Bot API после ответа 429", ("method",))
+BOT_SEND_COALESCED = Counter(
+    "bot_send_coalesced_total", "Изменения сообщения, объединённые с ещё не отправленным", ("method",)
+)
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Длительность SQL-запросов", ("statement",))
+DB_POOL_CHECKOUT_SECONDS = Histogram("db_pool_checkout_seconds", "Ожидание соединения из пула")
+FILL_DB_PHASE_SECONDS = Histogram(
+    "fill_db_phase_seconds", "Длительность этапов обновления каталога", ("phase",), PHASE_BUCKETS
+)
+FILL_DB_ROWS = Counter("fill_db_rows_total", "Количество обработанных задач при обновлении каталога", ("result",))
+POOL_CACHE_REQUESTS = Counter(
+    "pool_cache_requests_total", "Обращения к кэшу множеств подходящих задач", ("result",)
+)
+POOL_CACHE_ENTRIES = Gauge("pool_cache_entries", "Количество множеств подходящих задач в кэше")
+POOL_CACHE_BYTES = Gauge("pool_cache_bytes", "Память множеств подходящих задач в кэше, в байтах")
+CODEFORCES_API_SECONDS = Histogram("codeforces_api_seconds", "Длительность запросов к Codeforces API", ("method",))
+SOLVED_SYNCS = Counter(
+    "solved_syncs_total", "Синхронизации решённых задач хэндлов: полные, инкрементальные и с ошибкой", ("kind",)
+)
+
+
+def render() -> str:
+    """
+    Формирует значения всех метрик в текстовом формате Prometheus.
+
+    Returns:
+        str: Текст для ответа на /metrics
+    """
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, замеряющий время ожидания соединения.
+
+    В замер входит ожидание свободного соединения и создание нового.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+@lru_cache(maxsize=1024)
+def _statement_kind(statement: str) -> str:
+    # Тексты запросов берутся из кэша скомпилированных запросов SQLAlchemy, поэтому их немного
+    word = statement.lstrip()[:6].upper()
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Подключает замер длительности SQL-запросов к движку.
+
+    Для асинхронного движка передаётся engine.sync_engine. Время начала
+    хранится в контексте выполнения запроса, поэтому при ошибке запроса
+    очищать ничего не нужно.
+
+    Args:
+        engine (Engine): Синхронный движок SQLAlchemy
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        DB_QUERY_SECONDS.observe(time.perf_counter() - context.query_started, _statement_kind(statement))
+
+
+async def _metrics_handler(request: "web.Request") -> "web.Response":
+    from aiohttp import web
+
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def serve_metrics(host: str, port: int) -> "web.AppRunner":
+    """
+    Запускает HTTP-сервер, отдающий метрики на /metrics.
+
+    Args:
+        host (str): Адрес, на котором слушает сервер
+        port (int): Порт, на котором слушает сервер
+
+    Returns:
+        web.AppRunner: Запущенный сервер; остановка — await runner.cleanup()
+    """
+    # aiohttp нужен только процессу, отдающему метрики
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на %s:%d/metrics", host, port)
+    return runner
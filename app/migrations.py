@@ -0,0 +1,193 @@
+"""
+Модуль версионированного обновления схемы базы данных.
+
+Каждый шаг обновления имеет номер версии и применяется один раз; номер
+последней применённой версии хранится в таблице schema_version. Шаги
+идемпотентны, поэтому их повторное применение к таблицам, уже созданным
+по актуальным моделям (например, после полного обновления каталога), безопасно.
+
+Этот модуль отвечает за:
+1. Учёт версии схемы базы данных
+2. Последовательное применение недостающих шагов обновления
+"""
+
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, inspect, select, text, update
+from sqlalchemy.engine import Connection
+
+from app.models import (
+    Base,
+    CATALOG_TABLES,
+    FsmRecord,
+    GenerationRecord,
+    HandleRecord,
+    Problem,
+    ServedRecord,
+    problem_tags,
+)
+
+logger = logging.getLogger(__name__)
+
+# Служебная таблица с номером версии схемы
+schema_version = Table(
+    'schema_version',
+    MetaData(),
+    Column('version', Integer, nullable=False)
+)
+
+
+def _columns(connection: Connection, table: str) -> set:
+    return {column['name'] for column in inspect(connection).get_columns(table)}
+
+
+def _create_indexes(connection: Connection, table: Table) -> None:
+    """
+    Создаёт недостающие индексы таблицы по моделям.
+
+    Индексы по столбцам, которые добавляются более поздними шагами, пропускаются.
+    """
+    columns = _columns(connection, table.name)
+    for index in table.indexes:
+        if all(column.name in columns for column in index.columns):
+            index.create(connection, checkfirst=True)
+
+
+def _create_catalog(connection: Connection) -> None:
+    """
+    Создаёт таблицы каталога, если их ещё нет.
+    """
+    Base.metadata.create_all(connection, tables=CATALOG_TABLES)
+
+
+def _add_random_key(connection: Connection) -> None:
+    """
+    Добавляет столбец random_key и заполняет его случайными значениями.
+    """
+    if 'random_key' in _columns(connection, Problem.__tablename__):
+        return
+    postgres = connection.dialect.name == 'postgresql'
+    connection.execute(text("ALTER TABLE problems ADD COLUMN random_key FLOAT"))
+    random_value = func.random() if postgres else func.abs(func.random()) / 9.3e18
+    connection.execute(update(Problem.__table__).values(random_key=random_value))
+    if postgres:
+        connection.execute(text("ALTER TABLE problems ALTER COLUMN random_key SET NOT NULL"))
+
+
+def _tune_indexes(connection: Connection) -> None:
+    """
+    Добавляет уникальный ключ (contest_id, index) и индексы под запросы бота,
+    удаляет индексы, которые дублируют первичный ключ или заменены составными.
+    """
+    if connection.dialect.name == 'postgresql':
+        # Дубликаты естественного ключа помешают создать уникальный индекс
+        connection.execute(text(
+            "DELETE FROM problem_tags WHERE problem_id IN ("
+            " SELECT p.id FROM problems p JOIN problems q"
+            " ON p.contest_id = q.contest_id AND p.index = q.index AND p.id > q.id)"
+        ))
+        connection.execute(text(
+            "DELETE FROM problems p USING problems q"
+            " WHERE p.contest_id = q.contest_id AND p.index = q.index AND p.id > q.id"
+        ))
+    connection.execute(text("DROP INDEX IF EXISTS ix_problems_id"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_problems_random_key"))
+    for table in (Problem.__table__, problem_tags):
+        _create_indexes(connection, table)
+
+
+def _add_rating(connection: Connection) -> None:
+    """
+    Добавляет столбец rating и индекс по диапазону рейтинга.
+
+    Рейтинг заполняется при следующем обновлении каталога из API.
+    """
+    if 'rating' not in _columns(connection, Problem.__tablename__):
+        connection.execute(text("ALTER TABLE problems ADD COLUMN rating INTEGER"))
+    _create_indexes(connection, Problem.__table__)
+
+
+def _create_fsm_states(connection: Connection) -> None:
+    """
+    Создаёт таблицу состояний FSM бота.
+    """
+    FsmRecord.__table__.create(connection, checkfirst=True)
+
+
+def _create_served_problems(connection: Connection) -> None:
+    """
+    Создаёт таблицу задач, уже показанных пользователям.
+    """
+    ServedRecord.__table__.create(connection, checkfirst=True)
+
+
+def _create_cf_handles(connection: Connection) -> None:
+    """
+    Создаёт таблицу хэндлов Codeforces, привязанных пользователями.
+    """
+    HandleRecord.__table__.create(connection, checkfirst=True)
+
+
+def _create_catalog_generation(connection: Connection) -> None:
+    """
+    Создаёт таблицу поколения каталога и переименовывает эпоху историй показанных задач в поколение.
+
+    Эпохи, вычисленные по идентификаторам задач, не совпадают с поколениями,
+    поэтому истории показанных задач начинаются заново.
+    """
+    GenerationRecord.__table__.create(connection, checkfirst=True)
+    if 'epoch' in _columns(connection, ServedRecord.__tablename__):
+        connection.execute(text("ALTER TABLE served_problems RENAME COLUMN epoch TO generation"))
+
+
+# Шаги обновления схемы: номер версии, описание и функция применения
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Таблицы каталога", _create_catalog),
+    (2, "Случайный ключ задачи", _add_random_key),
+    (3, "Индексы под запросы бота и уникальный ключ задачи", _tune_indexes),
+    (4, "Рейтинг задачи", _add_rating),
+    (5, "Состояния FSM бота", _create_fsm_states),
+    (6, "Задачи, показанные пользователям", _create_served_problems),
+    (7, "Хэндлы Codeforces пользователей", _create_cf_handles),
+    (8, "Поколение каталога", _create_catalog_generation),
+]
+
+
+def current_version(connection: Connection) -> int:
+    """
+    Возвращает номер последней применённой версии схемы.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy
+
+    Returns:
+        int: Номер версии или 0 для пустой базы
+    """
+    schema_version.create(connection, checkfirst=True)
+    return connection.scalar(select(func.max(schema_version.c.version))) or 0
+
+
+def upgrade(connection: Connection) -> List[int]:
+    """
+    Применяет недостающие шаги обновления схемы.
+
+    Вызывается внутри транзакции, например через
+    ``await connection.run_sync(upgrade)`` для асинхронного движка.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy
+
+    Returns:
+        List[int]: Номера применённых версий
+    """
+    version = current_version(connection)
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info("Обновление схемы до версии %d: %s", number, description)
+        apply(connection)
+        connection.execute(schema_version.insert().values(version=number))
+        applied.append(number)
+    return applied
@@ -4,7 +4,9 @@
 Этот модуль содержит SQLAlchemy модели для работы с задачами Codeforces и их тегами.
 """
 
-from sqlalchemy import Column, Integer, String, Float, Table, ForeignKey
+import random
+
+from sqlalchemy import BigInteger, Column, Integer, LargeBinary, String, Float, Table, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -14,7 +16,9 @@ problem_tags = Table(
     'problem_tags',
     Base.metadata,
     Column('problem_id', Integer, ForeignKey('problems.id'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # Обратный порядок столбцов первичного ключа: покрывает соединение от тега к задачам
+    Index('ix_problem_tags_tag_id_problem_id', 'tag_id', 'problem_id')
 )
 
 
@@ -29,21 +33,34 @@ class Problem(Base):
         name (str): Название задачи
         category (str): Категория задачи
         points (float): Количество очков за задачу (может быть null)
+        rating (int): Рейтинг (сложность) задачи (может быть null)
         solved_count (int): Количество решений задачи
+        random_key (float): Случайный ключ из [0, 1) для выборки случайных задач на стороне БД
         tags (list[Tag]): Список тегов, связанных с задачей
     """
     __tablename__ = 'problems'
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     contest_id = Column(Integer)
     index = Column(String)
     name = Column(String)
     category = Column(String)
     points = Column(Float, nullable=True)
+    rating = Column(Integer, nullable=True)
     solved_count = Column(Integer, default=0)
+    random_key = Column(Float, nullable=False, default=random.random)
 
     tags = relationship('Tag', secondary=problem_tags, back_populates='problems')
 
+    __table_args__ = (
+        # Естественный ключ задачи, по нему выполняется инкрементальное обновление
+        Index('uq_problems_contest_id_index', 'contest_id', 'index', unique=True),
+        # Фильтр по диапазону очков с упорядочиванием по случайному ключу
+        Index('ix_problems_points_random_key', 'points', 'random_key'),
+        # Фильтр по диапазону рейтинга с упорядочиванием по случайному ключу
+        Index('ix_problems_rating_random_key', 'rating', 'random_key'),
+    )
+
 
 class Tag(Base):
     """
@@ -60,3 +77,72 @@ class Tag(Base):
     name = Column(String, unique=True, index=True)
 
     problems = relationship('Problem', secondary=problem_tags, back_populates='tags')
+
+
+class FsmRecord(Base):
+    """
+    Состояние FSM пользователя Telegram бота.
+
+    Атрибуты:
+        key (str): Ключ записи, построенный из StorageKey aiogram
+        state (str): Текущее состояние (может быть null)
+        data (dict): Данные состояния
+        updated_at (float): Время последней записи (Unix time)
+    """
+    __tablename__ = 'fsm_states'
+
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(Float, nullable=False)
+
+
+class ServedRecord(Base):
+    """
+    Задачи, уже показанные пользователю Telegram бота.
+
+    Атрибуты:
+        user_id (int): ID пользователя Telegram
+        generation (int): Поколение каталога, в котором записаны идентификаторы задач
+        bits (bytes): Битовое множество идентификаторов задач, сжатое zlib
+        updated_at (float): Время последней записи (Unix time)
+    """
+    __tablename__ = 'served_problems'
+
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    generation = Column(BigInteger, nullable=False)
+    bits = Column(LargeBinary, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+class HandleRecord(Base):
+    """
+    Хэндл Codeforces, привязанный пользователем Telegram бота.
+
+    Атрибуты:
+        user_id (int): ID пользователя Telegram
+        handle (str): Хэндл Codeforces
+    """
+    __tablename__ = 'cf_handles'
+
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    handle = Column(String, nullable=False)
+
+
+class GenerationRecord(Base):
+    """
+    Поколение каталога задач: номер, который увеличивается при каждой полной
+    перезагрузке каталога, переназначающей идентификаторы задач.
+
+    Атрибуты:
+        id (int): Номер строки (таблица содержит одну строку с id = 1)
+        generation (int): Текущее поколение каталога
+    """
+    __tablename__ = 'catalog_generation'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    generation = Column(BigInteger, nullable=False)
+
+
+# Таблицы каталога задач, которые целиком пересоздаются при обновлении
+CATALOG_TABLES = [Problem.__table__, Tag.__table__, problem_tags]
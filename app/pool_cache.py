@@ -0,0 +1,195 @@
+"""
+Модуль кэша множеств подходящих задач.
+
+Тем всего 37, а диапазонов на клавиатурах — несколько десятков, поэтому одни
+и те же фильтры (тема или выражение над темами, рейтинг от и до) повторяются
+тысячи раз в день. Кэш хранит для нормализованного фильтра идентификаторы
+подходящих задач в компактном массиве array('I') — по 4 байта на задачу, — а
+каждый запрос только случайно выбирает из него идентификаторы и читает эти
+задачи по первичному ключу.
+
+Кэш используется запросами к базе данных в ProblemService, то есть когда
+каталог в памяти (app.catalog) выключен или ещё не загружен.
+
+Записи вытесняются по давности использования (LRU) при превышении размера
+кэша и по истечении времени жизни, а после обновления каталога кэш
+очищается целиком.
+
+Этот модуль отвечает за:
+1. Нормализацию фильтра в ключ кэша
+2. Хранение множеств идентификаторов с вытеснением LRU и временем жизни
+3. Подсчёт попаданий и занимаемой памяти
+4. Очистку кэша после обновления каталога
+"""
+
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from app.metrics import POOL_CACHE_BYTES, POOL_CACHE_ENTRIES, POOL_CACHE_REQUESTS
+from app.refresh import on_catalog_refresh
+from app.tag_query import Node
+from constants import POOL_CACHE_ENABLED, POOL_CACHE_SIZE, POOL_CACHE_TTL
+
+
+def rating_key(tag_name: str, min_rating: int, max_rating: Optional[int]) -> Tuple[Hashable, ...]:
+    """
+    Нормализует фильтр по теме и диапазону рейтинга в ключ кэша.
+
+    Args:
+        tag_name (str): Название тега
+        min_rating (int): Минимальный рейтинг
+        max_rating (Optional[int]): Максимальный рейтинг
+
+    Returns:
+        Tuple[Hashable, ...]: Ключ, одинаковый для равных фильтров (например, с границами 800 и 800.0)
+    """
+    return 'rating', tag_name, int(min_rating), None if max_rating is None else int(max_rating)
+
+
+def expression_key(expression: Node, min_rating: int, max_rating: Optional[int]) -> Tuple[Hashable, ...]:
+    """
+    Нормализует фильтр по выражению над тегами и диапазону рейтинга в ключ кэша.
+
+    Args:
+        expression (Node): Дерево выражения из parse_tag_expression
+        min_rating (int): Минимальный рейтинг
+        max_rating (Optional[int]): Максимальный рейтинг
+
+    Returns:
+        Tuple[Hashable, ...]: Ключ, одинаковый для одинаковых деревьев выражения и границ
+    """
+    return 'expression', expression, int(min_rating), None if max_rating is None else int(max_rating)
+
+
+class PoolCache:
+    """
+    LRU-кэш множеств идентификаторов задач со временем жизни записей.
+
+    Attributes:
+        enabled (bool): Используется ли кэш
+        max_entries (int): Максимальное количество записей
+        ttl (float): Время жизни записи, в секундах
+        hits (int): Количество попаданий
+        misses (int): Количество промахов
+    """
+
+    def __init__(self, max_entries: int = POOL_CACHE_SIZE, ttl: float = POOL_CACHE_TTL, enabled: bool = True):
+        """
+        Инициализация кэша.
+
+        Args:
+            max_entries (int): Максимальное количество записей
+            ttl (float): Время жизни записи, в секундах
+            enabled (bool): Используется ли кэш
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Ключ фильтра -> (момент истечения по time.monotonic(), идентификаторы задач)
+        self._entries: 'OrderedDict[Hashable, Tuple[float, array]]' = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: Hashable) -> Optional[array]:
+        """
+        Возвращает идентификаторы задач для фильтра, если запись есть и не устарела.
+
+        Args:
+            key (Hashable): Нормализованный фильтр
+
+        Returns:
+            Optional[array]: Идентификаторы задач или None при промахе
+        """
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            POOL_CACHE_REQUESTS.inc(1, 'hit')
+            return entry[1]
+        if entry is not None:
+            self._drop(key)
+        self.misses += 1
+        POOL_CACHE_REQUESTS.inc(1, 'miss')
+        return None
+
+    def put(self, key: Hashable, ids: Iterable[int]) -> array:
+        """
+        Сохраняет идентификаторы задач для фильтра.
+
+        Args:
+            key (Hashable): Нормализованный фильтр
+            ids (Iterable[int]): Идентификаторы подходящих задач
+
+        Returns:
+            array: Сохранённый массив идентификаторов
+        """
+        # Из списка массив создаётся точного размера, без запаса на рост
+        pool = array('I', list(ids))
+        if not self.enabled:
+            return pool
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, pool)
+        self._bytes += self._size(pool)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+        self._publish()
+        return pool
+
+    def clear(self) -> None:
+        """
+        Удаляет все записи.
+        """
+        self._entries.clear()
+        self._bytes = 0
+        self._publish()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Доля попаданий среди всех обращений.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Возвращает количество записей, занимаемую память, попадания и промахи.
+        """
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
+
+    @staticmethod
+    def _size(pool: array) -> int:
+        return sys.getsizeof(pool)
+
+    def _drop(self, key: Hashable) -> None:
+        _, pool = self._entries.pop(key)
+        self._bytes -= self._size(pool)
+
+    def _publish(self) -> None:
+        POOL_CACHE_ENTRIES.set(len(self._entries))
+        POOL_CACHE_BYTES.set(self._bytes)
+
+
+# Общий кэш приложения
+pool_cache = PoolCache(enabled=POOL_CACHE_ENABLED)
+
+
+@on_catalog_refresh
+async def clear_pool_cache() -> None:
+    """
+    Очищает кэш после обновления каталога.
+    """
+    pool_cache.clear()
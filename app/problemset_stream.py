@@ -0,0 +1,188 @@
+"""
+Модуль потокового разбора ответа problemset.problems Codeforces API.
+
+Ответ разбирается по мере поступления фрагментов: в памяти находится только
+необработанный хвост буфера и текущий элемент массива, а задачи и статистика
+решений отдаются генераторами.
+
+Этот модуль отвечает за:
+1. Инкрементальный разбор JSON из последовательности фрагментов
+2. Выдачу элементов result.problems и result.problemStatistics генераторами
+"""
+
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+# Пробельные символы между токенами JSON
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Разделы ответа, элементы которых выдаются по одному
+_STREAMED_SECTIONS = ('problems', 'problemStatistics')
+
+
+class ProblemsetStream:
+    """
+    Потоковый разборщик ответа problemset.problems.
+
+    Статус ответа читается при создании объекта. Задачи и статистику нужно
+    перебирать в порядке их следования в ответе: сначала problems(), затем statistics().
+
+    Attributes:
+        status (Optional[str]): Статус ответа API
+        comment (Optional[str]): Описание ошибки, если статус не OK
+    """
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]], encoding: str = 'utf-8'):
+        """
+        Инициализация разборщика.
+
+        Args:
+            chunks (Iterable[Union[bytes, str]]): Фрагменты тела ответа
+            encoding (str): Кодировка фрагментов в байтах
+        """
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder(encoding)().decode
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+        self.status: Optional[str] = None
+        self.comment: Optional[str] = None
+
+        self._events = self._walk()
+        self._pending: Optional[Tuple[str, dict]] = next(self._events, None)
+
+    def problems(self) -> Iterator[dict]:
+        """
+        Перебирает задачи из result.problems.
+
+        Yields:
+            dict: Задача в формате ответа API
+        """
+        return self._section('problems')
+
+    def statistics(self) -> Iterator[dict]:
+        """
+        Перебирает статистику решений из result.problemStatistics.
+
+        Yields:
+            dict: Статистика задачи в формате ответа API
+        """
+        return self._section('problemStatistics')
+
+    def _section(self, name: str) -> Iterator[dict]:
+        while self._pending is not None and self._pending[0] == name:
+            item = self._pending[1]
+            self._pending = next(self._events, None)
+            yield item
+
+    def _walk(self) -> Iterator[Tuple[str, dict]]:
+        """
+        Обходит ответ API и выдаёт элементы потоковых разделов.
+        """
+        for key in self._members():
+            if key != 'result':
+                value = self._read_value()
+                if key == 'status':
+                    self.status = value
+                elif key == 'comment':
+                    self.comment = value
+                continue
+            for section in self._members():
+                if section in _STREAMED_SECTIONS:
+                    for item in self._items():
+                        yield section, item
+                else:
+                    self._read_value()
+
+    def _fill(self) -> bool:
+        """
+        Дочитывает следующий фрагмент в буфер, отбрасывая уже разобранную часть.
+
+        Returns:
+            bool: False, если поток закончился
+        """
+        if self._eof:
+            return False
+        text = ''
+        for chunk in self._chunks:
+            text = self._decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                break
+        else:
+            self._eof = True
+            text = self._decode(b'', final=True)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return bool(text) or not self._eof
+
+    def _peek(self) -> str:
+        """
+        Пропускает пробелы и возвращает следующий символ без его чтения.
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Неожиданный конец ответа API")
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Ожидался символ {char!r} в позиции {self._pos}")
+        self._pos += 1
+
+    def _read_value(self):
+        """
+        Читает одно JSON-значение целиком, при необходимости дочитывая фрагменты.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Число в конце буфера могло быть обрезано границей фрагмента
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _members(self) -> Iterator[str]:
+        """
+        Перебирает ключи объекта; значение каждого ключа читает вызывающий код.
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            self._expect(':')
+            yield key
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _items(self) -> Iterator:
+        """
+        Перебирает элементы массива.
+        """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._read_value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
@@ -0,0 +1,42 @@
+"""
+Модуль уведомлений об обновлении каталога задач.
+
+Компоненты, которые держат производные от каталога данные в памяти,
+регистрируют здесь свои обработчики; они вызываются при запуске приложения
+и после каждого успешного обновления базы данных.
+"""
+
+import logging
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Обработчики, вызываемые после обновления каталога
+_listeners: List[Callable[[], Awaitable[None]]] = []
+
+
+def on_catalog_refresh(listener: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """
+    Регистрирует обработчик обновления каталога.
+
+    Args:
+        listener (Callable[[], Awaitable[None]]): Асинхронная функция без аргументов
+
+    Returns:
+        Callable[[], Awaitable[None]]: Тот же обработчик, что позволяет использовать функцию как декоратор
+    """
+    _listeners.append(listener)
+    return listener
+
+
+async def notify_catalog_refreshed() -> None:
+    """
+    Последовательно вызывает все зарегистрированные обработчики.
+
+    Ошибка одного обработчика записывается в журнал и не мешает остальным.
+    """
+    for listener in _listeners:
+        try:
+            await listener()
+        except Exception:
+            logger.exception("Ошибка обработчика обновления каталога %r", listener)
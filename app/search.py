@@ -0,0 +1,230 @@
+"""
+Модуль нечёткого поиска задач по названию.
+
+Названия задач каталога индексируются триграммами так же, как это делает
+расширение pg_trgm: название приводится к нижнему регистру и разбивается на
+слова, каждое слово дополняется двумя пробелами в начале и одним в конце, и
+из него берутся все подстроки длины 3. Для каждой триграммы хранится множество
+задач, в названии которых она встречается (инвертированный индекс): для
+частых триграмм — битовое множество номеров задач (как в app.catalog), для
+редких — массив номеров.
+
+Поиск подсчитывает для всех задач сразу количество общих с запросом триграмм
+побитовыми операциями над множествами триграмм запроса и ранжирует задачи по
+доле триграмм запроса, найденных в названии (как word_similarity в pg_trgm), а
+при равенстве — по сходству названия целиком. Так опечатки и пропущенные
+слова не мешают найти задачу, а запрос из одного слова находит длинные названия.
+
+Индекс строится в памяти и перестраивается после каждого обновления каталога.
+
+Этот модуль отвечает за:
+1. Разбиение текста на триграммы
+2. Построение инвертированного индекса триграмм названий задач
+3. Поиск и ранжирование задач по запросу
+"""
+
+import logging
+import re
+from array import array
+from math import ceil
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Problem
+from app.refresh import on_catalog_refresh
+from app.served import bit_positions
+from constants import SEARCH_MIN_SIMILARITY
+
+logger = logging.getLogger(__name__)
+
+# Слова названия: последовательности букв и цифр
+_WORD = re.compile(r"[^\W_]+")
+# Триграмма хранится битовым множеством, если встречается в названиях больше
+# чем каждой DENSE_RATIO-й задачи, иначе — массивом номеров задач
+DENSE_RATIO = 32
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Возвращает множество триграмм текста в том же виде, что и pg_trgm.
+
+    Args:
+        text (str): Текст
+
+    Returns:
+        Set[str]: Триграммы слов текста
+    """
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """
+    Инвертированный индекс триграмм названий задач.
+
+    Attributes:
+        enabled (bool): Разрешено ли строить индекс и отвечать на запросы
+        loaded (bool): Построен ли индекс
+        min_similarity (float): Минимальная доля триграмм запроса в названии найденной задачи
+    """
+
+    def __init__(self, enabled: bool = True, min_similarity: float = SEARCH_MIN_SIMILARITY):
+        """
+        Инициализация индекса.
+
+        Args:
+            enabled (bool): Разрешено ли строить индекс и отвечать на запросы
+            min_similarity (float): Минимальная доля триграмм запроса в названии найденной задачи
+        """
+        self.enabled = enabled
+        self.loaded = False
+        self.min_similarity = min_similarity
+        self._problems: List[Problem] = []
+        # Количество различных триграмм названия каждой задачи
+        self._sizes = array('I')
+        # Количество триграмм названия -> битовое множество задач, по возрастанию количества
+        self._by_size: List[Tuple[int, int]] = []
+        # Триграмма -> битовое множество номеров задач в self._problems (частые
+        # триграммы) или массив номеров по возрастанию (редкие)
+        self._postings: Dict[str, Union[int, array]] = {}
+
+    @property
+    def ready(self) -> bool:
+        """
+        Может ли индекс отвечать на запросы.
+        """
+        return self.enabled and self.loaded
+
+    def build(self, problems: Iterable[Problem]) -> None:
+        """
+        Строит индекс и атомарно заменяет им текущий.
+
+        Args:
+            problems (Iterable[Problem]): Задачи каталога
+        """
+        problems = list(problems)
+        sizes = array('I')
+        postings: Dict[str, List[int]] = {}
+        for position, problem in enumerate(problems):
+            grams = trigrams(problem.name or "")
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+
+        by_size: Dict[int, List[int]] = {}
+        for position, size in enumerate(sizes):
+            by_size.setdefault(size, []).append(position)
+
+        # Битовое множество занимает len(problems) / 8 байт, массив — 4 байта на задачу
+        dense = len(problems) // DENSE_RATIO
+        self._problems = problems
+        self._sizes = sizes
+        self._by_size = [(size, _to_bits(positions, len(problems))) for size, positions in sorted(by_size.items())]
+        self._postings = {
+            gram: _to_bits(positions, len(problems)) if len(positions) > dense else array('I', positions)
+            for gram, positions in postings.items()
+        }
+        self.loaded = True
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Строит индекс по задачам из базы данных.
+
+        Args:
+            session (AsyncSession): Асинхронная сессия SQLAlchemy
+        """
+        problems = (await session.execute(select(Problem))).scalars().all()
+        session.expunge_all()
+
+        self.build(problems)
+        logger.info("Индекс названий построен: %d задач, %d триграмм", len(problems), len(self._postings))
+
+    def search(self, query: str, limit: int = 10) -> List[Problem]:
+        """
+        Возвращает до limit задач, названия которых больше всего похожи на запрос.
+
+        Количество общих с запросом триграмм считается сразу для всех задач
+        побитовым сумматором: счётчики хранятся разрядами, i-й разряд счётчиков
+        всех задач — одно битовое множество. Затем задачи выбираются по
+        убыванию количества, а при равном количестве — по возрастанию
+        количества триграмм названия, то есть по убыванию сходства названия
+        целиком (коэффициента Жаккара).
+
+        Args:
+            query (str): Текст запроса
+            limit (int): Максимальное количество задач
+
+        Returns:
+            List[Problem]: Задачи по убыванию сходства
+        """
+        grams = trigrams(query)
+        if not grams or limit <= 0:
+            return []
+
+        count = len(self._problems)
+        digits: List[int] = []
+        for gram in grams:
+            carry = self._postings.get(gram, 0)
+            if isinstance(carry, array):
+                carry = _to_bits(carry, count)
+            for i, digit in enumerate(digits):
+                if not carry:
+                    break
+                digits[i], carry = digit ^ carry, digit & carry
+            if carry:
+                digits.append(carry)
+
+        chosen: List[int] = []
+        everything = (1 << count) - 1
+        required = max(1, ceil(len(grams) * self.min_similarity))
+        for shared in range(min(len(grams), (1 << len(digits)) - 1), required - 1, -1):
+            tier = everything
+            for i, digit in enumerate(digits):
+                tier &= digit if shared >> i & 1 else ~digit
+            if not tier:
+                continue
+            need = limit - len(chosen)
+            if tier.bit_count() <= need:
+                chosen += sorted(bit_positions(tier), key=self._sizes.__getitem__)
+            else:
+                for _, members in self._by_size:
+                    selected = tier & members
+                    if selected:
+                        chosen += bit_positions(selected)[:limit - len(chosen)]
+                        if len(chosen) == limit:
+                            break
+            if len(chosen) == limit:
+                break
+        return [self._problems[position] for position in chosen]
+
+
+def _to_bits(positions: Iterable[int], count: int) -> int:
+    """
+    Возвращает битовое множество из номеров меньше count.
+    """
+    data = bytearray((count + 7) // 8)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+# Общий индекс названий задач приложения
+name_index = NameIndex()
+
+
+@on_catalog_refresh
+async def reload_name_index() -> None:
+    """
+    Перестраивает индекс названий по задачам из базы данных, если он включён.
+    """
+    if not name_index.enabled:
+        return
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await name_index.load(session)
@@ -0,0 +1,173 @@
+"""
+Модуль истории задач, уже показанных пользователям.
+
+История пользователя — битовое множество идентификаторов задач (целое число
+Python), поэтому исключение показанных задач при выборе случайных — одна
+побитовая операция над множеством подходящих задач. Истории недавно активных
+пользователей хранятся в памяти (LRU) в том же сжатом zlib виде, что и в
+таблице served_problems: несжатое множество занимает по биту на каждую задачу
+каталога, а сжатое — десятки байт на показанную задачу. Изменённые истории
+записываются в базу пачками в фоне (см. app.write_behind).
+
+Идентификаторы задач действительны в пределах поколения каталога (см.
+app.generation): если полная перезагрузка каталога переназначила их, история,
+записанная в другом поколении, считается пустой.
+
+Этот модуль отвечает за:
+1. Хранение историй в памяти с вытеснением давно неактивных пользователей
+2. Чтение истории из базы данных при первом обращении
+3. Пакетную отложенную запись изменённых историй
+"""
+
+import zlib
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import dialect_insert
+from app.models import ServedRecord
+from app.write_behind import WriteBehindCache
+
+# Задержка записи накопленных изменений в базу, в секундах
+FLUSH_INTERVAL = 5.0
+# Максимальное количество историй в памяти
+CACHE_SIZE = 50_000
+
+# Запись кэша: поколение каталога и сжатое битовое множество идентификаторов задач
+_Entry = Tuple[int, bytes]
+
+
+def bit_positions(bits: int) -> List[int]:
+    """
+    Возвращает номера установленных битов по возрастанию.
+    """
+    positions = []
+    for offset, value in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        while value:
+            low = value & -value
+            positions.append((offset << 3) + low.bit_length() - 1)
+            value ^= low
+    return positions
+
+
+def encode_bits(bits: int) -> bytes:
+    """
+    Кодирует битовое множество для хранения в базе данных.
+    """
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'))
+
+
+def decode_bits(data: bytes) -> int:
+    """
+    Декодирует битовое множество, записанное encode_bits.
+    """
+    return int.from_bytes(zlib.decompress(data), 'little')
+
+
+_EMPTY = encode_bits(0)
+
+
+class ServedHistory:
+    """
+    Истории показанных пользователям задач с отложенной записью в базу.
+
+    Изменения записываются в базу не позже чем через flush_interval секунд и
+    при закрытии. Из памяти вытесняются только записанные истории.
+
+    Attributes:
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+    """
+
+    def __init__(self, engine: AsyncEngine, flush_interval: float = FLUSH_INTERVAL, cache_size: int = CACHE_SIZE):
+        """
+        Инициализация истории.
+
+        Args:
+            engine (AsyncEngine): Асинхронный движок SQLAlchemy
+            flush_interval (float): Задержка записи изменений, в секундах
+            cache_size (int): Максимальное количество историй в памяти
+        """
+        self.engine = engine
+
+        table = ServedRecord.__table__
+        upsert = dialect_insert(engine, table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={column: upsert.excluded[column] for column in ('generation', 'bits', 'updated_at')}
+        )
+        self._entries: WriteBehindCache[int, _Entry] = WriteBehindCache(
+            engine, upsert, _row, "истории показанных задач", flush_interval, cache_size
+        )
+
+    async def get(self, user_id: int, generation: int) -> int:
+        """
+        Возвращает задачи, показанные пользователю в текущем поколении каталога.
+
+        Args:
+            user_id (int): ID пользователя Telegram
+            generation (int): Текущее поколение каталога
+
+        Returns:
+            int: Битовое множество идентификаторов задач
+        """
+        stored_generation, data = await self._entry(user_id)
+        return decode_bits(data) if stored_generation == generation else 0
+
+    async def add(self, user_id: int, generation: int, problem_ids: Iterable[int]) -> None:
+        """
+        Добавляет задачи в историю пользователя.
+
+        Args:
+            user_id (int): ID пользователя Telegram
+            generation (int): Текущее поколение каталога
+            problem_ids (Iterable[int]): Идентификаторы показанных задач
+        """
+        added = 0
+        for problem_id in problem_ids:
+            added |= 1 << problem_id
+        await self._entry(user_id)
+        # Задачи объединяются с историей, лежащей в памяти в момент записи: между
+        # чтением и записью нет ожиданий, поэтому одновременные вызовы для одного
+        # пользователя не затирают задачи друг друга
+        stored_generation, data = self._entries.get(user_id) or (generation, _EMPTY)
+        bits = decode_bits(data) if stored_generation == generation else 0
+        self._entries.write(user_id, (generation, encode_bits(bits | added)))
+
+    async def close(self) -> None:
+        """
+        Записывает накопленные изменения и останавливает фоновую запись.
+        """
+        await self._entries.close()
+
+    async def flush(self) -> None:
+        """
+        Записывает все накопленные изменения в базу одной транзакцией.
+        """
+        await self._entries.flush()
+
+    async def _entry(self, user_id: int) -> _Entry:
+        """
+        Возвращает историю из памяти, при необходимости читая её из базы.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            return entry
+
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(
+                select(ServedRecord.generation, ServedRecord.bits).where(ServedRecord.user_id == user_id)
+            )).first()
+
+        # Пока шло чтение, история могла измениться или быть прочитана в этом процессе
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            return entry
+        entry = (row.generation, row.bits) if row else (0, _EMPTY)
+        self._entries.remember(user_id, entry)
+        return entry
+
+
+def _row(user_id: int, entry: _Entry, updated_at: float) -> dict:
+    generation, bits = entry
+    return {'user_id': user_id, 'generation': generation, 'bits': bits, 'updated_at': updated_at}
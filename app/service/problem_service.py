@@ -5,14 +5,17 @@
 """
 
 import random
-from typing import List, Optional, Type
+from typing import Hashable, List, Optional, Sequence, Type
 
-from sqlalchemy import and_
+from sqlalchemy import and_, func, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.crud.tag_crud import TagCRUD
 from app.models import Problem, Tag
+from app.pool_cache import expression_key, pool_cache, rating_key
+from app.served import bit_positions
+from app.tag_query import Node, to_sql_condition
 
 
 class ProblemService:
@@ -39,7 +42,8 @@ class ProblemService:
             category: str,
             points: Optional[float] = None,
             solved_count: int = 0,
-            tags: List[str] = None
+            tags: List[str] = None,
+            rating: Optional[int] = None
     ) -> Problem:
         """
         Создание новой задачи.
@@ -52,29 +56,28 @@ class ProblemService:
             points (Optional[float]): Количество очков
             solved_count (int): Количество решений
             tags (List[str]): Список тегов
+            rating (Optional[int]): Рейтинг задачи
         
         Returns:
             Problem: Созданная задача
         """
+        tag_crud = TagCRUD(self.db)
+        # Теги получаются до создания задачи: дозагрузка связи tags у новой
+        # задачи в асинхронной сессии невозможна
+        problem_tags = [await tag_crud.get_or_create(tag_name) for tag_name in tags or []]
+
         db_problem = Problem(
             contest_id=contest_id,
             index=index,
             name=name,
             category=category,
             points=points,
-            solved_count=solved_count
+            rating=rating,
+            solved_count=solved_count,
+            tags=problem_tags
         )
 
         self.db.add(db_problem)
-        await self.db.flush()
-
-        tag_crud = TagCRUD(self.db)
-
-        if tags:
-            for tag_name in tags:
-                tag = await tag_crud.get_or_create(tag_name)
-                db_problem.tags.append(tag)
-
         await self.db.commit()
         await self.db.refresh(db_problem)
         return db_problem
@@ -122,6 +125,28 @@ class ProblemService:
         )
         return result.scalars().all()
 
+    async def search_by_name(self, query: str, limit: int = 10) -> List[Problem]:
+        """
+        Поиск задач, название которых содержит запрос, без учёта регистра.
+
+        Более короткие названия, то есть более близкие к запросу, идут первыми.
+
+        Args:
+            query (str): Текст запроса
+            limit (int): Максимальное количество задач
+
+        Returns:
+            List[Problem]: Список найденных задач
+        """
+        pattern = "%" + query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        result = await self.db.execute(
+            select(Problem)
+            .filter(Problem.name.ilike(pattern, escape="\\"))
+            .order_by(func.length(Problem.name), Problem.id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
     async def get_random_by_tag_and_points_range(
             self,
             tag_name: str,
@@ -130,12 +155,17 @@ class ProblemService:
             limit: int = 10
     ) -> List[Problem]:
         """
-        Получение случайных задач по тегу и диапазону сложности.
+        Получение случайных задач по тегу и диапазону очков.
+
+        Выборка выполняется на стороне БД по столбцу random_key (см.
+        _sample_by_random_key): диапазон очков и порядок по random_key
+        покрываются индексом ix_problems_points_random_key. Используется, если
+        каталог в памяти выключен или ещё не загружен.
         
         Args:
             tag_name (str): Название тега
-            min_points (float): Минимальная сложность
-            max_points (Optional[float]): Максимальная сложность
+            min_points (float): Минимальное количество очков
+            max_points (Optional[float]): Максимальное количество очков
             limit (int): Максимальное количество задач
         
         Returns:
@@ -146,11 +176,210 @@ class ProblemService:
         if max_points is not None:
             conditions.append(Problem.points <= max_points)
 
-        result = await self.db.execute(
+        query = (
             select(Problem)
             .join(Problem.tags)
             .filter(and_(*conditions))
         )
-        problems = result.scalars().all()
+        return await self._sample_by_random_key(query, limit)
+
+    async def get_random_by_tag_and_rating_range(
+            self,
+            tag_name: str,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Получение случайных задач по тегу и диапазону рейтинга.
+
+        Задачи выбираются из множества подходящих идентификаторов в кэше (см.
+        _sample_pool), а если кэш выключен — на стороне БД по random_key:
+        диапазон рейтинга и порядок по random_key покрываются индексом
+        ix_problems_rating_random_key. Задачи без рейтинга не выбираются.
+
+        Args:
+            tag_name (str): Название тега
+            min_rating (int): Минимальный рейтинг
+            max_rating (Optional[int]): Максимальный рейтинг
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        conditions = [Tag.name == tag_name, Problem.rating >= min_rating]
+
+        if max_rating is not None:
+            conditions.append(Problem.rating <= max_rating)
+
+        query = (
+            select(Problem)
+            .join(Problem.tags)
+            .filter(and_(*conditions))
+        )
+        return await self._sample_pool(rating_key(tag_name, min_rating, max_rating), query, limit, exclude)
+
+    async def get_random_by_tag_expression(
+            self,
+            expression: Node,
+            min_rating: int,
+            max_rating: Optional[int] = None,
+            limit: int = 10,
+            exclude: int = 0
+    ) -> List[Problem]:
+        """
+        Получение случайных задач по выражению над тегами и диапазону рейтинга.
+
+        Args:
+            expression (Node): Дерево выражения из parse_tag_expression
+            min_rating (int): Минимальный рейтинг
+            max_rating (Optional[int]): Максимальный рейтинг
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач, которые выбираются
+                только при нехватке остальных
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        conditions = [to_sql_condition(expression), Problem.rating >= min_rating]
+
+        if max_rating is not None:
+            conditions.append(Problem.rating <= max_rating)
+
+        return await self._sample_pool(
+            expression_key(expression, min_rating, max_rating), select(Problem).filter(and_(*conditions)), limit, exclude
+        )
+
+    async def _sample_pool(self, key: Hashable, query, limit: int, exclude: int = 0) -> List[Problem]:
+        """
+        Выбирает до limit случайных задач запроса через кэш множеств подходящих задач.
+
+        Идентификаторы задач, подходящих под фильтр, берутся из кэша
+        (app.pool_cache), а при промахе читаются из базы одним запросом и
+        сохраняются в него. Из множества выбирается до limit идентификаторов
+        (см. _sample_ids), и эти задачи читаются по первичному ключу. Если кэш
+        выключен, задачи выбираются на стороне БД (см. _sample_by_random_key),
+        чтобы не читать все подходящие идентификаторы на каждый запрос.
+
+        Args:
+            key (Hashable): Нормализованный фильтр (rating_key или expression_key)
+            query (Select): Запрос задач с условиями отбора
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        if not pool_cache.enabled:
+            return await self._sample_by_random_key(query, limit, exclude)
+
+        ids = pool_cache.get(key)
+        if ids is None:
+            result = await self.db.execute(query.with_only_columns(Problem.id))
+            ids = pool_cache.put(key, result.scalars())
+
+        chosen = self._sample_ids(ids, limit, exclude)
+        if not chosen:
+            return []
+        result = await self.db.execute(select(Problem).filter(Problem.id.in_(chosen)))
+        problems = {problem.id: problem for problem in result.scalars()}
+        return [problems[problem_id] for problem_id in chosen if problem_id in problems]
+
+    @staticmethod
+    def _sample_ids(ids: Sequence[int], limit: int, exclude: int = 0) -> List[int]:
+        """
+        Выбирает до limit случайных идентификаторов, в первую очередь не из exclude.
+
+        Обычно исключённые задачи — малая доля множества, поэтому сначала
+        идентификаторы выбираются с отклонением за ограниченное число попыток, и
+        только если их не хватило, множество перебирается целиком.
+
+        Args:
+            ids (Sequence[int]): Идентификаторы подходящих задач
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач
+
+        Returns:
+            List[int]: Случайные идентификаторы
+        """
+        if not exclude:
+            return random.sample(ids, min(limit, len(ids)))
+
+        if len(ids) > limit:
+            chosen, tried = [], set()
+            for _ in range(4 * limit):
+                i = random.randrange(len(ids))
+                if i in tried:
+                    continue
+                tried.add(i)
+                if not exclude >> ids[i] & 1:
+                    chosen.append(ids[i])
+                    if len(chosen) == limit:
+                        return chosen
+
+        fresh = [problem_id for problem_id in ids if not exclude >> problem_id & 1]
+        chosen = random.sample(fresh, min(limit, len(fresh)))
+        if len(chosen) < limit:
+            excluded = [problem_id for problem_id in ids if exclude >> problem_id & 1]
+            chosen += random.sample(excluded, min(limit - len(chosen), len(excluded)))
+        return chosen
+
+    async def _sample_by_random_key(self, query, limit: int, exclude: int = 0) -> List[Problem]:
+        """
+        Выбирает до limit случайных строк запроса по столбцу random_key.
+
+        Для каждой задачи берётся своя случайная точка, а не одна точка на все
+        задачи: random_key назначается только при полной перезагрузке каталога,
+        поэтому N соседних строк после одной точки были бы окном фиксированной
+        перестановки, и одни и те же задачи всегда выпадали бы вместе. Все точки
+        проверяются одним запросом (UNION ALL выборок с LIMIT 1 по индексу).
+
+        Задачи из exclude отсеиваются в том же запросе; если остальных задач
+        меньше limit, недостающие выбираются из exclude.
+
+        Args:
+            query (Select): Запрос задач с условиями отбора
+            limit (int): Максимальное количество задач
+            exclude (int): Битовое множество идентификаторов задач
+
+        Returns:
+            List[Problem]: Список случайных задач
+        """
+        if exclude:
+            excluded = bit_positions(exclude)
+            problems = await self._sample_by_random_key(query.filter(Problem.id.notin_(excluded)), limit)
+            if len(problems) < limit:
+                problems += await self._sample_by_random_key(
+                    query.filter(Problem.id.in_(excluded)), limit - len(problems)
+                )
+            return problems
+
+        chosen: List[int] = []
+        while len(chosen) < limit:
+            # Каждая задача выбирается по своей точке pivot одним запросом: первая строка
+            # с random_key >= pivot, а если таких нет, первая строка с начала
+            remaining = query.filter(Problem.id.notin_(chosen)) if chosen else query
+            first = remaining.with_only_columns(Problem.id).order_by(Problem.random_key).limit(1)
+            draws = [
+                select(func.coalesce(
+                    first.filter(Problem.random_key >= random.random()).scalar_subquery(),
+                    first.scalar_subquery()
+                ))
+                for _ in range(limit - len(chosen))
+            ]
+            result = await self.db.execute(union_all(*draws) if len(draws) > 1 else draws[0])
+            # Разные точки могут попасть на одну задачу, повторы добираются следующим запросом
+            fresh = [problem_id for problem_id in dict.fromkeys(result.scalars().all()) if problem_id is not None]
+            if not fresh:
+                break
+            chosen += fresh
+
+        if not chosen:
+            return []
+        result = await self.db.execute(select(Problem).filter(Problem.id.in_(chosen)))
+        problems = list(result.scalars().all())
         random.shuffle(problems)
-        return problems[:limit]
+        return problems
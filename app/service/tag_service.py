@@ -4,12 +4,13 @@
 Этот модуль предоставляет бизнес-логику для работы с тегами в базе данных.
 """
 
-from typing import Type, List, Optional
+from typing import Type, List, Optional, Tuple
 
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.models import Tag
+from app.models import Tag, problem_tags
 
 
 class TagService:
@@ -83,3 +84,20 @@ class TagService:
         """
         result = await self.session.execute(select(Tag))
         return result.scalars().all()
+
+    async def get_problem_counts(self) -> List[Tuple[str, int]]:
+        """
+        Получение тегов с количеством задач.
+
+        Returns:
+            List[Tuple[str, int]]: Пары (название тега, количество задач),
+            упорядоченные по убыванию количества задач, затем по названию
+        """
+        count = func.count(problem_tags.c.problem_id)
+        result = await self.session.execute(
+            select(Tag.name, count)
+            .join(problem_tags, problem_tags.c.tag_id == Tag.id)
+            .group_by(Tag.name)
+            .order_by(count.desc(), Tag.name)
+        )
+        return [(name, problems) for name, problems in result]
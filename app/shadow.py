@@ -0,0 +1,177 @@
+"""
+Модуль обновления каталога через теневые таблицы.
+
+Новая копия таблиц каталога загружается в отдельную схему, проверяется и
+подменяет рабочие таблицы в одной транзакции, поэтому читатели не видят
+пустых или наполовину заполненных таблиц: до фиксации подмены они читают
+старый каталог, после — новый.
+
+Пока копия загружается, читатели не ждут. Ждут они только во время самой
+подмены: ALTER TABLE ... SET SCHEMA берёт блокировку ACCESS EXCLUSIVE на
+таблицы каталога до конца транзакции. Сначала подмена ждёт завершения
+запросов и транзакций, уже читающих эти таблицы, а новые запросы к ним
+встают в очередь за ней. Ожидание подмены ограничено SET LOCAL lock_timeout
+(SWAP_LOCK_TIMEOUT), поэтому читатели ждут не дольше этого времени плюс
+длительность переносов, которая не зависит от размера таблиц.
+
+Если блокировки не получены за SWAP_LOCK_TIMEOUT (например, из-за долгой
+транзакции, читающей каталог), PostgreSQL прерывает транзакцию подмены с
+ошибкой lock_not_available, рабочие таблицы не меняются, а подмена
+повторяется до SWAP_ATTEMPTS раз с паузой SWAP_RETRY_DELAY (см.
+app.fill_db). Если все попытки неудачны, теневая копия удаляется, ошибка
+записывается в журнал, и каталог обновит следующий запуск по расписанию.
+
+Этот модуль отвечает за:
+1. Создание теневой схемы с таблицами каталога
+2. Проверку загруженной копии
+3. Атомарную подмену рабочих таблиц теневыми
+4. Распознавание прерванной по lock_timeout подмены
+"""
+
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from app.models import Base, CATALOG_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Схема с рабочими таблицами
+LIVE_SCHEMA = "public"
+# Схема, в которую загружается новая копия каталога
+SHADOW_SCHEMA = "catalog_shadow"
+# Схема, в которую на время подмены переносятся старые таблицы
+RETIRED_SCHEMA = "catalog_retired"
+
+# Карта подмены схем, направляющая таблицы каталога в теневую схему
+SHADOW_TRANSLATE_MAP = {None: SHADOW_SCHEMA}
+
+# Минимальная доля задач относительно текущего каталога, при которой новая копия считается корректной
+MIN_SHADOW_RATIO = 0.9
+# Максимальное время ожидания блокировок при подмене таблиц
+SWAP_LOCK_TIMEOUT = "5s"
+# Количество попыток подмены и пауза между ними, в секундах
+SWAP_ATTEMPTS = 3
+SWAP_RETRY_DELAY = 30.0
+# Код ошибки PostgreSQL lock_not_available, которой завершается ожидание дольше lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def shadow_connection(connection: Connection) -> Connection:
+    """
+    Настраивает соединение так, чтобы таблицы каталога указывали на теневую схему.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy
+
+    Returns:
+        Connection: То же соединение с картой подмены схем
+    """
+    return connection.execution_options(schema_translate_map=SHADOW_TRANSLATE_MAP)
+
+
+def create_shadow_tables(connection: Connection) -> None:
+    """
+    Пересоздаёт теневую схему и таблицы каталога в ней.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy без карты подмены схем
+    """
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SHADOW_SCHEMA}"))
+    Base.metadata.create_all(shadow_connection(connection), tables=CATALOG_TABLES)
+
+
+def _table_counts(connection: Connection, schema: str) -> Optional[Dict[str, int]]:
+    """
+    Считает строки в таблицах каталога указанной схемы.
+
+    Returns:
+        Optional[Dict[str, int]]: Количество строк по таблицам или None, если таблиц нет
+    """
+    counts = {}
+    for table in CATALOG_TABLES:
+        name = f"{schema}.{table.name}"
+        if connection.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is None:
+            return None
+        counts[table.name] = connection.scalar(text(f"SELECT count(*) FROM {name}"))
+    return counts
+
+
+def is_shadow_complete(shadow: Dict[str, int], live: Optional[Dict[str, int]]) -> bool:
+    """
+    Проверяет, что теневая копия пригодна для подмены рабочих таблиц.
+
+    Args:
+        shadow (Dict[str, int]): Количество строк в теневых таблицах
+        live (Optional[Dict[str, int]]): Количество строк в рабочих таблицах или None
+
+    Returns:
+        bool: True, если копия не пуста и не сильно меньше текущего каталога
+    """
+    if not shadow.get("problems") or not shadow.get("tags"):
+        return False
+    if not live:
+        return True
+    return shadow["problems"] >= live["problems"] * MIN_SHADOW_RATIO
+
+
+def swap_shadow_tables(connection: Connection) -> bool:
+    """
+    Проверяет теневую копию и подменяет ею рабочие таблицы.
+
+    Вызывается внутри транзакции: переносы таблиц между схемами применяются
+    одновременно при её фиксации. С первого переноса до фиксации запросы к
+    таблицам каталога ждут (см. описание модуля).
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy без карты подмены схем
+
+    Returns:
+        bool: True, если таблицы подменены
+
+    Raises:
+        DBAPIError: Если блокировки не получены за SWAP_LOCK_TIMEOUT (см. is_lock_timeout)
+    """
+    shadow = _table_counts(connection, SHADOW_SCHEMA)
+    live = _table_counts(connection, LIVE_SCHEMA)
+    if shadow is None or not is_shadow_complete(shadow, live):
+        logger.error("Теневая копия каталога не прошла проверку: %s (текущий каталог: %s)", shadow, live)
+        return False
+
+    connection.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {RETIRED_SCHEMA}"))
+    for table in CATALOG_TABLES:
+        if live is not None:
+            connection.execute(text(f"ALTER TABLE {LIVE_SCHEMA}.{table.name} SET SCHEMA {RETIRED_SCHEMA}"))
+        connection.execute(text(f"ALTER TABLE {SHADOW_SCHEMA}.{table.name} SET SCHEMA {LIVE_SCHEMA}"))
+    return True
+
+
+def drop_stale_schemas(connection: Connection) -> None:
+    """
+    Удаляет старые таблицы и остатки теневой схемы после обновления.
+
+    Args:
+        connection (Connection): Соединение SQLAlchemy без карты подмены схем
+    """
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE"))
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE"))
+
+
+def is_lock_timeout(error: DBAPIError) -> bool:
+    """
+    Проверяет, что запрос прерван из-за ожидания блокировки дольше lock_timeout.
+
+    Args:
+        error (DBAPIError): Ошибка драйвера базы данных
+
+    Returns:
+        bool: True для ошибки lock_not_available
+    """
+    orig = error.orig
+    return (getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)) == LOCK_NOT_AVAILABLE
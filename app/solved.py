@@ -0,0 +1,394 @@
+"""
+Модуль задач, решённых пользователями на Codeforces.
+
+Пользователь привязывает хэндл Codeforces, и при выборе задач решённые им
+задачи исключаются. Решённые задачи хэндла хранятся в памяти битовым
+множеством идентификаторов задач (как история показанных задач, см.
+app.served) вместе с номером последней учтённой посылки.
+
+Выбор задач берёт множество из памяти и никогда не ждёт Codeforces API:
+устаревшее множество (старше SOLVED_TTL) обновляется в фоне, и из метода
+user.status запрашиваются только посылки новее последней учтённой —
+страницами по SOLVED_PAGE_SIZE, пока не встретится уже учтённая. Полная
+история посылок загружается при привязке хэндла и после смены поколения
+каталога (идентификаторы задач действительны только в пределах поколения, см.
+app.generation).
+
+Этот модуль отвечает за:
+1. Запросы к методу user.status Codeforces API с ограничением частоты
+2. Хранение привязки пользователя Telegram к хэндлу
+3. Хранение решённых задач хэндлов в памяти с вытеснением и временем жизни
+4. Инкрементальную фоновую синхронизацию решённых задач
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import dialect_insert
+from app.metrics import CODEFORCES_API_SECONDS, SOLVED_SYNCS
+from app.models import HandleRecord, Problem
+from constants import CODEFORCES_API_INTERVAL, CODEFORCES_API_URL, SOLVED_CACHE_SIZE, SOLVED_PAGE_SIZE, SOLVED_TTL
+
+logger = logging.getLogger(__name__)
+
+# Ограничение времени запроса к Codeforces API, в секундах
+REQUEST_TIMEOUT = 30
+# Количество задач, идентификаторы которых запрашиваются из базы одним запросом
+RESOLVE_BATCH_SIZE = 500
+
+# Естественный ключ задачи: (contest_id, index)
+ProblemKey = Tuple[int, str]
+
+
+class CodeforcesError(Exception):
+    """
+    Ошибка Codeforces API: ответ со статусом FAILED, ошибка HTTP или превышение времени ожидания.
+    """
+
+
+class CodeforcesClient:
+    """
+    Клиент Codeforces API с интервалом не меньше interval секунд между запросами.
+
+    Codeforces ограничивает частоту запросов с одного адреса, поэтому все
+    запросы процесса выполняются по очереди.
+
+    Attributes:
+        base_url (str): Адрес API без завершающего /
+        interval (float): Минимальный интервал между запросами, в секундах
+        timeout (float): Ограничение времени запроса, в секундах
+    """
+
+    def __init__(
+            self,
+            base_url: str = CODEFORCES_API_URL,
+            interval: float = CODEFORCES_API_INTERVAL,
+            timeout: float = REQUEST_TIMEOUT
+    ):
+        """
+        Инициализация клиента.
+
+        Args:
+            base_url (str): Адрес API
+            interval (float): Минимальный интервал между запросами, в секундах
+            timeout (float): Ограничение времени запроса, в секундах
+        """
+        self.base_url = base_url.rstrip("/")
+        self.interval = interval
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def user_status(self, handle: str, start: int = 1, count: Optional[int] = None) -> List[dict]:
+        """
+        Возвращает посылки пользователя, начиная с самых новых.
+
+        Args:
+            handle (str): Хэндл Codeforces
+            start (int): Номер первой посылки (с 1)
+            count (Optional[int]): Количество посылок; по умолчанию — все
+
+        Returns:
+            List[dict]: Посылки в формате result метода user.status
+
+        Raises:
+            CodeforcesError: Если API вернуло ошибку или не ответило за timeout секунд
+        """
+        params = {"handle": handle, "from": str(start)}
+        if count is not None:
+            params["count"] = str(count)
+        return await self._call("user.status", params)
+
+    async def close(self) -> None:
+        """
+        Закрывает HTTP-сессию клиента.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _call(self, method: str, params: Dict[str, str]) -> list:
+        async with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._session is None:
+                self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+            try:
+                with CODEFORCES_API_SECONDS.time(method):
+                    async with self._session.get(f"{self.base_url}/{method}", params=params) as response:
+                        try:
+                            data = await response.json(content_type=None)
+                        except ValueError:
+                            data = {}
+            except aiohttp.ClientError as error:
+                raise CodeforcesError(f"{method}: {error}") from error
+            except asyncio.TimeoutError as error:
+                # Превышение общего ограничения ClientTimeout не является ClientError
+                raise CodeforcesError(f"{method}: нет ответа за {self.timeout:g} с") from error
+            finally:
+                self._next_at = time.monotonic() + self.interval
+        if data.get("status") != "OK":
+            raise CodeforcesError(data.get("comment") or f"{method}: HTTP {response.status}")
+        return data["result"]
+
+
+def accepted_keys(submissions: Iterable[dict]) -> Set[ProblemKey]:
+    """
+    Возвращает ключи задач из проблемсета, для которых есть принятые посылки.
+
+    Args:
+        submissions (Iterable[dict]): Посылки в формате user.status
+
+    Returns:
+        Set[ProblemKey]: Ключи (contest_id, index) решённых задач
+    """
+    return {
+        (submission["problem"]["contestId"], submission["problem"]["index"])
+        for submission in submissions
+        if submission.get("verdict") == "OK" and "contestId" in submission["problem"]
+    }
+
+
+class _Solved:
+    """
+    Решённые задачи хэндла в одном поколении каталога.
+    """
+
+    __slots__ = ("generation", "bits", "last_id", "unresolved", "synced")
+
+    def __init__(self, generation: int, bits: int, last_id: int, unresolved: FrozenSet[ProblemKey]):
+        self.generation = generation
+        self.bits = bits
+        # Номер самой новой учтённой посылки
+        self.last_id = last_id
+        # Решённые задачи, которых нет в каталоге (например, ещё не загруженные)
+        self.unresolved = unresolved
+        self.synced = time.monotonic()
+
+
+class SolvedStore:
+    """
+    Привязки хэндлов Codeforces и решённые хэндлами задачи.
+
+    Attributes:
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+        client (CodeforcesClient): Клиент Codeforces API
+        ttl (float): Через сколько секунд решённые задачи синхронизируются снова
+        cache_size (int): Максимальное количество хэндлов и привязок в памяти
+        page_size (int): Посылок в одном запросе при дозагрузке новых
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            client: Optional[CodeforcesClient] = None,
+            ttl: float = SOLVED_TTL,
+            cache_size: int = SOLVED_CACHE_SIZE,
+            page_size: int = SOLVED_PAGE_SIZE
+    ):
+        """
+        Инициализация хранилища.
+
+        Args:
+            engine (AsyncEngine): Асинхронный движок SQLAlchemy
+            client (Optional[CodeforcesClient]): Клиент Codeforces API; по умолчанию — api.codeforces.com
+            ttl (float): Через сколько секунд решённые задачи синхронизируются снова
+            cache_size (int): Максимальное количество хэндлов и привязок в памяти
+            page_size (int): Посылок в одном запросе при дозагрузке новых
+        """
+        self.engine = engine
+        self.client = client or CodeforcesClient()
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.page_size = page_size
+
+        self._solved: 'OrderedDict[str, _Solved]' = OrderedDict()
+        # Пользователь -> хэндл (None, если хэндл не привязан)
+        self._handles: 'OrderedDict[int, Optional[str]]' = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Хэндл -> время по time.monotonic(), до которого не повторять неудавшуюся синхронизацию
+        self._retry_at: Dict[str, float] = {}
+
+        table = HandleRecord.__table__
+        upsert = dialect_insert(engine, table)
+        self._upsert = upsert.on_conflict_do_update(index_elements=['user_id'], set_={'handle': upsert.excluded.handle})
+
+    async def handle(self, user_id: int) -> Optional[str]:
+        """
+        Возвращает хэндл, привязанный пользователем, читая его из базы при первом обращении.
+
+        Args:
+            user_id (int): ID пользователя Telegram
+
+        Returns:
+            Optional[str]: Хэндл Codeforces или None
+        """
+        if user_id in self._handles:
+            self._handles.move_to_end(user_id)
+            return self._handles[user_id]
+        async with self.engine.connect() as connection:
+            handle = await connection.scalar(select(HandleRecord.handle).where(HandleRecord.user_id == user_id))
+        self._remember_handle(user_id, handle)
+        return handle
+
+    async def link(self, user_id: int, handle: str, generation: int) -> int:
+        """
+        Привязывает хэндл к пользователю, загрузив полную историю его посылок.
+
+        Args:
+            user_id (int): ID пользователя Telegram
+            handle (str): Хэндл Codeforces
+            generation (int): Текущее поколение каталога
+
+        Returns:
+            int: Количество решённых задач каталога
+
+        Raises:
+            CodeforcesError: Если хэндл не найден или API недоступно
+        """
+        bits = await self.sync(handle, generation, full=True)
+        async with self.engine.begin() as connection:
+            await connection.execute(self._upsert, {'user_id': user_id, 'handle': handle})
+        self._remember_handle(user_id, handle)
+        return bits.bit_count()
+
+    async def unlink(self, user_id: int) -> None:
+        """
+        Удаляет привязку хэндла пользователя.
+
+        Args:
+            user_id (int): ID пользователя Telegram
+        """
+        async with self.engine.begin() as connection:
+            await connection.execute(HandleRecord.__table__.delete().where(HandleRecord.user_id == user_id))
+        self._remember_handle(user_id, None)
+
+    def solved(self, handle: str, generation: int) -> int:
+        """
+        Возвращает решённые хэндлом задачи из памяти, не обращаясь к Codeforces.
+
+        Если множества нет, оно собрано в другом поколении или устарело, запускает
+        фоновую синхронизацию; до её завершения возвращается то, что есть.
+
+        Args:
+            handle (str): Хэндл Codeforces
+            generation (int): Текущее поколение каталога
+
+        Returns:
+            int: Битовое множество идентификаторов задач (0, если ещё неизвестно)
+        """
+        entry = self._solved.get(handle)
+        if entry is not None:
+            self._solved.move_to_end(handle)
+        if entry is None or entry.generation != generation or entry.synced + self.ttl <= time.monotonic():
+            self._schedule(handle, generation)
+        return entry.bits if entry is not None and entry.generation == generation else 0
+
+    async def sync(self, handle: str, generation: int, full: bool = False) -> int:
+        """
+        Загружает новые посылки хэндла и дополняет множество решённых задач.
+
+        Args:
+            handle (str): Хэндл Codeforces
+            generation (int): Текущее поколение каталога
+            full (bool): Загрузить всю историю посылок заново
+
+        Returns:
+            int: Битовое множество идентификаторов решённых задач
+
+        Raises:
+            CodeforcesError: Если API вернуло ошибку
+        """
+        entry = self._solved.get(handle)
+        if full or entry is None or entry.generation != generation:
+            submissions = await self.client.user_status(handle)
+            bits, last_id, pending = 0, 0, set()
+            SOLVED_SYNCS.inc(1, "full")
+        else:
+            submissions = await self._newer_submissions(handle, entry.last_id)
+            bits, last_id, pending = entry.bits, entry.last_id, set(entry.unresolved)
+            SOLVED_SYNCS.inc(1, "incremental")
+
+        pending |= accepted_keys(submissions)
+        resolved = await self._resolve(pending)
+        for problem_id in resolved.values():
+            bits |= 1 << problem_id
+        last_id = max((submission["id"] for submission in submissions), default=last_id)
+
+        self._solved[handle] = _Solved(generation, bits, last_id, frozenset(pending - resolved.keys()))
+        self._solved.move_to_end(handle)
+        while len(self._solved) > self.cache_size:
+            self._solved.popitem(last=False)
+        self._retry_at.pop(handle, None)
+        return bits
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновые синхронизации и закрывает клиент API.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.close()
+
+    async def _newer_submissions(self, handle: str, last_id: int) -> List[dict]:
+        """
+        Загружает посылки новее last_id страницами, от новых к старым.
+        """
+        submissions: List[dict] = []
+        start = 1
+        while True:
+            page = await self.client.user_status(handle, start, self.page_size)
+            newer = [submission for submission in page if submission["id"] > last_id]
+            submissions += newer
+            if len(newer) < len(page) or len(page) < self.page_size:
+                return submissions
+            start += self.page_size
+
+    async def _resolve(self, keys: Set[ProblemKey]) -> Dict[ProblemKey, int]:
+        """
+        Находит идентификаторы задач каталога по естественным ключам.
+        """
+        resolved: Dict[ProblemKey, int] = {}
+        ordered = sorted(keys)
+        async with self.engine.connect() as connection:
+            for offset in range(0, len(ordered), RESOLVE_BATCH_SIZE):
+                rows = await connection.execute(
+                    select(Problem.contest_id, Problem.index, Problem.id)
+                    .where(tuple_(Problem.contest_id, Problem.index).in_(ordered[offset:offset + RESOLVE_BATCH_SIZE]))
+                )
+                resolved.update(((contest_id, index), problem_id) for contest_id, index, problem_id in rows)
+        return resolved
+
+    def _schedule(self, handle: str, generation: int) -> None:
+        if handle in self._tasks or self._retry_at.get(handle, 0.0) > time.monotonic():
+            return
+        task = asyncio.create_task(self._sync_in_background(handle, generation))
+        self._tasks[handle] = task
+        task.add_done_callback(lambda _: self._tasks.pop(handle, None))
+
+    async def _sync_in_background(self, handle: str, generation: int) -> None:
+        try:
+            await self.sync(handle, generation)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Не удалось синхронизировать решённые задачи %s", handle, exc_info=True)
+            SOLVED_SYNCS.inc(1, "error")
+            self._retry_at[handle] = time.monotonic() + min(self.ttl, 60.0)
+
+    def _remember_handle(self, user_id: int, handle: Optional[str]) -> None:
+        self._handles[user_id] = handle
+        self._handles.move_to_end(user_id)
+        while len(self._handles) > self.cache_size:
+            self._handles.popitem(last=False)
@@ -0,0 +1,194 @@
+"""
+Модуль выражений над тегами задач.
+
+Выражение вида «dp AND graphs AND NOT math» разбирается в дерево, которое
+можно вычислить над битовыми множествами задач (по одному числу на тег) или
+преобразовать в условие SQL-запроса.
+
+Синтаксис:
+    - операторы AND, OR, NOT (в любом регистре) или &, |, !
+    - приоритет: NOT, затем AND, затем OR; допускаются скобки
+    - название тега — подряд идущие слова, не являющиеся операторами
+      (например, «data structures»); название, содержащее слово-оператор,
+      записывается в двойных кавычках: "dfs and similar"
+"""
+
+import re
+from typing import Dict, List, Tuple, Union
+
+from sqlalchemy import and_, not_, or_, select
+
+from app.models import Problem, Tag, problem_tags
+
+# Узел дерева выражения: ('tag', name), ('not', node), ('and', left, right) или ('or', left, right)
+Node = Tuple[Union[str, tuple], ...]
+
+_TOKEN = re.compile(r'\s*("[^"]*"|\(|\)|&|\||!|[^\s()&|!"]+)')
+_OPERATORS = {'and': '&', 'or': '|', 'not': '!', '&': '&', '|': '|', '!': '!', '(': '(', ')': ')'}
+
+
+class TagExpressionError(ValueError):
+    """
+    Ошибка разбора выражения над тегами.
+    """
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    """
+    Разбивает выражение на операторы и названия тегов.
+
+    Returns:
+        List[Tuple[str, str]]: Пары (вид, значение), где вид — оператор или 'tag'
+    """
+    tokens: List[Tuple[str, str]] = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None:
+            raise TagExpressionError("Не закрыта кавычка")
+        word = match.group(1)
+        position = match.end()
+        operator = _OPERATORS.get(word.lower())
+        if word.startswith('"'):
+            tokens.append(('tag', word[1:-1].strip()))
+        elif operator is not None:
+            tokens.append((operator, word))
+        elif tokens and tokens[-1][0] == 'tag':
+            tokens[-1] = ('tag', f"{tokens[-1][1]} {word}")
+        else:
+            tokens.append(('tag', word))
+    return tokens
+
+
+class _Parser:
+    """
+    Нисходящий разбор выражения по приоритетам операторов.
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self) -> str:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else ''
+
+    def parse(self) -> Node:
+        node = self._or()
+        if self.position != len(self.tokens):
+            raise TagExpressionError(f"Неожиданный элемент: {self.tokens[self.position][1]}")
+        return node
+
+    def _or(self) -> Node:
+        node = self._and()
+        while self._peek() == '|':
+            self.position += 1
+            node = ('or', node, self._and())
+        return node
+
+    def _and(self) -> Node:
+        node = self._not()
+        while self._peek() == '&':
+            self.position += 1
+            node = ('and', node, self._not())
+        return node
+
+    def _not(self) -> Node:
+        if self._peek() == '!':
+            self.position += 1
+            return ('not', self._not())
+        return self._atom()
+
+    def _atom(self) -> Node:
+        kind = self._peek()
+        if kind == 'tag':
+            self.position += 1
+            return ('tag', self.tokens[self.position - 1][1].lower())
+        if kind == '(':
+            self.position += 1
+            node = self._or()
+            if self._peek() != ')':
+                raise TagExpressionError("Не закрыта скобка")
+            self.position += 1
+            return node
+        raise TagExpressionError("Ожидалось название тега")
+
+
+def parse_tag_expression(expression: str) -> Node:
+    """
+    Разбирает выражение над тегами.
+
+    Args:
+        expression (str): Текст выражения
+
+    Returns:
+        Node: Дерево выражения
+
+    Raises:
+        TagExpressionError: Если выражение некорректно
+    """
+    tokens = _tokenize(expression)
+    if not tokens:
+        raise TagExpressionError("Пустое выражение")
+    return _Parser(tokens).parse()
+
+
+def quote_tag(name: str) -> str:
+    """
+    Записывает название тега так, чтобы оно читалось как один тег.
+
+    Args:
+        name (str): Название тега
+
+    Returns:
+        str: Название, при необходимости заключённое в кавычки
+    """
+    words = name.split()
+    if len(words) > 1 or any(word.lower() in _OPERATORS for word in words):
+        return f'"{name}"'
+    return name
+
+
+def evaluate_bitset(node: Node, bitsets: Dict[str, int], universe: int) -> int:
+    """
+    Вычисляет выражение над битовыми множествами.
+
+    Args:
+        node (Node): Дерево выражения
+        bitsets (Dict[str, int]): Битовое множество задач для каждого тега
+        universe (int): Битовое множество всех задач
+
+    Returns:
+        int: Битовое множество задач, удовлетворяющих выражению
+    """
+    kind = node[0]
+    if kind == 'tag':
+        return bitsets.get(node[1], 0)
+    if kind == 'not':
+        return universe & ~evaluate_bitset(node[1], bitsets, universe)
+    left = evaluate_bitset(node[1], bitsets, universe)
+    right = evaluate_bitset(node[2], bitsets, universe)
+    return left & right if kind == 'and' else left | right
+
+
+def to_sql_condition(node: Node):
+    """
+    Преобразует выражение в условие на задачи для SQL-запроса.
+
+    Args:
+        node (Node): Дерево выражения
+
+    Returns:
+        ColumnElement: Условие для фильтрации Problem
+    """
+    kind = node[0]
+    if kind == 'tag':
+        return Problem.id.in_(
+            select(problem_tags.c.problem_id)
+            .join(Tag, Tag.id == problem_tags.c.tag_id)
+            .where(Tag.name == node[1])
+        )
+    if kind == 'not':
+        return not_(to_sql_condition(node[1]))
+    combine = and_ if kind == 'and' else or_
+    return combine(to_sql_condition(node[1]), to_sql_condition(node[2]))
@@ -0,0 +1,163 @@
+"""
+Модуль кэша с отложенной записью в базу данных (write-behind).
+
+Записи хранятся в памяти (LRU), изменённые записи помечаются и
+записываются в базу одной транзакцией пачками в фоне не позже чем через
+flush_interval секунд и при закрытии. Из памяти вытесняются только уже
+записанные записи, поэтому изменения не теряются при переполнении кэша.
+
+Этот модуль отвечает за:
+1. Хранение записей в памяти с вытеснением давно не использованных
+2. Учёт изменённых, но ещё не записанных записей
+3. Пакетную отложенную запись изменений с повтором при ошибке
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql import Executable
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class WriteBehindCache(Generic[K, V]):
+    """
+    LRU-кэш записей с отложенной пакетной записью изменений в базу.
+
+    Attributes:
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+        upsert (Executable): Запрос вставки или обновления строк
+        to_row (Callable[[K, V, float], dict]): Строит параметры upsert по ключу, записи и времени изменения
+        description (str): Что хранится в кэше, для сообщений в журнале
+        flush_interval (float): Задержка записи изменений, в секундах
+        cache_size (int): Максимальное количество записей в памяти
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            upsert: Executable,
+            to_row: Callable[[K, V, float], dict],
+            description: str,
+            flush_interval: float,
+            cache_size: int
+    ):
+        """
+        Инициализация кэша.
+
+        Args:
+            engine (AsyncEngine): Асинхронный движок SQLAlchemy
+            upsert (Executable): Запрос вставки или обновления строк
+            to_row (Callable[[K, V, float], dict]): Строит параметры upsert по ключу, записи и времени изменения
+            description (str): Что хранится в кэше, для сообщений в журнале
+            flush_interval (float): Задержка записи изменений, в секундах
+            cache_size (int): Максимальное количество записей в памяти
+        """
+        self.engine = engine
+        self.upsert = upsert
+        self.to_row = to_row
+        self.description = description
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+
+        self._cache: 'OrderedDict[K, V]' = OrderedDict()
+        # Изменённые, но ещё не записанные ключи и время изменения по time.time()
+        self._dirty: Dict[K, float] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Возвращает запись из памяти или None, отмечая её как недавно использованную.
+        """
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+        return value
+
+    def is_dirty(self, key: K) -> bool:
+        """
+        Проверяет, что запись изменена и ещё не записана в базу.
+        """
+        return key in self._dirty
+
+    def remember(self, key: K, value: V) -> None:
+        """
+        Помещает в память запись, совпадающую с базой (например, только что прочитанную).
+        """
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        self._evict()
+
+    def write(self, key: K, value: V) -> None:
+        """
+        Изменяет запись и планирует её запись в базу.
+        """
+        self._dirty[key] = time.time()
+        self.remember(key, value)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def close(self) -> None:
+        """
+        Записывает накопленные изменения и останавливает фоновую запись.
+        """
+        await self.flush()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+
+    async def flush(self) -> None:
+        """
+        Записывает все накопленные изменения в базу одной транзакцией.
+
+        При ошибке изменения остаются в очереди и записываются при следующей попытке.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            # Пока идёт запись, ключи пачки не считаются изменёнными и могут быть вытеснены,
+            # поэтому записи запоминаются вместе с пачкой
+            pending: Dict[K, Tuple[float, V]] = {key: (updated_at, self._cache[key]) for key, updated_at in batch.items()}
+            rows = [self.to_row(key, value, updated_at) for key, (updated_at, value) in pending.items()]
+            try:
+                async with self.engine.begin() as connection:
+                    await connection.execute(self.upsert, rows)
+            except asyncio.CancelledError:
+                self._requeue(pending)
+                raise
+            except Exception:
+                logger.exception("Ошибка записи %s: %d записей остаются в очереди", self.description, len(rows))
+                self._requeue(pending)
+            else:
+                self._evict()
+
+    def _requeue(self, pending: Dict[K, Tuple[float, V]]) -> None:
+        # Записи, изменённые во время записи пачки, новее записей пачки
+        for key, (updated_at, value) in pending.items():
+            if key not in self._dirty:
+                self._dirty[key] = updated_at
+                self._cache[key] = value
+
+    async def _flush_later(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _evict(self) -> None:
+        excess = len(self._cache) - self.cache_size
+        if excess > 0:
+            # Незаписанные изменения из памяти не вытесняются
+            for stale in list(islice((key for key in self._cache if key not in self._dirty), excess)):
+                del self._cache[stale]
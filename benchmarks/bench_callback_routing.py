@@ -0,0 +1,85 @@
+"""
+Бенчмарк выбора обработчика callback-запроса.
+
+Сравнивает стоимость обработки одного callback-запроса через диспетчер
+aiogram при двух способах регистрации N обработчиков:
+    - filters: по обработчику на префикс с фильтром-лямбдой, как было раньше;
+      запрос проверяется фильтрами по порядку
+    - router: один обработчик aiogram и CallbackRouter с N кодами
+Запрос адресован последнему зарегистрированному обработчику, то есть для
+фильтров это худший случай.
+
+Запуск:
+    python -m benchmarks.bench_callback_routing --rounds 20000 --handlers 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import CallbackQuery, Update, User
+
+from bot.callbacks import CallbackRouter
+
+
+async def _noop(callback, *args):
+    return None
+
+
+def _filters_dispatcher(handlers: int) -> Dispatcher:
+    dispatcher = Dispatcher()
+    for i in range(handlers):
+        prefix = f"op{i}:"
+        dispatcher.callback_query(lambda c, prefix=prefix: c.data and c.data.startswith(prefix))(_noop)
+    return dispatcher
+
+
+def _router_dispatcher(handlers: int) -> Dispatcher:
+    dispatcher = Dispatcher()
+    router = CallbackRouter()
+    for i in range(handlers):
+        router.handler(f"op{i}", int)(_noop)
+
+    @dispatcher.callback_query()
+    async def route(callback: CallbackQuery):
+        return await router.dispatch(callback)
+
+    return dispatcher
+
+
+async def _measure(dispatcher: Dispatcher, bot: Bot, update: Update, rounds: int) -> float:
+    for _ in range(rounds // 10):
+        await dispatcher.feed_update(bot, update)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await dispatcher.feed_update(bot, update)
+    return (time.perf_counter() - started) / rounds
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20_000, help="количество запросов на замер")
+    parser.add_argument("--handlers", type=int, nargs="+", default=[1, 8, 32, 128], help="количества обработчиков")
+    args = parser.parse_args()
+
+    bot = Bot(token="42:TEST")
+    for handlers in args.handlers:
+        callback = CallbackQuery(
+            id="1",
+            from_user=User(id=1, is_bot=False, first_name="Test"),
+            chat_instance="1",
+            data=f"op{handlers - 1}:1"
+        )
+        update = Update(update_id=1, callback_query=callback)
+        filters = await _measure(_filters_dispatcher(handlers), bot, update, args.rounds)
+        router = await _measure(_router_dispatcher(handlers), bot, update, args.rounds)
+        print(
+            f"{handlers:>4} обработчиков: filters {filters * 1_000_000:.1f} мкс, "
+            f"router {router * 1_000_000:.1f} мкс на запрос"
+        )
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Бенчмарк кэша множеств подходящих задач.
+
+Выполняет поток запросов get_random_by_tag_and_rating_range с фильтрами,
+которые может выбрать пользователь (тема и диапазон рейтинга с клавиатуры), без
+кэша (выборка по random_key в БД) и с кэшем, и выводит задержку запроса, долю
+попаданий и память кэша.
+
+Запуск:
+    python -m benchmarks.bench_pool_cache --count 50000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.pool_cache import pool_cache
+from app.service.problem_service import ProblemService
+from benchmarks.synthetic import TAG_FREQUENCIES, seed_database
+from bot.keyboards import DIFFICULTIES
+
+RATINGS = [int(difficulty) for difficulty in DIFFICULTIES]
+
+
+def _filters(requests: int, seed: int):
+    rnd = random.Random(seed)
+    tags, weights = list(TAG_FREQUENCIES), list(TAG_FREQUENCIES.values())
+    filters = []
+    for _ in range(requests):
+        low = rnd.choice(RATINGS[:-1])
+        filters.append((rnd.choices(tags, weights)[0], low, rnd.choice([r for r in RATINGS if r > low])))
+    return filters
+
+
+async def _measure(engine, filters, cached: bool):
+    pool_cache.clear()
+    pool_cache.enabled = cached
+    hits, misses = pool_cache.hits, pool_cache.misses
+    latencies = []
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        service = ProblemService(session)
+        for tag_name, low, high in filters:
+            started = time.perf_counter()
+            await service.get_random_by_tag_and_rating_range(tag_name, low, high, limit=10)
+            latencies.append(time.perf_counter() - started)
+            session.expunge_all()
+    latencies.sort()
+    total = (pool_cache.hits - hits) + (pool_cache.misses - misses)
+    hit_rate = (pool_cache.hits - hits) / total if total else 0.0
+    print(
+        f"{'с кэшем' if cached else 'без кэша':>9}: медиана {statistics.median(latencies) * 1000:.2f} мс, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} мс, попадания {hit_rate:.0%}, "
+        f"память кэша {pool_cache.stats()['bytes'] / 1024:.0f} КиБ в {pool_cache.stats()['entries']} записях"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=50_000, help="количество задач")
+    parser.add_argument("--requests", type=int, default=2_000, help="количество запросов")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    parser.add_argument("--url", default="sqlite+aiosqlite://", help="URL асинхронного подключения к БД")
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.url)
+    await seed_database(engine, args.count, args.seed)
+    filters = _filters(args.requests, args.seed)
+    await _measure(engine, filters, cached=False)
+    await _measure(engine, filters, cached=True)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
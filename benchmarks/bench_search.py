@@ -0,0 +1,81 @@
+"""
+Бенчмарк поиска задач по названию.
+
+Для каждого размера каталога (названия генерирует Faker, см.
+benchmarks.synthetic.generate_catalog) измеряет:
+    - время построения индекса триграмм и количество триграмм
+    - задержку запросов: медиану, p99 и максимум
+
+Запросы — одно-два слова из названий случайных задач, в части которых
+сделана опечатка (удалена одна буква), и слова, которых нет в каталоге.
+
+Запуск:
+    python -m benchmarks.bench_search --sizes 10000 50000 200000 --queries 1000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.models import Problem
+from app.search import NameIndex
+from benchmarks.synthetic import generate_catalog
+
+# Доля запросов с опечаткой
+TYPO_SHARE = 0.3
+# Запросы, для которых в каталоге нет похожих названий
+MISSES = ("zzyzx", "qwjx vbkp")
+
+
+def _queries(names, count: int, seed: int):
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rnd.choice(names).split()
+        start = rnd.randrange(len(words))
+        query = " ".join(words[start:start + rnd.randint(1, 2)])
+        if len(query) > 4 and rnd.random() < TYPO_SHARE:
+            position = rnd.randrange(len(query))
+            query = query[:position] + query[position + 1:]
+        queries.append(query)
+    return queries + list(MISSES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000], help="размеры каталога")
+    parser.add_argument("--queries", type=int, default=1000, help="количество запросов на размер")
+    parser.add_argument("--limit", type=int, default=10, help="количество задач в ответе")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        problems = [
+            Problem(id=i, contest_id=item['contestId'], index=item['index'], name=item['name'])
+            for i, item in enumerate(generate_catalog(size, args.seed)['result']['problems'], 1)
+        ]
+
+        index = NameIndex()
+        started = time.perf_counter()
+        index.build(problems)
+        built = time.perf_counter() - started
+
+        latencies = []
+        found = 0
+        for query in _queries([p.name for p in problems], args.queries, args.seed):
+            started = time.perf_counter()
+            found += bool(index.search(query, args.limit))
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+
+        print(
+            f"{size:>8} задач: индекс {built:.2f} с, {len(index._postings)} триграмм; "
+            f"запрос: медиана {statistics.median(latencies) * 1000:.2f} мс, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс, "
+            f"максимум {latencies[-1] * 1000:.2f} мс; найдено для {found} из {len(latencies)} запросов"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк истории показанных пользователям задач.
+
+Измеряет:
+    - память историй в кэше ServedHistory на 100 000 пользователей
+    - размер сжатых историй в базе данных и тех же историй без сжатия
+    - выбор задач каталогом без исключения и с исключением показанных
+
+Истории пользователей — случайные задачи каталога, их количество на
+пользователя задаётся --served.
+
+Запуск:
+    python -m benchmarks.bench_served --count 10000 --users 100000 --served 50 200
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.catalog import CatalogEngine
+from app.models import Problem
+from app.served import ServedHistory, encode_bits
+from benchmarks.synthetic import generate_problems
+
+RANGE = (1000, 2500)
+TAG = "implementation"
+
+
+def _timed(func, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1_000_000
+
+
+def _histories(count: int, users: int, served: int, seed: int):
+    rnd = random.Random(seed)
+    ids = range(1, count + 1)
+    return [sum(1 << i for i in rnd.sample(ids, served)) for _ in range(users)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10_000, help="количество задач")
+    parser.add_argument("--users", type=int, default=100_000, help="количество пользователей")
+    parser.add_argument("--served", type=int, nargs="+", default=[50, 200], help="показано задач каждому")
+    parser.add_argument("--repeats", type=int, default=200, help="количество выборов задач на замер")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    args = parser.parse_args()
+
+    problems, tags_by_problem = [], {}
+    for i, item in enumerate(generate_problems(args.count), 1):
+        problems.append(Problem(id=i, contest_id=item['contestId'], index=item['index'],
+                                name=item['name'], rating=item['rating']))
+        tags_by_problem[i] = item['tags']
+    catalog = CatalogEngine()
+    catalog.build(problems, tags_by_problem)
+
+    plain = _timed(lambda: catalog.pick(TAG, *RANGE), args.repeats)
+    print(f"выбор задач без исключения: {plain:.1f} мкс")
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    for served in args.served:
+        histories = _histories(args.count, args.users, served, args.seed)
+        history = ServedHistory(engine, cache_size=args.users)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for user_id, bits in enumerate(histories):
+            history._entries.remember(user_id, (1, encode_bits(bits)))
+        cached = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        raw = sum(sys.getsizeof(bits) for bits in histories)
+        stored = sum(len(data) for _, data in history._entries._cache.values())
+        scale = 100_000 / args.users
+        excluded = _timed(lambda: catalog.pick(TAG, *RANGE, exclude=random.choice(histories)), args.repeats)
+        print(
+            f"показано {served:>4} на 100 000 пользователей: кэш {cached * scale / 2 ** 20:6.1f} МиБ, "
+            f"в базе {stored * scale / 2 ** 20:6.1f} МиБ, без сжатия {raw * scale / 2 ** 20:6.1f} МиБ; "
+            f"выбор с исключением {excluded:.1f} мкс"
+        )
+        del history, histories
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Бенчмарк пропускной способности рабочих процессов бота.
+
+Для каждого количества рабочих процессов запускает их с настоящими
+обработчиками бота и заглушкой Bot API, передаёт через маршрутизатор
+записанные диалоги из tests/fixtures/updates.json от множества чатов и
+измеряет, сколько обновлений в секунду обрабатывается до последнего вызова
+Bot API. Перед замером каждый процесс прогревается одним диалогом.
+
+Запуск:
+    TOKEN=... python -m benchmarks.bench_sharding --chats 2000 --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import time
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+UPDATES = json.loads((Path(__file__).parent.parent / "tests" / "fixtures" / "updates.json").read_text())
+# Вызовы Bot API, которыми заканчивается обработка обновления
+FINAL_METHODS = ("sendMessage", "answerCallbackQuery")
+
+# Ответ Bot API на sendMessage
+SENT_MESSAGE = {"message_id": 1, "date": 0, "chat": {"id": 1001, "type": "private"}}
+
+
+class StubBotApi:
+    def __init__(self):
+        self.answered = 0
+        self.target = 0
+        self.done = asyncio.Event()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.match_info["method"] in FINAL_METHODS:
+            self.answered += 1
+            if self.answered >= self.target:
+                self.done.set()
+        result = SENT_MESSAGE if request.match_info["method"] == "sendMessage" else True
+        return web.json_response({"ok": True, "result": result})
+
+    def expect(self, count: int) -> None:
+        self.answered, self.target = 0, count
+        self.done.clear()
+
+
+def _dialogs(chat_ids, first_update_id: int):
+    """
+    Повторяет записанный диалог для каждого чата, чередуя чаты.
+    """
+    updates = []
+    for template in UPDATES:
+        for chat_id in chat_ids:
+            update = copy.deepcopy(template)
+            update["update_id"] = first_update_id + len(updates)
+            event = update.get("message") or update["callback_query"]
+            event["from"]["id"] = chat_id
+            (event.get("message") or event)["chat"]["id"] = chat_id
+            updates.append(update)
+    return updates
+
+
+async def _measure(workers: int, chats: int, api: StubBotApi, api_base: str) -> None:
+    from bot.sharding import ShardSupervisor
+
+    supervisor = ShardSupervisor(workers, api_base=api_base)
+    supervisor.start()
+    try:
+        warmup = _dialogs(range(1, workers + 1), 0)
+        api.expect(len(warmup))
+        for update in warmup:
+            await supervisor.route(update)
+        await api.done.wait()
+
+        updates = _dialogs(range(10_000, 10_000 + chats), len(warmup))
+        api.expect(len(updates))
+        started = time.perf_counter()
+        for update in updates:
+            await supervisor.route(update)
+        await api.done.wait()
+        elapsed = time.perf_counter() - started
+    finally:
+        await supervisor.stop()
+
+    print(f"{workers:>2} процессов: {len(updates)} обновлений за {elapsed:.2f} с, {len(updates) / elapsed:.0f} обновлений/с")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=1000, help="количество чатов, каждый проходит записанный диалог")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="количества рабочих процессов")
+    args = parser.parse_args()
+
+    # Рабочие процессы наследуют окружение: состояния в памяти, без каталога из БД и без сервера метрик
+    os.environ["FSM_STORAGE"] = "memory"
+    os.environ["CATALOG_ENGINE_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+
+    api = StubBotApi()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        for workers in args.workers:
+            await _measure(workers, args.chats, api, str(server.make_url("")).rstrip("/"))
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Бенчмарк времени запуска процессов приложения.
+
+Каждый сценарий выполняется в отдельном процессе интерпретатора, время
+берётся минимальное из нескольких повторов:
+1. import main — импорт точки входа (в том числе для запуска с --fill-db)
+2. бот готов — импорт bot.bot и создание диспетчера и бота
+3. обновление каталога — импорт модулей загрузки и создание движка
+
+Затем печатает модули с наибольшим суммарным временем импорта по
+python -X importtime для сценария запуска бота.
+
+Запуск:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+SCENARIOS: Dict[str, str] = {
+    "пустой процесс": "pass",
+    "import main": "import main",
+    "бот готов": "from bot.bot import get_bot, get_dispatcher; get_dispatcher(); get_bot()",
+    "обновление каталога": "import app.fetcher, app.fill_db; app.fill_db.get_engine()",
+}
+
+
+def _run(code: str, *options: str) -> Tuple[float, str]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *options, "-c", code], cwd=ROOT, env=os.environ, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def _importtime(code: str, top: int) -> List[Tuple[float, str]]:
+    _, log = _run(code, "-X", "importtime")
+    modules = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Импорты сценария и их прямые зависимости; более глубокие входят в их время
+        if not name.startswith("    "):
+            modules.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="количество запусков каждого сценария")
+    parser.add_argument("--top", type=int, default=10, help="количество модулей в отчёте importtime")
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        best = min(_run(code)[0] for _ in range(args.repeat))
+        print(f"{name:>20}: {best:.3f} с")
+
+    print("\nСамые долгие импорты при запуске бота:")
+    for seconds, module in _importtime(SCENARIOS["бот готов"], args.top):
+        print(f"{seconds:8.3f} с  {module}")
+
+
+if __name__ == "__main__":
+    main()
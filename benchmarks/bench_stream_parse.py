@@ -0,0 +1,61 @@
+"""
+Бенчмарк потокового разбора ответа problemset.problems.
+
+Сравнивает пиковое потребление памяти и время разбора ответа целиком через
+json.load и потоково через ProblemsetStream.
+
+Запуск:
+    python -m benchmarks.bench_stream_parse --count 200000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+from app.problemset_stream import ProblemsetStream
+from benchmarks.synthetic import generate_problemset
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_whole(path):
+    with open(path, 'rb') as file:
+        data = json.load(file)
+    return len(data['result']['problems'])
+
+
+def _parse_stream(path):
+    with open(path, 'rb') as file:
+        stream = ProblemsetStream(iter(lambda: file.read(CHUNK_SIZE), b''))
+        count = sum(1 for _ in stream.problems())
+        deque(stream.statistics(), maxlen=0)
+    return count
+
+
+def _measure(name, func, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func(path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>10}: {count} задач, {elapsed:.2f} с, пик памяти {peak / 2 ** 20:.1f} МиБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000, help="количество задач")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as file:
+        file.write(json.dumps(generate_problemset(args.count)).encode())
+        file.flush()
+        _measure("json.load", _parse_whole, file.name)
+        _measure("stream", _parse_stream, file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк выражений над несколькими тегами.
+
+Сравнивает вычисление выражений из 1–5 тегов над битовыми множествами
+каталога в памяти с перебором задач и проверкой множества тегов каждой.
+
+Запуск:
+    python -m benchmarks.bench_tag_query --count 100000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.catalog import CatalogEngine
+from app.models import Problem
+from app.tag_query import parse_tag_expression
+from benchmarks.synthetic import generate_problems
+
+EXPRESSIONS = [
+    "implementation",
+    "implementation AND math",
+    "implementation AND math AND NOT greedy",
+    "(implementation OR dp) AND math AND NOT greedy",
+    "(implementation OR dp) AND (math OR graphs) AND NOT greedy",
+]
+RANGE = (1000, 2500)
+
+
+def _matches(node, tags):
+    kind = node[0]
+    if kind == 'tag':
+        return node[1] in tags
+    if kind == 'not':
+        return not _matches(node[1], tags)
+    if kind == 'and':
+        return _matches(node[1], tags) and _matches(node[2], tags)
+    return _matches(node[1], tags) or _matches(node[2], tags)
+
+
+def _scan(rows, node, limit=10):
+    low, high = RANGE
+    found = [problem for problem, tags in rows if low <= problem.rating <= high and _matches(node, tags)]
+    return random.sample(found, min(limit, len(found)))
+
+
+def _timed(func, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000, help="количество задач")
+    parser.add_argument("--repeats", type=int, default=50, help="количество запросов на выражение")
+    args = parser.parse_args()
+
+    problems, tags_by_problem = [], {}
+    for i, item in enumerate(generate_problems(args.count), 1):
+        problems.append(Problem(id=i, contest_id=item['contestId'], index=item['index'],
+                                name=item['name'], rating=item['rating']))
+        tags_by_problem[i] = item['tags']
+
+    catalog = CatalogEngine()
+    started = time.perf_counter()
+    catalog.build(problems, tags_by_problem)
+    print(f"Построение индексов для {args.count} задач: {time.perf_counter() - started:.2f} с")
+
+    rows = [(problem, set(tags_by_problem[problem.id])) for problem in problems]
+    for expression in EXPRESSIONS:
+        node = parse_tag_expression(expression)
+        bitset = _timed(lambda: catalog.pick_expression(node, *RANGE), args.repeats)
+        scan = _timed(lambda: _scan(rows, node), max(1, args.repeats // 10))
+        print(f"{expression:<60} битовые множества {bitset:9.1f} мкс, перебор {scan:9.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Бенчмарк обработки обновлений через webhook.
+
+Отправляет записанные обновления из tests/fixtures/updates.json в
+aiohttp-приложение webhook с настоящими обработчиками бота и заглушкой Bot API
+и измеряет задержку от отправки обновления до последнего вызова Bot API:
+при ответе в теле webhook это ответ на запрос, при фоновой обработке —
+запрос к Bot API с ответом пользователю.
+
+Запуск:
+    TOKEN=... python -m benchmarks.bench_webhook --rounds 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.bot import get_dispatcher
+from bot.webhook import build_webhook_app
+
+UPDATES = json.loads((Path(__file__).parent.parent / "tests" / "fixtures" / "updates.json").read_text())
+# Вызовы Bot API, которыми заканчивается обработка обновления
+FINAL_METHODS = ("sendMessage", "answerCallbackQuery")
+
+# Ответ Bot API на sendMessage
+SENT_MESSAGE = {"message_id": 1, "date": 0, "chat": {"id": 1001, "type": "private"}}
+
+class StubBotApi:
+    def __init__(self):
+        self.answered = asyncio.Event()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.match_info["method"] in FINAL_METHODS:
+            self.answered.set()
+        result = SENT_MESSAGE if request.match_info["method"] == "sendMessage" else True
+        return web.json_response({"ok": True, "result": result})
+
+
+async def _measure(name: str, answer_in_response: bool, rounds: int) -> None:
+    api = StubBotApi()
+    api_app = web.Application()
+    api_app.router.add_post("/bot{token}/{method}", api.handle)
+    api_server = TestServer(api_app)
+    await api_server.start_server()
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(str(api_server.make_url("")).rstrip("/")))
+    bot = Bot(token="42:TEST", session=session)
+    client = TestClient(TestServer(build_webhook_app(get_dispatcher(), bot, "/webhook", answer_in_response=answer_in_response)))
+    await client.start_server()
+
+    latencies = []
+    for i in range(rounds):
+        for update in UPDATES:
+            update = dict(update, update_id=i * len(UPDATES) + update["update_id"])
+            api.answered.clear()
+            started = time.perf_counter()
+            response = await client.post("/webhook", json=update)
+            await response.read()
+            if not answer_in_response:
+                await api.answered.wait()
+            latencies.append(time.perf_counter() - started)
+
+    await client.close()
+    await api_server.close()
+    latencies.sort()
+    print(
+        f"{name:>10}: медиана {statistics.median(latencies) * 1000:.2f} мс, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} мс"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=100, help="количество проходов по записанным обновлениям")
+    args = parser.parse_args()
+
+    get_dispatcher().fsm.storage = MemoryStorage()
+    await _measure("response", True, args.rounds)
+    await _measure("background", False, args.rounds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+"""
+Генератор синтетического каталога задач для бенчмарков.
+
+Формирует данные в формате ответа метода problemset.problems Codeforces API,
+чтобы их можно было подавать на вход тем же функциям, что и реальный ответ.
+
+generate_problems и generate_problemset дают равномерные распределения и
+подходят для замеров разбора и записи. generate_catalog воспроизводит
+распределения настоящего каталога: задачи сгруппированы по контестам,
+рейтинг растёт с буквой задачи и зависит от дивизиона, частоты тегов
+близки к частотам на Codeforces, у части задач нет рейтинга и очков, а
+количество решений убывает с ростом рейтинга. Названия задач генерирует Faker.
+"""
+
+import json
+import random
+from typing import Dict, Iterator, List
+
+from faker import Faker
+
+from bot.keyboards import TOPICS
+
+# Примерная доля задач Codeforces с каждым тегом
+TAG_FREQUENCIES = {
+    'implementation': 0.30, 'math': 0.30, 'greedy': 0.28, 'dp': 0.20, 'data structures': 0.15,
+    'brute force': 0.14, 'constructive algorithms': 0.14, 'sortings': 0.10, 'binary search': 0.09,
+    'graphs': 0.08, 'number theory': 0.08, 'strings': 0.07, 'trees': 0.07, 'dfs and similar': 0.06,
+    'combinatorics': 0.06, 'two pointers': 0.05, 'bitmasks': 0.05, 'dsu': 0.03, 'shortest paths': 0.025,
+    'probabilities': 0.02, 'divide and conquer': 0.02, 'hashing': 0.02, 'games': 0.02, 'geometry': 0.02,
+    'interactive': 0.02, '*special': 0.01, 'matrices': 0.01, 'fft': 0.008, 'flows': 0.008,
+    'graph matchings': 0.005, 'string suffix structures': 0.005, 'ternary search': 0.004,
+    'expression parsing': 0.003, 'meet-in-the-middle': 0.003, '2-sat': 0.002,
+    'chinese remainder theorem': 0.002, 'schedules': 0.001,
+}
+# Доля задач каждого количества тегов (0, 1, 2, ...)
+TAG_COUNT_WEIGHTS = (0.04, 0.18, 0.30, 0.26, 0.14, 0.08)
+# Дивизионы контестов: доля, рейтинг задачи A, прирост рейтинга на букву
+DIVISIONS = ((0.25, 800, 250), (0.55, 900, 350), (0.20, 1500, 400))
+# Доли задач без рейтинга (новые контесты) и без очков
+UNRATED_SHARE = 0.07
+NO_POINTS_SHARE = 0.4
+
+
+def generate_problems(count: int, seed: int = 0) -> Iterator[dict]:
+    """
+    Генерирует задачи в формате problemset.problems.
+
+    Args:
+        count (int): Количество задач
+        seed (int): Зерно генератора случайных чисел
+
+    Yields:
+        dict: Описание задачи
+    """
+    rnd = random.Random(seed)
+    for i in range(count):
+        contest_id, index = divmod(i, 6)
+        yield {
+            'contestId': contest_id + 1,
+            'index': "ABCDEF"[index],
+            'name': f"Problem {i}",
+            'type': 'PROGRAMMING',
+            'points': float(rnd.randrange(500, 3001, 250)),
+            'rating': rnd.randrange(800, 3501, 100),
+            'tags': rnd.sample(TOPICS, rnd.randint(0, 4)),
+        }
+
+
+def generate_problemset(count: int, seed: int = 0) -> Dict[str, object]:
+    """
+    Генерирует полный ответ problemset.problems.
+
+    Args:
+        count (int): Количество задач
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        Dict[str, object]: Ответ API со статусом OK
+    """
+    rnd = random.Random(seed)
+    problems: List[dict] = list(generate_problems(count, seed))
+    statistics = [
+        {'contestId': p['contestId'], 'index': p['index'], 'solvedCount': rnd.randrange(0, 50000)}
+        for p in problems
+    ]
+    return {'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}
+
+
+async def seed_database(engine, count: int, seed: int = 0) -> None:
+    """
+    Создаёт таблицы и заполняет базу синтетическим каталогом.
+
+    Args:
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+        count (int): Количество задач
+        seed (int): Зерно генератора случайных чисел
+    """
+    from app.ingest import apply_statistics, bulk_insert_problems
+    from app.models import Base
+
+    result = generate_problemset(count, seed)['result']
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await bulk_insert_problems(connection, result['problems'])
+        await apply_statistics(connection, result['problemStatistics'])
+
+
+def generate_catalog(count: int, seed: int = 0) -> Dict[str, object]:
+    """
+    Генерирует ответ problemset.problems с распределениями настоящего каталога.
+
+    Args:
+        count (int): Количество задач
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        Dict[str, object]: Ответ API со статусом OK
+    """
+    rnd = random.Random(seed)
+    fake = Faker()
+    fake.seed_instance(seed)
+    tags, tag_weights = list(TAG_FREQUENCIES), list(TAG_FREQUENCIES.values())
+    problems: List[dict] = []
+    statistics: List[dict] = []
+
+    contest_id = 0
+    while len(problems) < count:
+        contest_id += 1
+        _, base, step = rnd.choices(DIVISIONS, weights=[division[0] for division in DIVISIONS])[0]
+        unrated = rnd.random() < UNRATED_SHARE
+        with_points = rnd.random() >= NO_POINTS_SHARE
+        for position in range(min(rnd.randint(5, 8), count - len(problems))):
+            problem = {
+                'contestId': contest_id,
+                'index': "ABCDEFGH"[position],
+                'name': fake.catch_phrase(),
+                'type': 'PROGRAMMING',
+                'tags': [],
+            }
+            rating = min(3500, max(800, round(rnd.gauss(base + position * step, 150) / 100) * 100))
+            if with_points:
+                problem['points'] = float(500 + position * 250)
+            if not unrated:
+                problem['rating'] = rating
+
+            tag_count = rnd.choices(range(len(TAG_COUNT_WEIGHTS)), weights=TAG_COUNT_WEIGHTS)[0]
+            while len(problem['tags']) < tag_count:
+                tag = rnd.choices(tags, weights=tag_weights)[0]
+                if tag not in problem['tags']:
+                    problem['tags'].append(tag)
+
+            problems.append(problem)
+            statistics.append({
+                'contestId': contest_id,
+                'index': problem['index'],
+                'solvedCount': int(rnd.lognormvariate(10 - (rating - 800) / 400, 1.0)),
+            })
+    return {'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}
+
+
+def problemset_bytes(problemset: Dict[str, object]) -> bytes:
+    """
+    Кодирует ответ problemset.problems так же, как его отдаёт API.
+
+    Args:
+        problemset (Dict[str, object]): Ответ API
+
+    Returns:
+        bytes: Тело ответа в JSON
+    """
+    return json.dumps(problemset, ensure_ascii=False).encode()
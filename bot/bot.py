@@ -1,35 +1,192 @@
 """
-Модуль инициализации и запуска Telegram бота.
+Модуль сборки и запуска Telegram бота.
+
+Бот, диспетчер и их зависимости создаются фабриками при первом обращении
+(get_bot, get_dispatcher), а не при импорте модуля: импорт не создаёт
+движок базы данных, HTTP-сессию и хранилище состояний, поэтому запуск
+обновления каталога и сбор тестов не платят за то, что им не нужно.
 
 Этот модуль отвечает за:
-1. Создание экземпляра бота
-2. Настройку диспетчера и хранилища состояний
-3. Запуск бота
+1. Создание экземпляра бота с ограничением частоты исходящих запросов
+2. Настройку диспетчера, хранилища состояний и обработчиков
+3. Создание истории задач, показанных пользователям, и хранилища задач,
+   решённых на Codeforces
+4. Подключение метрик обработчиков и запросов к Bot API
+5. Запуск бота в режиме long polling или webhook, в одном или нескольких процессах
 """
 
-import logging
+from functools import lru_cache
+from typing import Optional
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from constants import TOKEN
+from app.database import get_engine
+from app.served import ServedHistory
+from app.solved import SolvedStore
+from bot.middlewares import setup_bot_api_metrics, setup_handler_metrics
+from bot.outbound import SendScheduler
+from bot.sharding import run_sharded
+from bot.storage import DatabaseStorage
+from bot.webhook import run_webhook
+from constants import (
+    BOT_MODE,
+    BOT_WORKERS,
+    FSM_FLUSH_INTERVAL,
+    FSM_STORAGE,
+    METRICS_ENABLED,
+    SEND_RATE,
+    SEND_SCHEDULER_ENABLED,
+    TOKEN,
+    WEBHOOK_ANSWER_IN_RESPONSE,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+
+
+def create_bot(token: Optional[str] = None, session=None, send_rate: float = SEND_RATE) -> Bot:
+    """
+    Создаёт бота с очередью исходящих запросов и метриками запросов к Bot API.
+
+    Args:
+        token (Optional[str]): Токен бота; по умолчанию TOKEN
+        session (Optional[BaseSession]): Сессия HTTP-клиента; по умолчанию aiohttp
+        send_rate (float): Ограничение запросов к Bot API в секунду для этого процесса
+
+    Returns:
+        Bot: Экземпляр бота
+    """
+    bot = Bot(token=token or TOKEN, session=session)
+    if SEND_SCHEDULER_ENABLED:
+        # Первый middleware сессии — внешний: метрики Bot API замеряют запросы без ожидания в очереди
+        bot.session.middleware(SendScheduler(rate=send_rate))
+    if METRICS_ENABLED:
+        setup_bot_api_metrics(bot)
+    return bot
+
+
+async def close_send_schedulers(bot: Bot) -> None:
+    """
+    Дожидается отправки запросов из очередей исходящих запросов бота.
+
+    Args:
+        bot (Bot): Экземпляр бота
+    """
+    for middleware in bot.session.middleware:
+        if isinstance(middleware, SendScheduler):
+            await middleware.close()
+
+
+def create_storage() -> BaseStorage:
+    """
+    Создаёт хранилище состояний FSM по настройке FSM_STORAGE.
+
+    Returns:
+        BaseStorage: Хранилище в базе данных или в памяти процесса
+    """
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return DatabaseStorage(get_engine(), flush_interval=FSM_FLUSH_INTERVAL)
+
+
+def create_dispatcher(storage: Optional[BaseStorage] = None) -> Dispatcher:
+    """
+    Создаёт диспетчер с обработчиками команд и callback-запросов.
+
+    Args:
+        storage (Optional[BaseStorage]): Хранилище состояний; по умолчанию create_storage()
+
+    Returns:
+        Dispatcher: Диспетчер бота
+    """
+    from bot.handlers import callbacks, router
+
+    dispatcher = Dispatcher(storage=storage or create_storage())
+    dispatcher.include_router(router)
+    dispatcher.shutdown.register(get_served_history().close)
+    dispatcher.shutdown.register(get_solved_store().close)
+    dispatcher.shutdown.register(close_send_schedulers)
+    if METRICS_ENABLED:
+        setup_handler_metrics(dispatcher, callbacks)
+    return dispatcher
+
+
+@lru_cache(maxsize=None)
+def get_bot() -> Bot:
+    """
+    Возвращает бота приложения, создавая его при первом вызове.
+    """
+    return create_bot()
+
+
+@lru_cache(maxsize=None)
+def get_dispatcher() -> Dispatcher:
+    """
+    Возвращает диспетчер приложения, создавая его при первом вызове.
+    """
+    return create_dispatcher()
+
+
+@lru_cache(maxsize=None)
+def get_served_history() -> ServedHistory:
+    """
+    Возвращает историю показанных задач, создавая её при первом вызове.
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+    История записывается в базу в фоне и при остановке диспетчера.
+    """
+    return ServedHistory(get_engine())
 
-# Инициализация бота и диспетчера
-telegram_bot = Bot(token=TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
 
-# Импорт обработчиков команд
-import bot.handlers
+@lru_cache(maxsize=None)
+def get_solved_store() -> SolvedStore:
+    """
+    Возвращает хранилище задач, решённых привязанными хэндлами, создавая его при первом вызове.
+
+    Решённые задачи синхронизируются с Codeforces в фоне; синхронизации
+    останавливаются при остановке диспетчера.
+    """
+    return SolvedStore(get_engine())
 
 
 async def start_bot():
     """
     Асинхронная функция для запуска бота.
-    
-    Запускает бота в режиме long polling для обработки входящих сообщений.
+
+    В зависимости от BOT_MODE запускает бота в режиме long polling или
+    aiohttp-приложение, принимающее обновления через webhook. Если BOT_WORKERS
+    больше 1, обновления обрабатываются в рабочих процессах, а этот процесс
+    только получает их и распределяет по номеру чата.
     """
-    await dp.start_polling(telegram_bot)
+    dp, telegram_bot = get_dispatcher(), get_bot()
+    if BOT_WORKERS > 1:
+        await run_sharded(
+            dp,
+            telegram_bot,
+            BOT_WORKERS,
+            BOT_MODE,
+            url=WEBHOOK_URL,
+            path=WEBHOOK_PATH,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT,
+            secret_token=WEBHOOK_SECRET,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY
+        )
+    elif BOT_MODE == "webhook":
+        await run_webhook(
+            dp,
+            telegram_bot,
+            url=WEBHOOK_URL,
+            path=WEBHOOK_PATH,
+            host=WEBHOOK_HOST,
+            port=WEBHOOK_PORT,
+            secret_token=WEBHOOK_SECRET,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+            answer_in_response=WEBHOOK_ANSWER_IN_RESPONSE
+        )
+    else:
+        await dp.start_polling(telegram_bot)
@@ -0,0 +1,135 @@
+"""
+Модуль маршрутизации callback-запросов.
+
+Данные кнопки имеют вид «код:значение:значение», где код — короткое имя
+обработчика, а значения — целые числа (например, порядковый номер темы
+вместо её названия). Обработчик выбирается одним поиском в словаре по коду,
+а значения разбираются по типам, объявленным при регистрации, поэтому данные
+кнопок остаются короткими и укладываются в ограничение Telegram в 64 байта
+независимо от длины названий тем.
+
+Этот модуль отвечает за:
+1. Коды callback-запросов бота
+2. Формирование данных кнопок
+3. Выбор обработчика по коду и разбор значений
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import types
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина данных кнопки в Telegram, в байтах
+MAX_CALLBACK_DATA = 64
+
+# Коды callback-запросов
+PAGE = "p"  # Страница клавиатуры тем: номер страницы
+TOPIC = "t"  # Выбор темы: версия списка тем, номер темы
+MULTI_PAGE = "mp"  # Страница клавиатуры отметки тем: номер страницы
+MULTI_TOPIC = "mt"  # Отметка темы: версия списка тем, номер темы
+MULTI_DONE = "md"  # Завершение отметки тем
+DIFFICULTY_FROM = "f"  # Минимальная сложность
+DIFFICULTY_TO = "to"  # Максимальная сложность
+
+# Ответ на кнопку, код которой бот не знает (например, клавиатура старой версии бота)
+STALE_KEYBOARD = "Клавиатура устарела, начни заново: /start"
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+def pack(opcode: str, *values: int) -> str:
+    """
+    Формирует данные кнопки.
+
+    Args:
+        opcode (str): Код обработчика
+        *values (int): Значения
+
+    Returns:
+        str: Данные кнопки
+
+    Raises:
+        ValueError: Если данные длиннее MAX_CALLBACK_DATA байт
+    """
+    data = ":".join((opcode, *map(str, values)))
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"Данные кнопки длиннее {MAX_CALLBACK_DATA} байт: {data}")
+    return data
+
+
+class CallbackRouter:
+    """
+    Маршрутизатор callback-запросов по коду из данных кнопки.
+    """
+
+    def __init__(self):
+        """
+        Инициализация маршрутизатора.
+        """
+        self._handlers: Dict[str, Tuple[CallbackHandler, Tuple[type, ...]]] = {}
+
+    def handler(self, opcode: str, *value_types: type) -> Callable[[CallbackHandler], CallbackHandler]:
+        """
+        Регистрирует обработчик кода.
+
+        Обработчик вызывается как handler(callback, *args, *values), где args —
+        аргументы dispatch, а values — значения из данных кнопки, приведённые
+        к value_types.
+
+        Args:
+            opcode (str): Код обработчика
+            *value_types (type): Типы значений в данных кнопки
+
+        Returns:
+            Callable[[CallbackHandler], CallbackHandler]: Декоратор, возвращающий тот же обработчик
+        """
+        if opcode in self._handlers:
+            raise ValueError(f"Код {opcode!r} уже зарегистрирован")
+
+        def register(handler: CallbackHandler) -> CallbackHandler:
+            self._handlers[opcode] = (handler, value_types)
+            return handler
+
+        return register
+
+    def handler_name(self, data: str) -> str:
+        """
+        Возвращает имя обработчика, которому адресованы данные кнопки.
+
+        Args:
+            data (str): Данные кнопки
+
+        Returns:
+            str: Имя функции-обработчика или "unknown" для неизвестного кода
+        """
+        entry = self._handlers.get(data.partition(":")[0])
+        return entry[0].__name__ if entry is not None else "unknown"
+
+    async def dispatch(self, callback: types.CallbackQuery, *args: Any) -> Any:
+        """
+        Вызывает обработчик по коду из данных кнопки.
+
+        Args:
+            callback (types.CallbackQuery): Callback-запрос
+            *args (Any): Дополнительные аргументы обработчика (например, контекст FSM)
+
+        Returns:
+            Any: Результат обработчика или ответ на callback-запрос
+        """
+        opcode, _, payload = (callback.data or "").partition(":")
+        entry = self._handlers.get(opcode)
+        if entry is None:
+            return callback.answer(STALE_KEYBOARD, show_alert=True)
+
+        handler, value_types = entry
+        raw = payload.split(":") if payload else []
+        try:
+            if len(raw) != len(value_types):
+                raise ValueError(payload)
+            values = [value_type(value) for value_type, value in zip(value_types, raw)]
+        except ValueError:
+            logger.warning("Некорректные данные кнопки: %r", callback.data)
+            return callback.answer("Некорректные данные кнопки", show_alert=True)
+        return await handler(callback, *args, *values)
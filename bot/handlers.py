@@ -5,21 +5,87 @@
 1. Команды /start
 2. Пагинации списка тем
 3. Выбора темы
-4. Выбора диапазона сложности задач
+4. Команды /multi и отметки нескольких тем
+5. Выбора диапазона сложности задач
+6. Команд /handle и /unlink привязки хэндла Codeforces
+7. Команды /search поиска задач по названию
+
+Все callback-запросы принимает один обработчик aiogram, который выбирает
+обработчик по коду из данных кнопки через CallbackRouter.
+
+Последний вызов Bot API обработчик возвращает, а не выполняет сам: диспетчер
+отправляет его после обработки, а в режиме webhook — прямо в ответе на запрос
+Telegram, без отдельного HTTP-запроса.
+
+Обработчики регистрируются в роутере модуля; диспетчер подключает его при
+создании (см. bot.bot.create_dispatcher).
 """
 
-from aiogram import types
-from aiogram.filters.command import Command
+from aiogram import Router, types
+from aiogram.filters.command import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 
 from app.crud.problem_crud import ProblemCRUD
 from app.database import AsyncSessionLocal
-from bot.bot import dp
-from bot.keyboards import get_topics_keyboard, get_difficulties_keyboard, get_difficulties_to_keyboard
+from app.generation import catalog_generation
+from app.solved import CodeforcesError
+from app.tag_query import TagExpressionError, parse_tag_expression, quote_tag
+from bot.bot import get_served_history, get_solved_store
+from bot.callbacks import (
+    DIFFICULTY_FROM,
+    DIFFICULTY_TO,
+    MULTI_DONE,
+    MULTI_PAGE,
+    MULTI_TOPIC,
+    PAGE,
+    STALE_KEYBOARD,
+    TOPIC,
+    CallbackRouter,
+)
+from bot.keyboards import (
+    TOPICS_PER_PAGE,
+    keyboards,
+    get_topics_keyboard,
+    get_multi_topics_keyboard,
+    get_difficulties_keyboard,
+    get_difficulties_to_keyboard,
+)
 from bot.states import QuizStates
+from constants import SEARCH_LIMIT
+
+# Подсказка по синтаксису выражений над темами
+MULTI_HELP = (
+    "Отметь темы на клавиатуре или передай выражение сразу, например:\n"
+    "/multi dp AND graphs AND NOT math\n"
+    "Операторы: AND, OR, NOT и скобки. Тему со словом-оператором бери в кавычки: \"dfs and similar\"."
+)
+# Подсказка по привязке хэндла Codeforces
+HANDLE_HELP = (
+    "Привяжи хэндл Codeforces, и я не буду предлагать задачи, которые ты уже решил:\n"
+    "/handle tourist\n"
+    "Отвязать хэндл: /unlink"
+)
 
+# Подсказка по поиску задач
+SEARCH_HELP = "Передай часть названия задачи, например:\n/search shortest path"
 
-@dp.message(Command("start"))
+# Обработчики сообщений и единственный обработчик callback-запросов
+router = Router()
+# Обработчики callback-запросов по коду из данных кнопки
+callbacks = CallbackRouter()
+
+
+def _problem_list(problems) -> str:
+    """
+    Форматирует нумерованный список задач со ссылками на Codeforces.
+    """
+    return "\n\n".join(
+        f"{i + 1}. 🔗 [Задача {p.contest_id}{p.index}](https://codeforces.com/problemset/problem/{p.contest_id}/{p.index}) — *{p.name}*"
+        for i, p in enumerate(problems)
+    )
+
+
+@router.message(Command("start"))
 async def cmd_start(message: types.Message, state: FSMContext):
     """
     Обработчик команды /start.
@@ -30,135 +96,321 @@ async def cmd_start(message: types.Message, state: FSMContext):
     
     Действия:
         1. Очищает текущее состояние
-        2. Отправляет приветственное сообщение
-        3. Показывает клавиатуру с темами
-        4. Устанавливает состояние ожидания выбора темы
+        2. Устанавливает состояние ожидания выбора темы
+        3. Отправляет приветственное сообщение с клавиатурой тем
     """
     await state.clear()
-    text = "👋 Выбери тему:"
-    keyboard = get_topics_keyboard(page=0)
-    await message.answer(text, reply_markup=keyboard)
     await state.set_state(QuizStates.waiting_for_topic)
+    return message.answer("👋 Выбери тему:", reply_markup=get_topics_keyboard(page=0))
 
 
-@dp.callback_query(lambda c: c.data and c.data.startswith("page:"))
-async def process_page_callback(callback_query: types.CallbackQuery):
+@router.callback_query()
+async def route_callback(callback: types.CallbackQuery, state: FSMContext):
+    """
+    Обработчик всех callback-запросов.
+
+    Args:
+        callback (types.CallbackQuery): Callback-запрос
+        state (FSMContext): Контекст состояния FSM
+
+    Действия:
+        Передаёт запрос обработчику кода из данных кнопки
+    """
+    return await callbacks.dispatch(callback, state)
+
+
+@callbacks.handler(PAGE, int)
+async def process_page_callback(callback_query: types.CallbackQuery, state: FSMContext, page: int):
     """
     Обработчик пагинации списка тем.
     
     Args:
         callback_query (types.CallbackQuery): Callback-запрос с данными пагинации
+        state (FSMContext): Контекст состояния FSM
+        page (int): Номер страницы
     
     Действия:
         Обновляет клавиатуру с темами на указанной странице
     """
-    page = int(callback_query.data.split(":", 1)[1])
     keyboard = get_topics_keyboard(page)
     await callback_query.message.edit_reply_markup(reply_markup=keyboard)
-    await callback_query.answer()
+    return callback_query.answer()
 
 
-@dp.callback_query(lambda c: c.data and c.data.startswith("topic:"))
-async def topic_chosen(callback: types.CallbackQuery, state: FSMContext):
+@callbacks.handler(TOPIC, int, int)
+async def topic_chosen(callback: types.CallbackQuery, state: FSMContext, version: int, ordinal: int):
     """
     Обработчик выбора темы.
     
     Args:
         callback (types.CallbackQuery): Callback-запрос с выбранной темой
         state (FSMContext): Контекст состояния FSM
+        version (int): Версия списка тем, по которому построена клавиатура
+        ordinal (int): Номер темы в списке
     
     Действия:
         1. Сохраняет выбранную тему
         2. Показывает клавиатуру для выбора минимальной сложности
         3. Устанавливает состояние ожидания выбора сложности
     """
-    topic = callback.data.split(":", 1)[1]
+    topic = keyboards.topic(version, ordinal)
+    if topic is None:
+        return callback.answer(STALE_KEYBOARD, show_alert=True)
     await state.update_data(chosen_topic=topic)
     await callback.message.edit_text(
         f"Выбрана тема: {topic}\nТеперь выбери минимальную сложность:",
         reply_markup=get_difficulties_keyboard()
     )
     await state.set_state(QuizStates.waiting_for_difficulty_from)
-    await callback.answer()
+    return callback.answer()
+
+
+async def _ask_difficulty_for_expression(message: types.Message, state: FSMContext, expression: str, edit: bool):
+    """
+    Сохраняет выражение над темами и предлагает выбрать минимальную сложность.
+    """
+    await state.update_data(chosen_expression=expression)
+    text = f"Выбраны темы: {expression}\nТеперь выбери минимальную сложность:"
+    if edit:
+        await message.edit_text(text, reply_markup=get_difficulties_keyboard())
+    else:
+        await message.answer(text, reply_markup=get_difficulties_keyboard())
+    await state.set_state(QuizStates.waiting_for_difficulty_from)
+
+
+@router.message(Command("multi"))
+async def cmd_multi(message: types.Message, state: FSMContext, command: CommandObject):
+    """
+    Обработчик команды /multi.
+
+    Args:
+        message (types.Message): Входящее сообщение
+        state (FSMContext): Контекст состояния FSM
+        command (CommandObject): Разобранная команда с аргументами
+
+    Действия:
+        1. Если передано выражение над темами, проверяет его и переходит к выбору сложности
+        2. Иначе показывает клавиатуру для отметки нескольких тем
+    """
+    await state.clear()
+    if command.args:
+        try:
+            parse_tag_expression(command.args)
+        except TagExpressionError as error:
+            return message.answer(f"Не удалось разобрать выражение: {error}\n\n{MULTI_HELP}")
+        await _ask_difficulty_for_expression(message, state, command.args, edit=False)
+        return
+
+    await state.update_data(include=[], exclude=[])
+    await state.set_state(QuizStates.choosing_topics)
+    return message.answer(
+        "Отметь темы: первое нажатие включает тему ✅, второе исключает 🚫, третье снимает отметку.\n\n" + MULTI_HELP,
+        reply_markup=get_multi_topics_keyboard(0, [], [])
+    )
+
+
+@callbacks.handler(MULTI_PAGE, int)
+async def multi_page_callback(callback: types.CallbackQuery, state: FSMContext, page: int):
+    """
+    Обработчик пагинации клавиатуры отметки нескольких тем.
+    """
+    data = await state.get_data()
+    keyboard = get_multi_topics_keyboard(page, data.get("include", []), data.get("exclude", []))
+    await callback.message.edit_reply_markup(reply_markup=keyboard)
+    return callback.answer()
+
+
+@callbacks.handler(MULTI_TOPIC, int, int)
+async def multi_topic_toggled(callback: types.CallbackQuery, state: FSMContext, version: int, ordinal: int):
+    """
+    Обработчик отметки темы на клавиатуре нескольких тем.
+
+    Действия:
+        Переключает тему: не отмечена → включена → исключена → не отмечена
+    """
+    topic = keyboards.topic(version, ordinal)
+    if topic is None:
+        return callback.answer(STALE_KEYBOARD, show_alert=True)
+    data = await state.get_data()
+    include = list(data.get("include", []))
+    exclude = list(data.get("exclude", []))
 
+    if topic in include:
+        include.remove(topic)
+        exclude.append(topic)
+    elif topic in exclude:
+        exclude.remove(topic)
+    else:
+        include.append(topic)
 
-@dp.callback_query(lambda c: c.data and c.data.startswith("difficulty:"))
-async def difficulty_from_chosen(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(include=include, exclude=exclude)
+    await callback.message.edit_reply_markup(reply_markup=get_multi_topics_keyboard(ordinal // TOPICS_PER_PAGE, include, exclude))
+    return callback.answer()
+
+
+@callbacks.handler(MULTI_DONE)
+async def multi_topics_done(callback: types.CallbackQuery, state: FSMContext):
+    """
+    Обработчик завершения отметки нескольких тем.
+
+    Действия:
+        1. Составляет выражение: все включённые темы и ни одной исключённой
+        2. Переходит к выбору минимальной сложности
+    """
+    data = await state.get_data()
+    terms = [quote_tag(topic) for topic in data.get("include", [])]
+    terms += [f"NOT {quote_tag(topic)}" for topic in data.get("exclude", [])]
+    if not terms:
+        return callback.answer("Отметь хотя бы одну тему", show_alert=True)
+
+    await _ask_difficulty_for_expression(callback.message, state, " AND ".join(terms), edit=True)
+    return callback.answer()
+
+
+@callbacks.handler(DIFFICULTY_FROM, int)
+async def difficulty_from_chosen(callback: types.CallbackQuery, state: FSMContext, difficulty_from: int):
     """
     Обработчик выбора минимальной сложности.
     
     Args:
         callback (types.CallbackQuery): Callback-запрос с выбранной сложностью
         state (FSMContext): Контекст состояния FSM
+        difficulty_from (int): Минимальная сложность
     
     Действия:
         1. Сохраняет минимальную сложность
         2. Показывает клавиатуру для выбора максимальной сложности
         3. Устанавливает состояние ожидания выбора максимальной сложности
     """
-    difficulty_str = callback.data.split(":", 1)[1]
-    try:
-        difficulty_from = float(difficulty_str)
-    except ValueError:
-        await callback.answer("Некорректное значение сложности", show_alert=True)
-        return
-
     await state.update_data(difficulty_from=difficulty_from)
     await callback.message.edit_text(
         "Теперь выбери максимальную сложность (до):",
         reply_markup=get_difficulties_to_keyboard(difficulty_from)
     )
     await state.set_state(QuizStates.waiting_for_difficulty_to)
-    await callback.answer()
+    return callback.answer()
 
 
-@dp.callback_query(lambda c: c.data and c.data.startswith("difficulty_to:"))
-async def difficulty_to_chosen(callback: types.CallbackQuery, state: FSMContext):
+@callbacks.handler(DIFFICULTY_TO, int)
+async def difficulty_to_chosen(callback: types.CallbackQuery, state: FSMContext, difficulty_to: int):
     """
     Обработчик выбора максимальной сложности.
     
     Args:
         callback (types.CallbackQuery): Callback-запрос с выбранной сложностью
         state (FSMContext): Контекст состояния FSM
+        difficulty_to (int): Максимальная сложность
     
     Действия:
-        1. Получает сохраненные тему и минимальную сложность
-        2. Ищет задачи по заданным параметрам
-        3. Отправляет список найденных задач
+        1. Получает сохраненные тему (или выражение над темами) и минимальную сложность
+        2. Ищет задачи по заданным параметрам, в первую очередь из ещё не показанных пользователю
+           и не решённых привязанным хэндлом Codeforces
+        3. Отправляет список найденных задач и запоминает их как показанные
         4. Очищает состояние
     """
-    difficulty_to_str = callback.data.split(":", 1)[1]
-    try:
-        difficulty_to = float(difficulty_to_str)
-    except ValueError:
-        await callback.answer("Некорректное значение сложности", show_alert=True)
-        return
-
     data = await state.get_data()
     topic = data.get("chosen_topic")
+    expression = data.get("chosen_expression")
     difficulty_from = data.get("difficulty_from")
 
-    if not topic or not difficulty_from:
-        await callback.answer("Пожалуйста, сначала выбери тему и минимальную сложность.", show_alert=True)
-        return
+    if not (topic or expression) or not difficulty_from:
+        return callback.answer("Пожалуйста, сначала выбери тему и минимальную сложность.", show_alert=True)
 
+    user_id = callback.from_user.id
+    generation = catalog_generation.value
+    served_history = get_served_history()
+    served = await served_history.get(user_id, generation)
+    # Решённые задачи берутся из памяти, синхронизация с Codeforces идёт в фоне
+    solved_store = get_solved_store()
+    handle = await solved_store.handle(user_id)
+    solved = solved_store.solved(handle, generation) if handle else 0
     async with AsyncSessionLocal() as session:
         crud = ProblemCRUD(session)
-        problems = await crud.get_random_by_tag_and_points_range(
-            topic,
-            difficulty_from,
-            difficulty_to,
-            limit=10
-        )
+        if expression:
+            problems = await crud.get_random_by_tag_expression(
+                parse_tag_expression(expression),
+                difficulty_from,
+                difficulty_to,
+                limit=10,
+                exclude=served | solved
+            )
+        else:
+            problems = await crud.get_random_by_tag_and_rating_range(
+                topic,
+                difficulty_from,
+                difficulty_to,
+                limit=10,
+                exclude=served | solved
+            )
+
+    if problems:
+        await served_history.add(user_id, generation, [p.id for p in problems])
 
     if not problems:
         await callback.message.edit_text("По вашему запросу задач не найдено.")
     else:
-        text = "Вот задачи для тебя:\n\n" + "\n\n".join(
-            f"{i + 1}. 🔗 [Задача {p.contest_id}{p.index}](https://codeforces.com/problemset/problem/{p.contest_id}/{p.index}) — *{p.name}*"
-            for i, p in enumerate(problems)
-        )
-        await callback.message.edit_text(text)
+        await callback.message.edit_text("Вот задачи для тебя:\n\n" + _problem_list(problems))
 
     await state.clear()
-    await callback.answer()
+    return callback.answer()
+
+
+@router.message(Command("handle"))
+async def cmd_handle(message: types.Message, command: CommandObject):
+    """
+    Обработчик команды /handle.
+
+    Args:
+        message (types.Message): Входящее сообщение
+        command (CommandObject): Разобранная команда с аргументами
+
+    Действия:
+        1. Без аргумента показывает привязанный хэндл и подсказку
+        2. Иначе загружает решённые хэндлом задачи и привязывает его к пользователю
+    """
+    solved_store = get_solved_store()
+    if not command.args:
+        handle = await solved_store.handle(message.from_user.id)
+        current = f"Привязан хэндл {handle}.\n\n" if handle else ""
+        return message.answer(current + HANDLE_HELP)
+
+    handle = command.args.strip()
+    generation = catalog_generation.value
+    try:
+        count = await solved_store.link(message.from_user.id, handle, generation)
+    except CodeforcesError as error:
+        return message.answer(f"Не удалось получить посылки {handle}: {error}")
+    return message.answer(f"Хэндл {handle} привязан, решено задач из каталога: {count}.")
+
+
+@router.message(Command("unlink"))
+async def cmd_unlink(message: types.Message):
+    """
+    Обработчик команды /unlink: отвязывает хэндл Codeforces пользователя.
+    """
+    await get_solved_store().unlink(message.from_user.id)
+    return message.answer("Хэндл отвязан.")
+
+
+@router.message(Command("search"))
+async def cmd_search(message: types.Message, command: CommandObject):
+    """
+    Обработчик команды /search.
+
+    Args:
+        message (types.Message): Входящее сообщение
+        command (CommandObject): Разобранная команда с аргументами
+
+    Действия:
+        1. Без аргумента показывает подсказку
+        2. Иначе ищет задачи с похожими названиями и отправляет их списком
+    """
+    if not command.args or not command.args.strip():
+        return message.answer(SEARCH_HELP)
+
+    async with AsyncSessionLocal() as session:
+        problems = await ProblemCRUD(session).search_by_name(command.args, limit=SEARCH_LIMIT)
+
+    if not problems:
+        return message.answer("Задач с похожим названием не найдено.")
+    return message.answer("Нашёл задачи:\n\n" + _problem_list(problems))
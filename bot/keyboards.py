@@ -1,18 +1,44 @@
 """
 Модуль для создания клавиатур Telegram бота.
 
+Клавиатуры, которые не зависят от пользователя, строятся один раз по списку
+тегов из таблицы tags (с количеством задач у каждого тега) и переиспользуются
+обработчиками; после обновления каталога они перестраиваются. До первой
+загрузки используется встроенный список тем.
+
 Этот модуль содержит функции для создания:
 1. Клавиатуры с темами задач (с пагинацией)
-2. Клавиатуры для выбора минимальной сложности
-3. Клавиатуры для выбора максимальной сложности
+2. Клавиатуры для отметки нескольких тем (с пагинацией)
+3. Клавиатуры для выбора минимальной сложности
+4. Клавиатуры для выбора максимальной сложности
 """
 
+import logging
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.tag_crud import TagCRUD
+from app.refresh import on_catalog_refresh
+from bot.callbacks import (
+    DIFFICULTY_FROM,
+    DIFFICULTY_TO,
+    MULTI_DONE,
+    MULTI_PAGE,
+    MULTI_TOPIC,
+    PAGE,
+    TOPIC,
+    pack,
+)
+
+logger = logging.getLogger(__name__)
 
 # Количество тем на одной странице
 TOPICS_PER_PAGE = 8
 
-# Список всех доступных тем
+# Список тем, который используется до загрузки тегов из базы данных
 TOPICS = [
     "math", "greedy", "sortings", "games", "data structures", "graphs", "dp", "bitmasks",
     "combinatorics", "probabilities", "trees", "constructive algorithms", "brute force",
@@ -23,10 +49,213 @@ TOPICS = [
     "meet-in-the-middle"
 ]
 
+# Список доступных уровней сложности
+DIFFICULTIES = ["800", "1000", "1200", "1400", "1600", "1800", "2000", "2200", "2400", "2600"]
+
+
+def topics_version(topics: Sequence[str]) -> int:
+    """
+    Вычисляет версию списка тем.
+
+    Версия зависит только от содержимого списка, поэтому совпадает во всех
+    процессах бота и меняется, когда меняются темы или их порядок.
+
+    Args:
+        topics (Sequence[str]): Названия тем в порядке отображения
+
+    Returns:
+        int: Версия списка от 0 до 65535
+    """
+    return zlib.crc32("\n".join(topics).encode()) & 0xFFFF
+
+
+def _build_topics_keyboard(
+        topics: Sequence[Tuple[str, Optional[int]]],
+        version: int,
+        page: int
+) -> InlineKeyboardMarkup:
+    """
+    Строит страницу клавиатуры с темами.
+
+    Args:
+        topics (Sequence[Tuple[str, Optional[int]]]): Темы и количество задач (None, если неизвестно)
+        version (int): Версия списка тем
+        page (int): Номер страницы (начиная с 0)
+
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с темами и кнопками навигации
+    """
+    start = page * TOPICS_PER_PAGE
+    end = start + TOPICS_PER_PAGE
+
+    buttons = []
+    row = []
+    for i, (topic, count) in enumerate(topics[start:end], 1):
+        text = topic if count is None else f"{topic} ({count})"
+        row.append(InlineKeyboardButton(text=text, callback_data=pack(TOPIC, version, start + i - 1)))
+        if i % 2 == 0:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=pack(PAGE, page - 1)))
+    if end < len(topics):
+        nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=pack(PAGE, page + 1)))
+    if nav_buttons:
+        buttons.append(nav_buttons)
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def _build_difficulties_keyboard() -> InlineKeyboardMarkup:
+    """
+    Строит клавиатуру для выбора минимальной сложности.
+    """
+    buttons = []
+    row = []
+    for i, diff in enumerate(DIFFICULTIES, 1):
+        row.append(InlineKeyboardButton(text=f"От {diff}", callback_data=pack(DIFFICULTY_FROM, int(diff))))
+        if i % 3 == 0:  # 3 кнопки в строке
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def _build_difficulties_to_keyboard(difficulty_from: float) -> InlineKeyboardMarkup:
+    """
+    Строит клавиатуру для выбора максимальной сложности.
+    """
+    # Фильтруем сложности, чтобы "до" была больше выбранной "от"
+    valid_difficulties = [diff for diff in DIFFICULTIES if float(diff) > difficulty_from]
+
+    buttons = []
+    row = []
+    for diff in valid_difficulties:
+        row.append(InlineKeyboardButton(text=f"До {diff}", callback_data=pack(DIFFICULTY_TO, int(diff))))
+        if len(row) == 3:  # 3 кнопки в строке
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+class KeyboardCache:
+    """
+    Заранее построенные клавиатуры, общие для всех пользователей.
+
+    Attributes:
+        topics (List[str]): Названия тем в порядке отображения
+        version (int): Версия списка тем, которая передаётся в данных кнопок вместе с номером темы
+        counts (Dict[str, int]): Количество задач по темам (пусто до загрузки из базы данных)
+    """
+
+    def __init__(self, topics: Sequence[Tuple[str, Optional[int]]]):
+        """
+        Инициализация кэша.
+
+        Args:
+            topics (Sequence[Tuple[str, Optional[int]]]): Темы и количество задач (None, если неизвестно)
+        """
+        self.topics: List[str] = []
+        self.version = 0
+        self.counts: Dict[str, int] = {}
+        self._topic_pages: List[InlineKeyboardMarkup] = []
+        self._difficulties = _build_difficulties_keyboard()
+        self._difficulties_to = {int(diff): _build_difficulties_to_keyboard(int(diff)) for diff in DIFFICULTIES}
+        self.rebuild(topics)
+
+    def rebuild(self, topics: Sequence[Tuple[str, Optional[int]]]) -> None:
+        """
+        Перестраивает клавиатуры с темами и атомарно заменяет ими текущие.
+
+        Args:
+            topics (Sequence[Tuple[str, Optional[int]]]): Темы и количество задач (None, если неизвестно)
+        """
+        topics = list(topics)
+        names = [topic for topic, _ in topics]
+        version = topics_version(names)
+        pages = max(1, -(-len(topics) // TOPICS_PER_PAGE))
+        self._topic_pages = [_build_topics_keyboard(topics, version, page) for page in range(pages)]
+        self.topics, self.version = names, version
+        self.counts = {topic: count for topic, count in topics if count is not None}
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Перестраивает клавиатуры по тегам из базы данных.
+
+        Если таблица тегов пуста, клавиатуры не меняются.
+
+        Args:
+            session (AsyncSession): Асинхронная сессия SQLAlchemy
+        """
+        topics = await TagCRUD(session).get_problem_counts()
+        if not topics:
+            logger.warning("Таблица тегов пуста, клавиатуры тем не перестроены")
+            return
+        self.rebuild(topics)
+        logger.info("Клавиатуры тем перестроены: %d тем", len(topics))
+
+    def topic(self, version: int, ordinal: int) -> Optional[str]:
+        """
+        Возвращает тему по номеру из данных кнопки.
+
+        Args:
+            version (int): Версия списка тем, с которой построена кнопка
+            ordinal (int): Номер темы в списке
+
+        Returns:
+            Optional[str]: Название темы или None, если кнопка построена по другому списку тем
+        """
+        if version != self.version or not 0 <= ordinal < len(self.topics):
+            return None
+        return self.topics[ordinal]
+
+    def topics_keyboard(self, page: int) -> InlineKeyboardMarkup:
+        """
+        Возвращает страницу клавиатуры с темами.
+        """
+        if 0 <= page < len(self._topic_pages):
+            return self._topic_pages[page]
+        return InlineKeyboardMarkup(inline_keyboard=[])
+
+    def difficulties_keyboard(self) -> InlineKeyboardMarkup:
+        """
+        Возвращает клавиатуру для выбора минимальной сложности.
+        """
+        return self._difficulties
+
+    def difficulties_to_keyboard(self, difficulty_from: float) -> InlineKeyboardMarkup:
+        """
+        Возвращает клавиатуру для выбора максимальной сложности.
+        """
+        keyboard = self._difficulties_to.get(difficulty_from)
+        return keyboard if keyboard is not None else _build_difficulties_to_keyboard(difficulty_from)
+
+
+# Общий кэш клавиатур приложения
+keyboards = KeyboardCache([(topic, None) for topic in TOPICS])
+
+
+@on_catalog_refresh
+async def reload_keyboards() -> None:
+    """
+    Перестраивает клавиатуры по тегам из базы данных.
+    """
+    from app.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await keyboards.load(session)
+
 
 def get_topics_keyboard(page: int = 0) -> InlineKeyboardMarkup:
     """
-    Создает клавиатуру с темами задач.
+    Возвращает клавиатуру с темами задач.
     
     Args:
         page (int): Номер страницы (начиная с 0)
@@ -35,17 +264,38 @@ def get_topics_keyboard(page: int = 0) -> InlineKeyboardMarkup:
         InlineKeyboardMarkup: Клавиатура с темами и кнопками навигации
     
     Примечания:
-        - Темы отображаются по 2 в строке
+        - Темы отображаются по 2 в строке, с количеством задач, если оно известно
         - Внизу добавляются кнопки навигации (если есть предыдущая/следующая страница)
+        - Клавиатура строится заранее и общая для всех пользователей
+    """
+    return keyboards.topics_keyboard(page)
+
+
+def get_multi_topics_keyboard(page: int, include: List[str], exclude: List[str]) -> InlineKeyboardMarkup:
     """
+    Создает клавиатуру для отметки нескольких тем.
+
+    Args:
+        page (int): Номер страницы (начиная с 0)
+        include (List[str]): Темы, которые должны быть у задачи
+        exclude (List[str]): Темы, которых не должно быть у задачи
+
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с темами, кнопками навигации и кнопкой «Готово»
+
+    Примечания:
+        - Включённые темы отмечаются ✅, исключённые — 🚫
+        - Нажатие на тему переключает её: не отмечена → включена → исключена → не отмечена
+    """
+    topics, version = keyboards.topics, keyboards.version
     start = page * TOPICS_PER_PAGE
     end = start + TOPICS_PER_PAGE
-    page_topics = TOPICS[start:end]
 
     buttons = []
     row = []
-    for i, topic in enumerate(page_topics, 1):
-        row.append(InlineKeyboardButton(text=topic, callback_data=f"topic:{topic}"))
+    for i, topic in enumerate(topics[start:end], 1):
+        mark = "✅ " if topic in include else "🚫 " if topic in exclude else ""
+        row.append(InlineKeyboardButton(text=f"{mark}{topic}", callback_data=pack(MULTI_TOPIC, version, start + i - 1)))
         if i % 2 == 0:
             buttons.append(row)
             row = []
@@ -54,22 +304,19 @@ def get_topics_keyboard(page: int = 0) -> InlineKeyboardMarkup:
 
     nav_buttons = []
     if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"page:{page - 1}"))
-    if end < len(TOPICS):
-        nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=f"page:{page + 1}"))
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=pack(MULTI_PAGE, page - 1)))
+    if end < len(topics):
+        nav_buttons.append(InlineKeyboardButton(text="Вперёд ➡️", callback_data=pack(MULTI_PAGE, page + 1)))
     if nav_buttons:
         buttons.append(nav_buttons)
+    buttons.append([InlineKeyboardButton(text="Готово", callback_data=pack(MULTI_DONE))])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-# Список доступных уровней сложности
-DIFFICULTIES = ["800", "1000", "1200", "1400", "1600", "1800", "2000", "2200", "2400", "2600"]
-
-
 def get_difficulties_keyboard() -> InlineKeyboardMarkup:
     """
-    Создает клавиатуру для выбора минимальной сложности.
+    Возвращает клавиатуру для выбора минимальной сложности.
     
     Returns:
         InlineKeyboardMarkup: Клавиатура с уровнями сложности
@@ -78,21 +325,12 @@ def get_difficulties_keyboard() -> InlineKeyboardMarkup:
         - Сложности отображаются по 3 в строке
         - Каждая кнопка имеет формат "От X"
     """
-    buttons = []
-    row = []
-    for i, diff in enumerate(DIFFICULTIES, 1):
-        row.append(InlineKeyboardButton(text=f"От {diff}", callback_data=f"difficulty:{diff}"))
-        if i % 3 == 0:  # 3 кнопки в строке
-            buttons.append(row)
-            row = []
-    if row:
-        buttons.append(row)
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return keyboards.difficulties_keyboard()
 
 
 def get_difficulties_to_keyboard(difficulty_from: float) -> InlineKeyboardMarkup:
     """
-    Создает клавиатуру для выбора максимальной сложности.
+    Возвращает клавиатуру для выбора максимальной сложности.
     
     Args:
         difficulty_from (float): Выбранная минимальная сложность
@@ -105,16 +343,4 @@ def get_difficulties_to_keyboard(difficulty_from: float) -> InlineKeyboardMarkup
         - Сложности отображаются по 3 в строке
         - Каждая кнопка имеет формат "До X"
     """
-    # Фильтруем сложности, чтобы "до" была больше выбранной "от"
-    valid_difficulties = [diff for diff in DIFFICULTIES if float(diff) > difficulty_from]
-
-    buttons = []
-    row = []
-    for diff in valid_difficulties:
-        row.append(InlineKeyboardButton(text=f"До {diff}", callback_data=f"difficulty_to:{diff}"))
-        if len(row) == 3:  # 3 кнопки в строке
-            buttons.append(row)
-            row = []
-    if row:
-        buttons.append(row)
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return keyboards.difficulties_to_keyboard(difficulty_from)
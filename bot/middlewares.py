@@ -0,0 +1,108 @@
+"""
+Модуль middleware бота для сбора метрик.
+
+Длительность обработчика замеряется без последнего вызова Bot API, который
+обработчик возвращает: этот вызов, как и все остальные запросы к Bot API,
+замеряется отдельно на уровне сессии бота. Так по метрикам видно, уходит ли
+время на обработчик (и его SQL-запросы) или на ответ Telegram.
+
+Этот модуль отвечает за:
+1. Замер длительности и подсчёт ошибок обработчиков
+2. Замер длительности запросов к Bot API
+3. Подключение метрик к диспетчеру и боту
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.types import CallbackQuery, TelegramObject
+
+from app.metrics import BOT_API_SECONDS, HANDLER_ERRORS, HANDLER_SECONDS
+from bot.callbacks import CallbackRouter
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """
+    Middleware, замеряющий длительность обработчиков.
+
+    Обработчик определяется по имени функции; для callback-запросов — по коду
+    из данных кнопки, так как все они проходят через один обработчик aiogram.
+    """
+
+    def __init__(self, callbacks: Optional[CallbackRouter] = None):
+        """
+        Инициализация middleware.
+
+        Args:
+            callbacks (Optional[CallbackRouter]): Маршрутизатор callback-запросов
+        """
+        self.callbacks = callbacks
+
+    def _handler_name(self, event: TelegramObject, data: Dict[str, Any]) -> str:
+        if self.callbacks is not None and isinstance(event, CallbackQuery):
+            return self.callbacks.handler_name(event.data or "")
+        handler = data.get("handler")
+        return handler.callback.__name__ if handler is not None else "unknown"
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        name = self._handler_name(event, data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(1, name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+class BotApiTimingMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, замеряющий длительность запросов к Bot API.
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod
+    ) -> Response:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - started, method.__api_method__)
+
+
+def setup_handler_metrics(dispatcher: Dispatcher, callbacks: Optional[CallbackRouter] = None) -> None:
+    """
+    Подключает сбор метрик к обработчикам сообщений и callback-запросов.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота
+        callbacks (Optional[CallbackRouter]): Маршрутизатор callback-запросов
+    """
+    timing = HandlerTimingMiddleware(callbacks)
+    dispatcher.message.middleware(timing)
+    dispatcher.callback_query.middleware(timing)
+
+
+def setup_bot_api_metrics(bot: Bot) -> None:
+    """
+    Подключает сбор метрик запросов к Bot API к сессии бота.
+
+    Middleware добавляется последним, поэтому замеряет запросы без ожидания
+    в очередях middleware, подключённых раньше (см. bot.outbound).
+
+    Args:
+        bot (Bot): Экземпляр бота
+    """
+    bot.session.middleware(BotApiTimingMiddleware())
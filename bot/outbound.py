@@ -0,0 +1,415 @@
+"""
+Модуль планировщика исходящих запросов к Bot API.
+
+Telegram ограничивает частоту сообщений: около 30 в секунду на бота, около
+одного в секунду в личный чат и 20 в минуту в группу. При превышении запрос
+завершается ответом 429 с retry_after, и без повтора сообщение теряется.
+
+Планировщик — middleware сессии бота, поэтому через него проходят все
+запросы, отправляющие или изменяющие сообщения в чате, в том числе вызовы,
+которые обработчик возвращает диспетчеру. Запросы каждого чата отправляются
+по очереди, с ограничением частоты ведром токенов чата и общим ведром бота;
+остальные запросы (answerCallbackQuery, getUpdates и т.п.) проходят сразу.
+Ответы, которые в режиме webhook передаются прямо в ответе на запрос
+Telegram, через сессию не проходят и планировщиком не ограничиваются.
+
+Этот модуль отвечает за:
+1. Ограничение частоты запросов к чату и к боту в целом
+2. Объединение повторных изменений одного сообщения, ещё не отправленных
+3. Повтор запроса после ответа 429 через указанное в нём время
+4. Ограничение длины очередей: при заполнении вызывающий ждёт места
+5. Отправку очередей при остановке не дольше SEND_CLOSE_TIMEOUT
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+from app.metrics import BOT_SEND_COALESCED, BOT_SEND_RETRIES, BOT_SEND_WAIT_SECONDS
+from constants import (
+    SEND_CHAT_BURST,
+    SEND_CHAT_QUEUE_SIZE,
+    SEND_CHAT_RATE,
+    SEND_CLOSE_TIMEOUT,
+    SEND_GROUP_RATE,
+    SEND_MAX_RETRIES,
+    SEND_QUEUE_SIZE,
+    SEND_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Методы, отправляющие или изменяющие сообщения, помимо send* и edit*
+LIMITED_METHODS = frozenset({"copyMessage", "copyMessages", "forwardMessage", "forwardMessages"})
+# Изменения сообщения, которые полностью заменяют предыдущее изменение того же вида
+COALESCED_METHODS = frozenset({"editMessageText", "editMessageCaption", "editMessageReplyMarkup"})
+
+
+class SchedulerClosed(RuntimeError):
+    """
+    Запрос не отправлен, так как планировщик остановлен.
+    """
+
+
+def is_limited(method: TelegramMethod) -> bool:
+    """
+    Проверяет, ограничивается ли частота запроса.
+
+    Args:
+        method (TelegramMethod): Запрос к Bot API
+
+    Returns:
+        bool: True для запросов, отправляющих или изменяющих сообщения в чате
+    """
+    name = method.__api_method__
+    return (
+        getattr(method, "chat_id", None) is not None
+        and (name.startswith("send") or name.startswith("edit") or name in LIMITED_METHODS)
+    )
+
+
+class TokenBucket:
+    """
+    Ведро токенов: не больше capacity запросов подряд и rate запросов в секунду в среднем.
+
+    Attributes:
+        rate (float): Скорость пополнения, токенов в секунду
+        capacity (float): Ёмкость ведра
+        tokens (float): Доступные токены на момент updated
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Инициализация полного ведра.
+
+        Args:
+            rate (float): Скорость пополнения, токенов в секунду
+            capacity (float): Ёмкость ведра
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """
+        Забирает токен, если он есть.
+
+        Returns:
+            float: 0, если токен забран, иначе время до появления токена в секундах
+        """
+        now = time.monotonic()
+        if now < self.updated:
+            # Ведро приостановлено до updated
+            return self.updated - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """
+        Ждёт и забирает токен.
+        """
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Опустошает ведро и останавливает пополнение на seconds секунд.
+        """
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    def refill_time(self) -> float:
+        """
+        Возвращает время до полного пополнения ведра в секундах.
+        """
+        now = time.monotonic()
+        tokens = self.tokens + max(0.0, now - self.updated) * self.rate
+        return max(0.0, self.updated - now) + max(0.0, self.capacity - tokens) / self.rate
+
+
+class _Job:
+    """
+    Запрос в очереди чата и ожидающие его результата вызывающие.
+    """
+
+    __slots__ = ("method", "bot", "make_request", "key", "waiters", "queued")
+
+    def __init__(self, method: TelegramMethod, bot: Bot, make_request: NextRequestMiddlewareType, key: Optional[tuple]):
+        self.method = method
+        self.bot = bot
+        self.make_request = make_request
+        self.key = key
+        self.waiters: List[asyncio.Future] = []
+        self.queued = time.perf_counter()
+
+    def resolve(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        for waiter in self.waiters:
+            if waiter.done():
+                continue
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(result)
+
+
+class _Chat:
+    """
+    Очередь запросов одного чата.
+    """
+
+    __slots__ = ("bucket", "jobs", "edits", "slots", "waiting", "task")
+
+    def __init__(self, rate: float, burst: int, queue_size: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.jobs: Deque[_Job] = deque()
+        # Ещё не отправленные изменения сообщений по (метод, message_id)
+        self.edits: Dict[Tuple[str, int], _Job] = {}
+        self.slots = asyncio.Semaphore(queue_size)
+        # Вызывающие, ждущие места в очереди
+        self.waiting = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, отправляющий запросы к чатам через очереди с ограничением частоты.
+
+    Очередь чата существует, пока в ней есть запросы и пока его ведро не
+    пополнилось, поэтому память занимают только недавно активные чаты.
+
+    Attributes:
+        rate (float): Запросов в секунду на бота
+        chat_rate (float): Запросов в секунду в личный чат
+        group_rate (float): Запросов в секунду в группу или канал
+        chat_burst (int): Запросов в чат подряд без ожидания
+        chat_queue_size (int): Максимальная длина очереди чата
+        max_retries (int): Количество повторов после ответа 429
+        close_timeout (float): Сколько секунд при остановке ждать отправки очередей
+    """
+
+    def __init__(
+            self,
+            rate: float = SEND_RATE,
+            chat_rate: float = SEND_CHAT_RATE,
+            group_rate: float = SEND_GROUP_RATE,
+            chat_burst: int = SEND_CHAT_BURST,
+            queue_size: int = SEND_QUEUE_SIZE,
+            chat_queue_size: int = SEND_CHAT_QUEUE_SIZE,
+            max_retries: int = SEND_MAX_RETRIES,
+            close_timeout: float = SEND_CLOSE_TIMEOUT
+    ):
+        """
+        Инициализация планировщика.
+
+        Args:
+            rate (float): Запросов в секунду на бота
+            chat_rate (float): Запросов в секунду в личный чат
+            group_rate (float): Запросов в секунду в группу или канал
+            chat_burst (int): Запросов в чат подряд без ожидания
+            queue_size (int): Максимальное количество запросов во всех очередях
+            chat_queue_size (int): Максимальная длина очереди чата
+            max_retries (int): Количество повторов после ответа 429
+            close_timeout (float): Сколько секунд при остановке ждать отправки очередей
+        """
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.chat_queue_size = chat_queue_size
+        self.max_retries = max_retries
+        self.close_timeout = close_timeout
+
+        self._bucket = TokenBucket(rate, max(1.0, rate))
+        # Ведро бота общее для всех очередей; блокировка выдаёт токены в порядке ожидания
+        self._bucket_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(queue_size)
+        self._chats: Dict[Union[int, str], _Chat] = {}
+        # Запросы, взятые из очередей и ещё не получившие ответ
+        self._sending = 0
+        # Последний чат, получивший ответ 429, и время по time.monotonic(), до которого он приостановлен
+        self._flooded: Tuple[Optional[Union[int, str]], float] = (None, 0.0)
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """
+        Количество запросов в очередях.
+        """
+        return sum(len(chat.jobs) for chat in self._chats.values())
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod
+    ) -> Response:
+        if not is_limited(method):
+            return await make_request(bot, method)
+        if self._closed:
+            raise SchedulerClosed("Планировщик исходящих запросов остановлен")
+
+        chat_id = method.chat_id
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            private = isinstance(chat_id, int) and chat_id > 0
+            chat = self._chats[chat_id] = _Chat(
+                self.chat_rate if private else self.group_rate, self.chat_burst, self.chat_queue_size
+            )
+
+        name = method.__api_method__
+        message_id = getattr(method, "message_id", None)
+        key = (name, message_id) if name in COALESCED_METHODS and message_id is not None else None
+        waiter = asyncio.get_running_loop().create_future()
+
+        job = chat.edits.get(key) if key is not None else None
+        if job is not None:
+            # Предыдущее изменение ещё не отправлено: отправится только последнее
+            job.method = method
+            job.waiters.append(waiter)
+            BOT_SEND_COALESCED.inc(1, name)
+            return await waiter
+
+        chat.waiting += 1
+        try:
+            await chat.slots.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                chat.slots.release()
+                raise
+        finally:
+            chat.waiting -= 1
+        if self._closed:
+            # Место освободила остановка планировщика
+            self._slots.release()
+            chat.slots.release()
+            raise SchedulerClosed("Планировщик исходящих запросов остановлен")
+
+        job = _Job(method, bot, make_request, key)
+        job.waiters.append(waiter)
+        chat.jobs.append(job)
+        if key is not None:
+            chat.edits[key] = job
+        if chat.task is None:
+            chat.task = asyncio.create_task(self._drain(chat_id, chat))
+        return await waiter
+
+    async def close(self) -> None:
+        """
+        Дожидается отправки запросов из очередей и останавливает их обработку.
+
+        Запросы, не отправленные за close_timeout секунд, отменяются: ожидающие
+        их вызывающие, как и все последующие, получают SchedulerClosed.
+        """
+        deadline = time.monotonic() + self.close_timeout
+        while (self.pending or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._closed = True
+        tasks = [chat.task for chat in self._chats.values() if chat.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        dropped = 0
+        for chat in self._chats.values():
+            while chat.jobs:
+                chat.jobs.popleft().resolve(error=SchedulerClosed("Планировщик исходящих запросов остановлен"))
+                # Ждущие места в очереди вызывающие получат его и узнают об остановке
+                chat.slots.release()
+                self._slots.release()
+                dropped += 1
+            chat.edits.clear()
+        if dropped:
+            logger.warning("Планировщик остановлен, не отправлено запросов: %d", dropped)
+        self._chats.clear()
+
+    async def _take(self, chat: _Chat) -> None:
+        await chat.bucket.acquire()
+        async with self._bucket_lock:
+            await self._bucket.acquire()
+
+    async def _drain(self, chat_id: Union[int, str], chat: _Chat) -> None:
+        """
+        Отправляет запросы чата по очереди, затем ждёт пополнения его ведра и удаляет очередь.
+        """
+        try:
+            while True:
+                while chat.jobs:
+                    await self._take(chat)
+                    job = chat.jobs.popleft()
+                    if job.key is not None:
+                        del chat.edits[job.key]
+                    self._sending += 1
+                    try:
+                        await self._send(chat_id, chat, job)
+                    finally:
+                        self._sending -= 1
+                        chat.slots.release()
+                        self._slots.release()
+                # Очередь сразу после опустошения не удаляется, иначе новый запрос
+                # в этот чат получил бы полное ведро раньше времени
+                await asyncio.sleep(chat.bucket.refill_time())
+                if not chat.jobs:
+                    break
+        finally:
+            chat.task = None
+            if not chat.jobs and not chat.waiting and self._chats.get(chat_id) is chat:
+                del self._chats[chat_id]
+
+    async def _send(self, chat_id: Union[int, str], chat: _Chat, job: _Job) -> None:
+        """
+        Выполняет запрос, повторяя его после ответа 429, и передаёт результат ожидающим.
+        """
+        name = job.method.__api_method__
+        BOT_SEND_WAIT_SECONDS.observe(time.perf_counter() - job.queued, name)
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await job.make_request(job.bot, job.method)
+            except TelegramRetryAfter as error:
+                if attempt == self.max_retries:
+                    job.resolve(error=error)
+                    return
+                logger.warning("Ответ 429 на %s, повтор через %s с", name, error.retry_after)
+                BOT_SEND_RETRIES.inc(1, name)
+                chat.bucket.pause(error.retry_after)
+                self._pause_if_global(chat_id, error.retry_after)
+                await self._take(chat)
+            except asyncio.CancelledError:
+                # Обработку очереди отменяет только остановка планировщика
+                job.resolve(error=SchedulerClosed("Планировщик исходящих запросов остановлен"))
+                raise
+            except Exception as error:
+                job.resolve(error=error)
+                return
+            else:
+                job.resolve(result)
+                return
+
+    def _pause_if_global(self, chat_id: Union[int, str], retry_after: float) -> None:
+        """
+        Приостанавливает ведро бота, если ответ 429 вызван общим ограничением бота.
+
+        Ответ 429 не говорит, какое ограничение превышено. Ограничение чата
+        касается только этого чата, и его очередь уже приостановлена. Если же
+        пока приостановлен один чат, ответ 429 получает другой, превышено
+        общее ограничение бота (например, его превышают вместе несколько
+        процессов с одним токеном), и приостанавливаются все очереди.
+        """
+        now = time.monotonic()
+        flooded, until = self._flooded
+        if flooded is not None and flooded != chat_id and now < until:
+            logger.warning("Ответы 429 в нескольких чатах, все отправки приостановлены на %s с", retry_after)
+            self._bucket.pause(retry_after)
+        self._flooded = (chat_id, now + retry_after)
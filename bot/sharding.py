@@ -0,0 +1,447 @@
+"""
+Модуль обработки обновлений в нескольких процессах.
+
+Один процесс (ingress) получает обновления через getUpdates или webhook и,
+не строя моделей aiogram, по номеру чата передаёт каждое обновление одному из
+рабочих процессов. Все обновления одного чата попадают в один и тот же
+процесс и обрабатываются в нём по порядку, поэтому порядок ответов и
+локальный кэш состояний FSM сохраняются, а разбор обновлений и работа
+обработчиков распределяются по ядрам.
+
+Этот модуль отвечает за:
+1. Определение чата обновления и номера рабочего процесса для него
+2. Запуск рабочих процессов и перезапуск упавших
+3. Упорядоченную по чатам обработку обновлений в рабочем процессе
+4. Получение обновлений в процессе ingress через getUpdates или webhook
+"""
+
+import asyncio
+import hmac
+import logging
+import multiprocessing
+import queue
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from bot.webhook import register_webhook, serve_app
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество обновлений в очереди одного рабочего процесса
+QUEUE_SIZE = 10_000
+# Максимальное количество обновлений в обработке в одном рабочем процессе
+MAX_PENDING = 256
+# Время ожидания новых обновлений в getUpdates, в секундах
+POLLING_TIMEOUT = 30
+# Интервал проверки рабочих процессов, в секундах
+WATCH_INTERVAL = 1.0
+
+# Виды сообщений, которые ingress передаёт рабочим процессам
+UPDATE = "update"
+REFRESH = "refresh"
+STOP = "stop"
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    """
+    Определяет чат, к которому относится обновление, по его JSON-представлению.
+
+    Для обновлений без чата (например, inline-запросов) используется
+    идентификатор пользователя.
+
+    Args:
+        update (Dict[str, Any]): Обновление в формате Bot API
+
+    Returns:
+        Optional[int]: Идентификатор чата или None, если обновление не связано с чатом
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return None
+
+
+def shard_for(chat_id: Optional[int], workers: int) -> int:
+    """
+    Возвращает номер рабочего процесса для чата.
+
+    Args:
+        chat_id (Optional[int]): Идентификатор чата
+        workers (int): Количество рабочих процессов
+
+    Returns:
+        int: Номер рабочего процесса от 0 до workers - 1
+    """
+    return 0 if chat_id is None else chat_id % workers
+
+
+class ShardWorker:
+    """
+    Обработчик обновлений рабочего процесса.
+
+    Обновления разных чатов обрабатываются конкурентно, обновления одного
+    чата — строго в порядке поступления.
+
+    Attributes:
+        dispatcher (Dispatcher): Диспетчер бота
+        bot (Bot): Экземпляр бота
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_pending: int = MAX_PENDING):
+        """
+        Инициализация обработчика.
+
+        Args:
+            dispatcher (Dispatcher): Диспетчер бота
+            bot (Bot): Экземпляр бота
+            max_pending (int): Максимальное количество обновлений в обработке
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self._slots = asyncio.Semaphore(max_pending)
+        # Последнее принятое обновление каждого чата, которое ещё обрабатывается
+        self._tails: Dict[Optional[int], asyncio.Task] = {}
+
+    async def submit(self, update: Dict[str, Any]) -> asyncio.Task:
+        """
+        Принимает обновление в обработку.
+
+        Ждёт, если в обработке уже max_pending обновлений.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+
+        Returns:
+            asyncio.Task: Задача обработки обновления
+        """
+        await self._slots.acquire()
+        chat_id = chat_id_of(update)
+        task = asyncio.create_task(self._process(self._tails.get(chat_id), update))
+        self._tails[chat_id] = task
+        task.add_done_callback(lambda done: self._forget(chat_id, done))
+        return task
+
+    async def drain(self) -> None:
+        """
+        Дожидается обработки всех принятых обновлений.
+        """
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+    async def _process(self, previous: Optional[asyncio.Task], update: Dict[str, Any]) -> None:
+        try:
+            if previous is not None:
+                await previous
+            response = await self.dispatcher.feed_raw_update(self.bot, update)
+            if isinstance(response, TelegramMethod):
+                await self.dispatcher.silent_call_request(self.bot, response)
+        except Exception:
+            logger.exception("Ошибка обработки обновления %s", update.get("update_id"))
+        finally:
+            self._slots.release()
+
+    def _forget(self, chat_id: Optional[int], task: asyncio.Task) -> None:
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+
+def _next_batch(source: "multiprocessing.Queue") -> List[tuple]:
+    """
+    Ждёт сообщение из очереди и забирает вместе с ним все уже накопленные.
+    """
+    batch = [source.get()]
+    try:
+        while len(batch) < MAX_PENDING:
+            batch.append(source.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+async def _run_worker(index: int, source: "multiprocessing.Queue", api_base: Optional[str]) -> None:
+    from app.metrics import serve_metrics
+    from app.refresh import notify_catalog_refreshed
+    from bot.bot import create_bot, get_dispatcher
+    from constants import BOT_WORKERS, METRICS_ENABLED, METRICS_HOST, METRICS_PORT, SEND_RATE
+
+    dp = get_dispatcher()
+    # Чаты распределены между процессами, а общее ограничение бота делится поровну
+    bot = create_bot(
+        session=AiohttpSession(api=TelegramAPIServer.from_base(api_base)) if api_base is not None else None,
+        send_rate=SEND_RATE / BOT_WORKERS
+    )
+
+    metrics = None
+    if METRICS_ENABLED:
+        # Каждый рабочий процесс отдаёт свои метрики на следующем за ingress порту
+        metrics = await serve_metrics(METRICS_HOST, METRICS_PORT + index + 1)
+    await notify_catalog_refreshed()
+    await dp.emit_startup(bot=bot)
+    worker = ShardWorker(dp, bot)
+    loop = asyncio.get_running_loop()
+    logger.info("Рабочий процесс %d запущен", index)
+    try:
+        while True:
+            for kind, payload in await loop.run_in_executor(None, _next_batch, source):
+                if kind == UPDATE:
+                    await worker.submit(payload)
+                elif kind == REFRESH:
+                    await notify_catalog_refreshed()
+                elif kind == STOP:
+                    return
+    finally:
+        await worker.drain()
+        await dp.emit_shutdown(bot=bot)
+        await dp.storage.close()
+        await bot.session.close()
+        if metrics is not None:
+            await metrics.cleanup()
+
+
+def worker_main(index: int, source: "multiprocessing.Queue", api_base: Optional[str] = None) -> None:
+    """
+    Точка входа рабочего процесса.
+
+    Args:
+        index (int): Номер рабочего процесса
+        source (multiprocessing.Queue): Очередь сообщений от ingress
+        api_base (Optional[str]): Адрес сервера Bot API, если используется не api.telegram.org
+    """
+    from app.logging_config import configure_logging
+
+    configure_logging()
+    asyncio.run(_run_worker(index, source, api_base))
+
+
+class ShardSupervisor:
+    """
+    Набор рабочих процессов и маршрутизация обновлений между ними.
+
+    Рабочие процессы запускаются методом spawn: каждый создаёт собственные
+    движок базы данных, HTTP-сессию и диспетчер.
+
+    Attributes:
+        workers (int): Количество рабочих процессов
+        api_base (Optional[str]): Адрес сервера Bot API для рабочих процессов
+        queues (List[multiprocessing.Queue]): Очереди рабочих процессов
+    """
+
+    def __init__(self, workers: int, queue_size: int = QUEUE_SIZE, api_base: Optional[str] = None):
+        """
+        Инициализация набора рабочих процессов.
+
+        Args:
+            workers (int): Количество рабочих процессов
+            queue_size (int): Максимальное количество обновлений в очереди одного процесса
+            api_base (Optional[str]): Адрес сервера Bot API для рабочих процессов
+        """
+        self.workers = workers
+        self.api_base = api_base
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = [self._context.Queue(queue_size) for _ in range(workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._stopping = False
+
+    def start(self) -> None:
+        """
+        Запускает рабочие процессы.
+        """
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.queues[index], self.api_base),
+            name=f"bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+
+    async def route(self, update: Dict[str, Any]) -> None:
+        """
+        Передаёт обновление рабочему процессу его чата.
+
+        Если очередь процесса заполнена, ждёт освобождения места.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+        """
+        await self._put(self.queues[shard_for(chat_id_of(update), self.workers)], (UPDATE, update))
+
+    async def broadcast_refresh(self) -> None:
+        """
+        Просит все рабочие процессы перезагрузить данные, зависящие от каталога.
+        """
+        for target in self.queues:
+            await self._put(target, (REFRESH, None))
+
+    async def watch(self) -> None:
+        """
+        Перезапускает завершившиеся рабочие процессы до остановки набора.
+        """
+        while not self._stopping:
+            await asyncio.sleep(WATCH_INTERVAL)
+            for index, process in enumerate(self._processes):
+                if not self._stopping and process is not None and not process.is_alive():
+                    logger.error("Рабочий процесс %d завершился с кодом %s, перезапуск", index, process.exitcode)
+                    self._spawn(index)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Останавливает рабочие процессы после обработки принятых обновлений.
+
+        Args:
+            timeout (float): Время ожидания завершения каждого процесса, в секундах
+        """
+        self._stopping = True
+        loop = asyncio.get_running_loop()
+        for target in self.queues:
+            await self._put(target, (STOP, None))
+        for process in self._processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+
+    @staticmethod
+    async def _put(target: "multiprocessing.Queue", item: tuple) -> None:
+        try:
+            target.put_nowait(item)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, target.put, item)
+
+
+async def poll_updates(
+        supervisor: ShardSupervisor,
+        token: str,
+        allowed_updates: List[str],
+        api: TelegramAPIServer = PRODUCTION
+) -> None:
+    """
+    Получает обновления через getUpdates и передаёт их рабочим процессам.
+
+    Ответ getUpdates разбирается как JSON без построения моделей aiogram.
+
+    Args:
+        supervisor (ShardSupervisor): Набор рабочих процессов
+        token (str): Токен бота
+        allowed_updates (List[str]): Типы обновлений, которые обрабатывает бот
+        api (TelegramAPIServer): Сервер Bot API
+    """
+    url = api.api_url(token=token, method="getUpdates")
+    offset = None
+    timeout = aiohttp.ClientTimeout(total=POLLING_TIMEOUT + 10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while True:
+            try:
+                async with session.post(url, json={
+                    "offset": offset, "timeout": POLLING_TIMEOUT, "allowed_updates": allowed_updates
+                }) as response:
+                    body = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                logger.warning("Ошибка getUpdates: %s", error)
+                await asyncio.sleep(1)
+                continue
+            if not body.get("ok"):
+                logger.error("Ошибка getUpdates: %s", body.get("description"))
+                await asyncio.sleep((body.get("parameters") or {}).get("retry_after", 1))
+                continue
+            for update in body["result"]:
+                await supervisor.route(update)
+                offset = update["update_id"] + 1
+
+
+def build_ingress_app(supervisor: ShardSupervisor, path: str, secret_token: Optional[str] = None) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, принимающее обновления и передающее их рабочим процессам.
+
+    Telegram получает ответ сразу после постановки обновления в очередь,
+    поэтому отвечать в теле webhook в этом режиме нельзя.
+
+    Args:
+        supervisor (ShardSupervisor): Набор рабочих процессов
+        path (str): Путь, на который Telegram отправляет обновления
+        secret_token (Optional[str]): Секретный токен webhook
+
+    Returns:
+        web.Application: Приложение aiohttp
+    """
+    async def handle(request: web.Request) -> web.Response:
+        if secret_token and not hmac.compare_digest(
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token
+        ):
+            return web.Response(status=401, text="Unauthorized")
+        await supervisor.route(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    return app
+
+
+async def run_sharded(
+        dispatcher: Dispatcher,
+        bot: Bot,
+        workers: int,
+        mode: str,
+        url: Optional[str] = None,
+        path: str = "/webhook",
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        secret_token: Optional[str] = None,
+        max_concurrency: int = 32
+) -> None:
+    """
+    Запускает рабочие процессы и получает для них обновления до остановки.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота, по которому определяются типы обновлений
+        bot (Bot): Экземпляр бота
+        workers (int): Количество рабочих процессов
+        mode (str): Режим получения обновлений: polling или webhook
+        url (Optional[str]): Внешний адрес бота для режима webhook
+        path (str): Путь, на который Telegram отправляет обновления
+        host (str): Адрес, на котором слушает приложение
+        port (int): Порт, на котором слушает приложение
+        secret_token (Optional[str]): Секретный токен webhook
+        max_concurrency (int): Максимальное количество соединений Telegram с webhook
+    """
+    from app.catalog import catalog
+    from app.refresh import on_catalog_refresh
+    from app.search import name_index
+
+    # Задачи выбирают и ищут рабочие процессы, ingress каталог и индекс названий в памяти не нужны
+    catalog.enabled = False
+    name_index.enabled = False
+    supervisor = ShardSupervisor(workers)
+    supervisor.start()
+    on_catalog_refresh(supervisor.broadcast_refresh)
+    watcher = asyncio.create_task(supervisor.watch())
+    logger.info("Запущено рабочих процессов: %d", workers)
+
+    allowed_updates = dispatcher.resolve_used_update_types()
+    try:
+        if mode == "webhook":
+            if url:
+                await register_webhook(bot, url, path, secret_token, max_concurrency, allowed_updates)
+            await serve_app(build_ingress_app(supervisor, path, secret_token), host, port)
+        else:
+            await poll_updates(supervisor, bot.token, allowed_updates, bot.session.api)
+    finally:
+        watcher.cancel()
+        await supervisor.stop()
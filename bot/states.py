@@ -13,9 +13,11 @@ class QuizStates(StatesGroup):
     
     Состояния:
         waiting_for_topic: Ожидание выбора темы
+        choosing_topics: Отметка нескольких тем для выражения над тегами
         waiting_for_difficulty_from: Ожидание выбора минимальной сложности
         waiting_for_difficulty_to: Ожидание выбора максимальной сложности
     """
     waiting_for_topic = State()
+    choosing_topics = State()
     waiting_for_difficulty_from = State()
     waiting_for_difficulty_to = State()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Модуль хранилища состояний FSM в базе данных.
+
+Состояния пользователей хранятся в таблице fsm_states, поэтому переживают
+перезапуск бота и доступны нескольким процессам бота. Чтобы не обращаться к
+базе при каждом state.update_data, изменения сначала попадают в локальный кэш
+и записываются в базу пачками в фоне (write-behind, см. app.write_behind),
+а чтения обслуживаются из того же кэша.
+
+Этот модуль отвечает за:
+1. Реализацию BaseStorage aiogram поверх асинхронного движка SQLAlchemy
+2. Локальный кэш прочитанных и записанных состояний
+3. Пакетную отложенную запись изменённых состояний
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import dialect_insert
+from app.models import FsmRecord
+from app.write_behind import WriteBehindCache
+
+# Задержка записи накопленных изменений в базу, в секундах
+FLUSH_INTERVAL = 0.1
+# Максимальное количество записей в локальном кэше
+CACHE_SIZE = 10_000
+# Время, в течение которого прочитанная из базы запись считается актуальной, в секундах
+CACHE_TTL = 30.0
+
+# Запись кэша: состояние, данные и момент чтения или записи по time.monotonic()
+_Entry = Tuple[Optional[str], Dict[str, Any], float]
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в таблице fsm_states.
+
+    Изменения записываются в базу не позже чем через flush_interval секунд и
+    при закрытии хранилища. Если одну запись меняют несколько процессов,
+    в базе остаётся более поздняя по времени изменения. Прочитанные из базы
+    записи кэшируются на cache_ttl секунд, поэтому апдейты одного чата
+    следует обрабатывать в одном процессе.
+
+    Attributes:
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+        key_builder (KeyBuilder): Построитель ключей записей
+        cache_ttl (float): Время актуальности прочитанной записи, в секундах
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            key_builder: Optional[KeyBuilder] = None,
+            flush_interval: float = FLUSH_INTERVAL,
+            cache_size: int = CACHE_SIZE,
+            cache_ttl: float = CACHE_TTL
+    ):
+        """
+        Инициализация хранилища.
+
+        Args:
+            engine (AsyncEngine): Асинхронный движок SQLAlchemy
+            key_builder (Optional[KeyBuilder]): Построитель ключей записей
+            flush_interval (float): Задержка записи изменений, в секундах
+            cache_size (int): Максимальное количество записей в кэше
+            cache_ttl (float): Время актуальности прочитанной записи, в секундах
+        """
+        self.engine = engine
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.cache_ttl = cache_ttl
+
+        table = FsmRecord.__table__
+        upsert = dialect_insert(engine, table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['key'],
+            set_={column: upsert.excluded[column] for column in ('state', 'data', 'updated_at')},
+            where=upsert.excluded.updated_at >= table.c.updated_at
+        )
+        self._entries: WriteBehindCache[str, _Entry] = WriteBehindCache(
+            engine, upsert, _row, "состояний FSM", flush_interval, cache_size
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = self.key_builder.build(key)
+        _, data, _ = await self._entry(name)
+        self._write(name, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._entry(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        name = self.key_builder.build(key)
+        state, _, _ = await self._entry(name)
+        self._write(name, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._entry(self.key_builder.build(key))
+        return data.copy()
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        name = self.key_builder.build(key)
+        state, current, _ = await self._entry(name)
+        current = {**current, **data}
+        self._write(name, state, current)
+        return current.copy()
+
+    async def close(self) -> None:
+        """
+        Записывает накопленные изменения и останавливает фоновую запись.
+        """
+        await self._entries.close()
+
+    async def flush(self) -> None:
+        """
+        Записывает все накопленные изменения в базу одной транзакцией.
+        """
+        await self._entries.flush()
+
+    async def _entry(self, name: str) -> _Entry:
+        """
+        Возвращает запись из кэша, при необходимости читая её из базы.
+        """
+        entry = self._entries.get(name)
+        if entry is not None and (self._entries.is_dirty(name) or time.monotonic() - entry[2] < self.cache_ttl):
+            return entry
+
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(
+                select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == name)
+            )).first()
+
+        # Пока шло чтение, запись могла измениться в этом процессе
+        if self._entries.is_dirty(name):
+            return self._entries.get(name)
+        entry = (row.state, dict(row.data), time.monotonic()) if row else (None, {}, time.monotonic())
+        self._entries.remember(name, entry)
+        return entry
+
+    def _write(self, name: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        self._entries.write(name, (state, data, time.monotonic()))
+
+
+def _row(name: str, entry: _Entry, updated_at: float) -> dict:
+    state, data, _ = entry
+    return {'key': name, 'state': state, 'data': data, 'updated_at': updated_at}
@@ -0,0 +1,186 @@
+"""
+Модуль приёма обновлений Telegram через webhook.
+
+Вместо постоянного опроса getUpdates Telegram сам отправляет обновления
+POST-запросами в aiohttp-приложение бота, поэтому обновления обрабатываются
+без задержки опроса, а несколько экземпляров бота можно поставить за
+балансировщик нагрузки.
+
+Этот модуль отвечает за:
+1. Проверку секретного токена в запросах Telegram
+2. Ограничение количества одновременно обрабатываемых обновлений
+3. Ответ на обновление прямо в теле ответа на запрос Telegram
+4. Запуск aiohttp-приложения и регистрацию webhook в Telegram
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик запросов webhook с ограничением количества одновременно
+    обрабатываемых обновлений.
+
+    Обновления сверх лимита ждут, пока закончится обработка предыдущих. Если
+    обновления обрабатываются не в фоне, метод Bot API, который вернул
+    обработчик, отправляется в ответе на запрос Telegram.
+
+    Attributes:
+        max_concurrency (int): Максимальное количество одновременно обрабатываемых обновлений
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            max_concurrency: int,
+            handle_in_background: bool = False,
+            secret_token: Optional[str] = None,
+            **data: Any
+    ):
+        """
+        Инициализация обработчика.
+
+        Args:
+            dispatcher (Dispatcher): Диспетчер бота
+            bot (Bot): Экземпляр бота
+            max_concurrency (int): Максимальное количество одновременно обрабатываемых обновлений
+            handle_in_background (bool): Отвечать Telegram сразу, обрабатывая обновление в фоне
+            secret_token (Optional[str]): Секретный токен из заголовка X-Telegram-Bot-Api-Secret-Token
+        """
+        super().__init__(
+            dispatcher, bot, handle_in_background=handle_in_background, secret_token=secret_token, **data
+        )
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            await super()._background_feed_update(bot, update)
+
+    async def _handle_request(self, bot: Bot, request: web.Request) -> web.Response:
+        async with self._semaphore:
+            return await super()._handle_request(bot, request)
+
+
+def build_webhook_app(
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str,
+        secret_token: Optional[str] = None,
+        max_concurrency: int = 32,
+        answer_in_response: bool = True
+) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, принимающее обновления по адресу path.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота
+        bot (Bot): Экземпляр бота
+        path (str): Путь, на который Telegram отправляет обновления
+        secret_token (Optional[str]): Секретный токен webhook
+        max_concurrency (int): Максимальное количество одновременно обрабатываемых обновлений
+        answer_in_response (bool): Отправлять результат обработчика в ответе на запрос Telegram
+
+    Returns:
+        web.Application: Приложение aiohttp
+    """
+    app = web.Application()
+    BoundedRequestHandler(
+        dispatcher,
+        bot,
+        max_concurrency=max_concurrency,
+        handle_in_background=not answer_in_response,
+        secret_token=secret_token
+    ).register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def run_webhook(
+        dispatcher: Dispatcher,
+        bot: Bot,
+        url: Optional[str],
+        path: str,
+        host: str,
+        port: int,
+        secret_token: Optional[str] = None,
+        max_concurrency: int = 32,
+        answer_in_response: bool = True
+) -> None:
+    """
+    Регистрирует webhook в Telegram и обслуживает его до остановки приложения.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота
+        bot (Bot): Экземпляр бота
+        url (Optional[str]): Внешний адрес бота; если не задан, webhook регистрируется вне приложения
+        path (str): Путь, на который Telegram отправляет обновления
+        host (str): Адрес, на котором слушает приложение
+        port (int): Порт, на котором слушает приложение
+        secret_token (Optional[str]): Секретный токен webhook
+        max_concurrency (int): Максимальное количество одновременно обрабатываемых обновлений
+        answer_in_response (bool): Отправлять результат обработчика в ответе на запрос Telegram
+    """
+    app = build_webhook_app(dispatcher, bot, path, secret_token, max_concurrency, answer_in_response)
+
+    if url:
+        await register_webhook(bot, url, path, secret_token, max_concurrency, dispatcher.resolve_used_update_types())
+    await serve_app(app, host, port)
+
+
+async def register_webhook(
+        bot: Bot,
+        url: str,
+        path: str,
+        secret_token: Optional[str],
+        max_concurrency: int,
+        allowed_updates: List[str]
+) -> None:
+    """
+    Регистрирует webhook в Telegram.
+
+    Webhook не удаляется при остановке приложения: его обслуживают и другие
+    экземпляры бота.
+
+    Args:
+        bot (Bot): Экземпляр бота
+        url (str): Внешний адрес бота
+        path (str): Путь, на который Telegram отправляет обновления
+        secret_token (Optional[str]): Секретный токен webhook
+        max_concurrency (int): Максимальное количество одновременно обрабатываемых обновлений
+        allowed_updates (List[str]): Типы обновлений, которые обрабатывает бот
+    """
+    await bot.set_webhook(
+        url.rstrip("/") + path,
+        secret_token=secret_token,
+        max_connections=min(max_concurrency, 100),
+        allowed_updates=allowed_updates
+    )
+
+
+async def serve_app(app: web.Application, host: str, port: int) -> None:
+    """
+    Обслуживает aiohttp-приложение до остановки.
+
+    Args:
+        app (web.Application): Приложение aiohttp
+        host (str): Адрес, на котором слушает приложение
+        port (int): Порт, на котором слушает приложение
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Webhook слушает %s:%d", host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
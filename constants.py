@@ -5,6 +5,16 @@
 1. Настройки подключения к базе данных
 2. Настройки временной зоны для планировщика
 3. Токен Telegram бота
+4. Режим обновления каталога задач и каталог для снимка ответа API
+5. Настройки каталога задач в памяти
+6. Настройки хранилища состояний FSM бота
+7. Режим получения обновлений и настройки webhook
+8. Количество рабочих процессов бота
+9. Профиль запуска (dev или production): пул соединений, кэш подготовленных
+   запросов и журналирование
+10. Настройки метрик
+11. Ограничения частоты исходящих запросов к Bot API
+12. Настройки кэша множеств подходящих задач
 """
 
 import os
@@ -27,3 +37,110 @@ moscow = timezone('Europe/Moscow')  # Временная зона Москвы
 
 # Настройки Telegram бота
 TOKEN = os.getenv("TOKEN")  # Токен бота
+
+# Режим обновления каталога задач: delta (только изменения) или full (полная перезагрузка)
+FILL_DB_MODE = os.getenv("FILL_DB_MODE", "delta")
+
+# Каталог, в котором хранится последний ответ API со списком задач
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data")
+
+# Отвечать на запросы выбора задач из каталога в памяти, а не из базы данных
+CATALOG_ENGINE_ENABLED = os.getenv("CATALOG_ENGINE_ENABLED", "true").lower() == "true"
+
+# Хранилище состояний FSM: database (таблица fsm_states) или memory (в памяти процесса)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "database")
+
+# Задержка пакетной записи изменённых состояний FSM в базу данных, в секундах
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.1"))
+
+# Режим получения обновлений: polling (опрос getUpdates) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Настройки webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Внешний адрес бота, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")  # Путь, на который Telegram отправляет обновления
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Секретный токен для проверки запросов Telegram
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")  # Адрес, на котором слушает приложение
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))  # Порт, на котором слушает приложение
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32"))  # Обновлений в обработке одновременно
+# Отправлять ответ обработчика прямо в ответе на запрос Telegram
+WEBHOOK_ANSWER_IN_RESPONSE = os.getenv("WEBHOOK_ANSWER_IN_RESPONSE", "true").lower() == "true"
+
+# Количество рабочих процессов, между которыми обновления распределяются по номеру чата (1 — один процесс)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+
+# Профиль запуска: dev (журнал SQL-запросов, отладочный уровень журнала) или production
+APP_ENV = os.getenv("APP_ENV", "dev")
+
+# Значения настроек по умолчанию для профилей; каждую можно переопределить переменной окружения
+PROFILES = {
+    "dev": {
+        "LOG_LEVEL": "DEBUG",  # Уровень журнала
+        "LOG_QUEUE": "false",  # Записывать журнал в отдельном потоке через очередь
+        "DB_ECHO": "true",  # Записывать в журнал SQL-запросы
+        "DB_POOL_SIZE": "5",  # Количество постоянных соединений в пуле
+        "DB_MAX_OVERFLOW": "10",  # Количество дополнительных соединений сверх пула
+        "DB_POOL_PRE_PING": "false",  # Проверять соединение перед выдачей из пула
+        "DB_STATEMENT_CACHE_SIZE": "100",  # Размер кэша подготовленных запросов asyncpg на соединение
+    },
+    "production": {
+        "LOG_LEVEL": "INFO",
+        "LOG_QUEUE": "true",
+        "DB_ECHO": "false",
+        "DB_POOL_SIZE": "20",
+        "DB_MAX_OVERFLOW": "20",
+        "DB_POOL_PRE_PING": "true",
+        "DB_STATEMENT_CACHE_SIZE": "1000",
+    },
+}
+if APP_ENV not in PROFILES:
+    raise ValueError(f"Неизвестный профиль APP_ENV={APP_ENV!r}, ожидается один из: {', '.join(PROFILES)}")
+
+
+def _setting(name: str) -> str:
+    return os.getenv(name, PROFILES[APP_ENV][name])
+
+
+LOG_LEVEL = _setting("LOG_LEVEL").upper()
+LOG_QUEUE = _setting("LOG_QUEUE").lower() == "true"
+DB_ECHO = _setting("DB_ECHO").lower() == "true"
+DB_POOL_SIZE = int(_setting("DB_POOL_SIZE"))
+DB_MAX_OVERFLOW = int(_setting("DB_MAX_OVERFLOW"))
+DB_POOL_PRE_PING = _setting("DB_POOL_PRE_PING").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(_setting("DB_STATEMENT_CACHE_SIZE"))
+# Совместимость с PgBouncer в режиме пулинга транзакций: подготовленные запросы не кэшируются
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# Настройки метрик в формате Prometheus
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Собирать и отдавать метрики
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")  # Адрес, на котором отдаются метрики
+# Порт, на котором отдаются метрики; рабочие процессы бота используют следующие за ним порты
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Ограничения частоты исходящих запросов к Bot API (сообщений в секунду); при BOT_WORKERS > 1
+# общее ограничение делится между рабочими процессами
+SEND_SCHEDULER_ENABLED = os.getenv("SEND_SCHEDULER_ENABLED", "true").lower() == "true"  # Отправлять через очередь
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))  # Всего на бота
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))  # В один личный чат
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))  # В одну группу или канал
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))  # Сообщений в чат подряд без ожидания
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "1000"))  # Запросов в очереди всего
+SEND_CHAT_QUEUE_SIZE = int(os.getenv("SEND_CHAT_QUEUE_SIZE", "20"))  # Запросов в очереди одного чата
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))  # Повторов запроса после ответа 429
+SEND_CLOSE_TIMEOUT = float(os.getenv("SEND_CLOSE_TIMEOUT", "10"))  # Секунд на отправку очередей при остановке
+
+# Кэш идентификаторов задач, подходящих под фильтр по теме и диапазону рейтинга (без каталога в памяти)
+POOL_CACHE_ENABLED = os.getenv("POOL_CACHE_ENABLED", "true").lower() == "true"  # Использовать кэш
+POOL_CACHE_SIZE = int(os.getenv("POOL_CACHE_SIZE", "4096"))  # Максимальное количество фильтров в кэше
+POOL_CACHE_TTL = float(os.getenv("POOL_CACHE_TTL", "3600"))  # Время жизни записи, в секундах
+
+# Задачи, решённые на Codeforces привязанным хэндлом
+CODEFORCES_API_URL = os.getenv("CODEFORCES_API_URL", "https://codeforces.com/api")  # Адрес Codeforces API
+CODEFORCES_API_INTERVAL = float(os.getenv("CODEFORCES_API_INTERVAL", "2"))  # Секунд между запросами к API
+SOLVED_TTL = float(os.getenv("SOLVED_TTL", "1800"))  # Через сколько секунд решённые задачи синхронизируются снова
+SOLVED_CACHE_SIZE = int(os.getenv("SOLVED_CACHE_SIZE", "10000"))  # Максимальное количество хэндлов в памяти
+SOLVED_PAGE_SIZE = int(os.getenv("SOLVED_PAGE_SIZE", "100"))  # Посылок в одном запросе при дозагрузке новых
+
+# Поиск задач по названию
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "10"))  # Количество задач в ответе на /search
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.3"))  # Доля триграмм запроса в названии
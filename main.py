@@ -2,32 +2,55 @@
 Основной модуль приложения, который запускает бота и планировщик задач.
 
 Этот модуль отвечает за:
-1. Настройку логирования
-2. Запуск планировщика задач для обновления базы данных
-3. Запуск Telegram бота
+1. Настройку логирования по профилю запуска
+2. Обновление схемы базы данных
+3. Запуск планировщика задач для обновления базы данных
+4. Запуск Telegram бота и сервера метрик
+
+С флагом --fill-db модуль только обновляет схему и каталог задач и
+завершается, не импортируя aiogram и планировщик: тяжёлые зависимости
+импортируются внутри функций, которым они нужны.
 """
 
+import argparse
 import asyncio
 import logging
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from app.database import get_engine
+from app.logging_config import configure_logging
+from app.metrics import FILL_DB_PHASE_SECONDS, serve_metrics
+from app.migrations import upgrade
+from constants import moscow, BOT_WORKERS, METRICS_ENABLED, METRICS_HOST, METRICS_PORT, SNAPSHOT_DIR
 
-from app.fill_db import fill_db_sync
-from bot.bot import start_bot
-from constants import moscow
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
-logging.getLogger('asyncpg').setLevel(logging.DEBUG)
+async def upgrade_schema():
+    """
+    Обновляет схему базы данных до актуальной версии.
+    """
+    async with get_engine().begin() as connection:
+        await connection.run_sync(upgrade)
 
 
 async def fill_db_async_wrapper():
     """
-    Асинхронная обертка для синхронной функции заполнения базы данных.
-    Запускает fill_db_sync в отдельном потоке.
+    Обновление каталога задач по расписанию.
+
+    Загружает список задач условным запросом и, если он изменился, запускает
+    fill_db над сохранённым снимком в цикле событий бота.
     """
-    await asyncio.to_thread(fill_db_sync)
+    from app.fetcher import ProblemsetSnapshot
+    from app.fill_db import fill_db
+    from app.refresh import notify_catalog_refreshed
+
+    snapshot = ProblemsetSnapshot(SNAPSHOT_DIR)
+    with FILL_DB_PHASE_SECONDS.time("fetch"):
+        changed = await snapshot.fetch()
+    if not changed:
+        logging.info("Обновление каталога пропущено: данные не изменились")
+        return
+    if await fill_db(await snapshot.chunks()):
+        await snapshot.mark_ingested()
+        await notify_catalog_refreshed()
 
 
 async def main():
@@ -35,14 +58,45 @@ async def main():
     Основная функция приложения.
     
     Инициализирует и запускает:
-    1. Планировщик задач для ежедневного обновления базы данных в 3:00
-    2. Telegram бота
+    1. Обновление схемы базы данных до актуальной версии
+    2. Загрузку данных, зависящих от каталога задач, в память (в режиме
+       нескольких процессов — в каждом рабочем процессе)
+    3. Планировщик задач для ежедневного обновления базы данных в 3:00
+    4. Сервер метрик на METRICS_PORT
+    5. Telegram бота
     """
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    from app.refresh import notify_catalog_refreshed
+    from bot.bot import start_bot
+
+    await upgrade_schema()
+    if BOT_WORKERS == 1:
+        # Рабочие процессы загружают данные каталога сами при запуске
+        await notify_catalog_refreshed()
+
     scheduler = AsyncIOScheduler(timezone=moscow)
     scheduler.add_job(fill_db_async_wrapper, "cron", hour=3, minute=0)
     scheduler.start()
+    if METRICS_ENABLED:
+        await serve_metrics(METRICS_HOST, METRICS_PORT)
     await start_bot()
 
 
+async def fill_db_once():
+    """
+    Обновляет схему базы данных и каталог задач без запуска бота.
+    """
+    await upgrade_schema()
+    await fill_db_async_wrapper()
+    await get_engine().dispose()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Telegram бот с задачами Codeforces")
+    parser.add_argument("--fill-db", action="store_true", help="только обновить каталог задач и завершиться")
+    args = parser.parse_args()
+
+    # Настройка логирования по профилю запуска
+    configure_logging()
+    asyncio.run(fill_db_once() if args.fill_db else main())
@@ -0,0 +1,70 @@
+import pytest
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, User
+
+from bot.callbacks import MAX_CALLBACK_DATA, STALE_KEYBOARD, CallbackRouter, pack
+from bot.keyboards import KeyboardCache, TOPICS
+
+
+def _callback(data: str) -> CallbackQuery:
+    return CallbackQuery(id="1", from_user=User(id=1, is_bot=False, first_name="Test"), chat_instance="1", data=data)
+
+
+def test_pack_and_limit():
+    assert pack("t", 123, 4) == "t:123:4"
+    assert pack("md") == "md"
+    with pytest.raises(ValueError):
+        pack("x", 10 ** MAX_CALLBACK_DATA)
+
+
+def test_topic_buttons_use_ordinals():
+    cache = KeyboardCache([(topic, None) for topic in TOPICS])
+    page = TOPICS.index("chinese remainder theorem") // 8
+    datas = [button.callback_data for row in cache.topics_keyboard(page).inline_keyboard for button in row]
+    version, ordinal = datas[TOPICS.index("chinese remainder theorem") % 8].split(":")[1:]
+
+    assert all(len(data.encode()) <= 12 for data in datas)
+    assert cache.topic(int(version), int(ordinal)) == "chinese remainder theorem"
+    assert cache.topic(int(version) + 1, int(ordinal)) is None
+    assert cache.topic(int(version), len(TOPICS)) is None
+
+
+@pytest.mark.asyncio
+async def test_router_decodes_typed_values():
+    router = CallbackRouter()
+
+    @router.handler("t", int, int)
+    async def topic(callback, state, version, ordinal):
+        return state, version, ordinal
+
+    @router.handler("md")
+    async def done(callback, state):
+        return "done"
+
+    assert await router.dispatch(_callback("t:7:3"), "state") == ("state", 7, 3)
+    assert await router.dispatch(_callback("md"), "state") == "done"
+
+
+@pytest.mark.asyncio
+async def test_router_rejects_unknown_and_malformed_data():
+    router = CallbackRouter()
+
+    @router.handler("f", int)
+    async def difficulty(callback, state, value):
+        return value
+
+    stale = await router.dispatch(_callback("difficulty:1200"), None)
+    malformed = await router.dispatch(_callback("f:abc"), None)
+    missing = await router.dispatch(_callback("f"), None)
+
+    assert isinstance(stale, AnswerCallbackQuery) and stale.text == STALE_KEYBOARD
+    assert isinstance(malformed, AnswerCallbackQuery) and malformed.show_alert
+    assert isinstance(missing, AnswerCallbackQuery) and missing.show_alert
+
+
+def test_router_rejects_duplicate_opcode():
+    router = CallbackRouter()
+    router.handler("p", int)(lambda *args: None)
+
+    with pytest.raises(ValueError):
+        router.handler("p", int)
@@ -0,0 +1,74 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.ingest import bulk_insert_problems
+from app.models import Base
+from bot.keyboards import TOPICS, TOPICS_PER_PAGE, KeyboardCache
+
+PROBLEMS = [
+    {'contestId': i, 'index': 'A', 'name': f'P{i}', 'rating': 800,
+     'tags': ['dp', 'chinese remainder theorem'] if i % 3 == 0 else ['dp'] if i % 3 == 1 else ['math']}
+    for i in range(1, 31)
+]
+
+
+@asynccontextmanager
+async def seeded_session():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await bulk_insert_problems(connection, PROBLEMS)
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
+
+
+def _texts(keyboard):
+    return [button.text for row in keyboard.inline_keyboard for button in row]
+
+
+def test_keyboards_are_built_once_and_reused():
+    cache = KeyboardCache([(topic, None) for topic in TOPICS])
+
+    assert cache.topics_keyboard(0) is cache.topics_keyboard(0)
+    assert cache.difficulties_keyboard() is cache.difficulties_keyboard()
+    assert cache.difficulties_to_keyboard(1200) is cache.difficulties_to_keyboard(1200)
+    assert _texts(cache.difficulties_to_keyboard(2400)) == ["До 2600"]
+
+
+def test_every_page_is_prebuilt():
+    cache = KeyboardCache([(topic, None) for topic in TOPICS])
+    pages = -(-len(TOPICS) // TOPICS_PER_PAGE)
+
+    shown = [text for page in range(pages) for text in _texts(cache.topics_keyboard(page))]
+    assert [text for text in shown if "➡️" not in text and "⬅️" not in text] == TOPICS
+    assert cache.topics_keyboard(pages).inline_keyboard == []
+
+
+@pytest.mark.asyncio
+async def test_load_uses_tag_table_with_counts():
+    cache = KeyboardCache([(topic, None) for topic in TOPICS])
+    old_page = cache.topics_keyboard(0)
+    async with seeded_session() as session:
+        await cache.load(session)
+
+    assert cache.topics == ["dp", "chinese remainder theorem", "math"]
+    assert cache.counts == {"dp": 20, "chinese remainder theorem": 10, "math": 10}
+    assert _texts(cache.topics_keyboard(0)) == ["dp (20)", "chinese remainder theorem (10)", "math (10)"]
+    assert cache.topics_keyboard(0) is not old_page
+    assert cache.topics_keyboard(1).inline_keyboard == []
+
+
+@pytest.mark.asyncio
+async def test_load_keeps_keyboards_for_empty_tag_table():
+    cache = KeyboardCache([("dp", None)])
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        await cache.load(session)
+    await engine.dispose()
+
+    assert cache.topics == ["dp"]
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.outbound import SchedulerClosed, SendScheduler, TokenBucket
+
+
+class FakeBotApi:
+    """
+    Bot API, записывающий запросы и отвечающий 429 на первые flood запросов.
+    """
+
+    def __init__(self, flood: int = 0, retry_after: int = 1):
+        self.flood = flood
+        self.retry_after = retry_after
+        self.calls = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        form = await request.post()
+        self.calls.append((time.monotonic(), method, dict(form)))
+        if self.flood:
+            self.flood -= 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": self.retry_after}
+            }, status=429)
+        if method == "answerCallbackQuery":
+            return web.json_response({"ok": True, "result": True})
+        chat = {"id": int(form["chat_id"]), "type": "private"}
+        message_id = int(form.get("message_id", len(self.calls)))
+        return web.json_response({
+            "ok": True, "result": {"message_id": message_id, "date": 0, "chat": chat, "text": form.get("text", "")}
+        })
+
+    def texts(self, method: str):
+        return [form["text"] for _, name, form in self.calls if name == method]
+
+
+@asynccontextmanager
+async def fake_api(api: FakeBotApi, scheduler: SendScheduler):
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    bot = Bot(token="42:TEST", session=AiohttpSession(
+        api=TelegramAPIServer.from_base(str(server.make_url("")).rstrip("/"))
+    ))
+    bot.session.middleware(scheduler)
+    try:
+        yield bot
+    finally:
+        await scheduler.close()
+        await bot.session.close()
+        await server.close()
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.delay() == 0 and bucket.delay() == 0
+    assert 0.09 < bucket.delay() <= 0.1
+
+    bucket.pause(5)
+    assert bucket.delay() > 4.9
+
+
+@pytest.mark.asyncio
+async def test_chat_messages_are_spaced_and_ordered():
+    api = FakeBotApi()
+    async with fake_api(api, SendScheduler(chat_rate=20, chat_burst=1)) as bot:
+        messages = await asyncio.gather(*(bot.send_message(1, str(i)) for i in range(5)))
+
+        assert [m.chat.id for m in messages] == [1] * 5
+        assert api.texts("sendMessage") == ["0", "1", "2", "3", "4"]
+        times = [at for at, _, _ in api.calls]
+        assert times[-1] - times[0] >= 4 / 20 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_global_rate_spans_chats():
+    api = FakeBotApi()
+    async with fake_api(api, SendScheduler(rate=20, chat_rate=100, chat_burst=5)) as bot:
+        await asyncio.gather(*(bot.send_message(chat_id, "x") for chat_id in range(1, 31)))
+
+        times = [at for at, _, _ in api.calls]
+        # Ведро бота вмещает 20 запросов, остальные 10 идут со скоростью 20 в секунду
+        assert times[-1] - times[0] >= 9 / 20 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_pending_edits_of_one_message_are_coalesced():
+    api = FakeBotApi()
+    scheduler = SendScheduler(chat_rate=10, chat_burst=1)
+    async with fake_api(api, scheduler) as bot:
+        first = asyncio.create_task(bot.send_message(1, "start"))
+        await asyncio.sleep(0)
+        edits = [bot.edit_message_text(text=f"edit {i}", chat_id=1, message_id=7) for i in range(5)]
+        results = await asyncio.gather(first, *edits)
+
+        assert api.texts("sendMessage") == ["start"]
+        assert api.texts("editMessageText") == ["edit 4"]
+        assert all(result.text == "edit 4" for result in results[1:])
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honored():
+    api = FakeBotApi(flood=1, retry_after=1)
+    async with fake_api(api, SendScheduler()) as bot:
+        message = await bot.send_message(1, "hello")
+
+        assert message.text == "hello"
+        assert len(api.calls) == 2
+        assert api.calls[1][0] - api.calls[0][0] >= 0.95
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gives_up_after_max_retries():
+    api = FakeBotApi(flood=5, retry_after=1)
+    async with fake_api(api, SendScheduler(max_retries=1)) as bot:
+        with pytest.raises(TelegramRetryAfter):
+            await bot.send_message(1, "hello")
+        assert len(api.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_queues_are_bounded():
+    api = FakeBotApi()
+    scheduler = SendScheduler(chat_rate=50, chat_burst=1, chat_queue_size=2)
+    async with fake_api(api, scheduler) as bot:
+        sends = asyncio.gather(*(bot.send_message(1, str(i)) for i in range(10)))
+        peak = 0
+        while not sends.done():
+            peak = max(peak, scheduler.pending)
+            await asyncio.sleep(0.005)
+        await sends
+
+        assert peak <= 2
+        assert sorted(api.texts("sendMessage"), key=int) == [str(i) for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_other_methods_bypass_queue():
+    api = FakeBotApi()
+    scheduler = SendScheduler(chat_rate=0.01, chat_burst=1)
+    async with fake_api(api, scheduler) as bot:
+        await bot.send_message(1, "first")
+
+        started = time.monotonic()
+        assert await bot.answer_callback_query("1") is True
+        assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_close_gives_up_after_timeout():
+    api = FakeBotApi()
+    scheduler = SendScheduler(chat_rate=0.01, chat_burst=1, close_timeout=0.2)
+    async with fake_api(api, scheduler) as bot:
+        sends = [asyncio.create_task(bot.send_message(1, str(i))) for i in range(3)]
+        await sends[0]
+
+        started = time.monotonic()
+        await scheduler.close()
+
+        assert time.monotonic() - started < 1
+        for send in sends[1:]:
+            with pytest.raises(SchedulerClosed):
+                await send
+        with pytest.raises(SchedulerClosed):
+            await bot.send_message(2, "late")
+        assert api.texts("sendMessage") == ["0"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_in_several_chats_pauses_all_chats():
+    api = FakeBotApi(flood=2, retry_after=1)
+    async with fake_api(api, SendScheduler()) as bot:
+        flooded = asyncio.gather(bot.send_message(1, "a"), bot.send_message(2, "b"))
+        await asyncio.sleep(0.2)
+        await bot.send_message(3, "c")
+        await flooded
+
+        started = api.calls[0][0]
+        third = next(at for at, _, form in api.calls if form["chat_id"] == "3")
+        assert third - started >= 0.9
@@ -0,0 +1,103 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import ServedRecord
+from app.served import ServedHistory, bit_positions, decode_bits, encode_bits
+
+
+@asynccontextmanager
+async def database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'served.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(ServedRecord.__table__.create)
+    yield engine
+    await engine.dispose()
+
+
+def test_bits_round_trip():
+    bits = (1 << 3) | (1 << 9) | (1 << 10_000)
+
+    assert decode_bits(encode_bits(bits)) == bits
+    assert decode_bits(encode_bits(0)) == 0
+    assert bit_positions(bits) == [3, 9, 10_000]
+
+
+@pytest.mark.asyncio
+async def test_history_survives_restart(tmp_path):
+    async with database(tmp_path) as engine:
+        history = ServedHistory(engine)
+        await history.add(10, 7, [1, 5])
+        await history.add(10, 7, [9])
+        await history.close()
+
+        restarted = ServedHistory(engine)
+        assert bit_positions(await restarted.get(10, 7)) == [1, 5, 9]
+        assert await restarted.get(11, 7) == 0
+
+
+@pytest.mark.asyncio
+async def test_history_resets_on_generation_change(tmp_path):
+    async with database(tmp_path) as engine:
+        history = ServedHistory(engine)
+        await history.add(10, 7, [1, 5])
+        assert await history.get(10, 8) == 0
+
+        await history.add(10, 8, [2])
+        assert bit_positions(await history.get(10, 8)) == [2]
+        await history.close()
+
+
+@pytest.mark.asyncio
+async def test_eviction_keeps_unflushed_histories(tmp_path):
+    async with database(tmp_path) as engine:
+        history = ServedHistory(engine, flush_interval=60, cache_size=2)
+        for user_id in range(5):
+            await history.add(user_id, 1, [user_id])
+        assert len(history._entries) == 5
+
+        await history.flush()
+        await history.get(0, 1)
+        assert len(history._entries) == 2
+        async with engine.connect() as connection:
+            assert await connection.scalar(select(func.count()).select_from(ServedRecord)) == 5
+        assert bit_positions(await history.get(4, 1)) == [4]
+        await history.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_adds_keep_all_problems(tmp_path):
+    async with database(tmp_path) as engine:
+        history = ServedHistory(engine)
+        await history.add(10, 1, [0])
+        await history.close()
+
+        restarted = ServedHistory(engine)
+        await asyncio.gather(*(restarted.add(10, 1, [problem_id]) for problem_id in range(1, 20)))
+
+        assert bit_positions(await restarted.get(10, 1)) == list(range(20))
+        await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_evicted_histories(tmp_path):
+    async with database(tmp_path) as engine:
+        history = ServedHistory(engine, flush_interval=60, cache_size=1)
+        await history.add(10, 1, [1])
+        async with engine.begin() as connection:
+            await connection.run_sync(ServedRecord.__table__.drop)
+
+        # Пока идёт запись, история вытесняется чтением другой истории
+        flush = asyncio.create_task(history.flush())
+        await asyncio.sleep(0)
+        history._entries.remember(11, (1, encode_bits(0)))
+        await flush
+        async with engine.begin() as connection:
+            await connection.run_sync(ServedRecord.__table__.create)
+        await history.close()
+
+        restarted = ServedHistory(engine)
+        assert bit_positions(await restarted.get(10, 1)) == [1]
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import queue
+from pathlib import Path
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.sharding import ShardSupervisor, ShardWorker, UPDATE, chat_id_of, shard_for
+from tests.env import TEST_ENV
+
+UPDATES = json.loads((Path(__file__).parent.parent / "fixtures" / "updates.json").read_text())
+
+# Ответ Bot API на sendMessage
+SENT_MESSAGE = {"message_id": 1, "date": 0, "chat": {"id": 1001, "type": "private"}}
+
+
+def _message(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def test_chat_id_of_recorded_updates():
+    assert [chat_id_of(update) for update in UPDATES] == [1001, 1001, 1001, 1001]
+
+
+def test_chat_id_of_updates_without_chat():
+    inline = {"update_id": 1, "inline_query": {"id": "1", "from": {"id": 7}, "query": "", "offset": ""}}
+    callback = {"update_id": 2, "callback_query": {"id": "2", "from": {"id": 8}, "chat_instance": "1"}}
+
+    assert chat_id_of(inline) == 7
+    assert chat_id_of(callback) == 8
+    assert chat_id_of({"update_id": 3}) is None
+
+
+def test_shard_for_is_stable_and_in_range():
+    assert shard_for(None, 4) == 0
+    assert shard_for(-100123, 4) in range(4)
+    assert {shard_for(chat_id, 4) for chat_id in range(100)} == {0, 1, 2, 3}
+    assert all(shard_for(chat_id, 4) == shard_for(chat_id, 4) for chat_id in range(100))
+
+
+@pytest.mark.asyncio
+async def test_worker_keeps_per_chat_order_and_runs_chats_concurrently():
+    dispatcher = Dispatcher()
+    handled = []
+    active, peak = 0, 0
+
+    @dispatcher.message()
+    async def handler(message):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        # Первые сообщения чата обрабатываются дольше последующих
+        await asyncio.sleep(0.03 / int(message.text))
+        handled.append((message.chat.id, int(message.text)))
+        active -= 1
+
+    worker = ShardWorker(dispatcher, Bot(token="42:TEST"), max_pending=16)
+    update_id = 0
+    for number in range(1, 4):
+        for chat_id in (1, 2, 3):
+            update_id += 1
+            await worker.submit(_message(update_id, chat_id, str(number)))
+    await worker.drain()
+
+    for chat_id in (1, 2, 3):
+        assert [number for chat, number in handled if chat == chat_id] == [1, 2, 3]
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_worker_bounds_pending_updates():
+    dispatcher = Dispatcher()
+    release = asyncio.Event()
+
+    @dispatcher.message()
+    async def handler(message):
+        await release.wait()
+
+    worker = ShardWorker(dispatcher, Bot(token="42:TEST"), max_pending=2)
+    await worker.submit(_message(1, 1, "1"))
+    await worker.submit(_message(2, 2, "1"))
+    blocked = asyncio.create_task(worker.submit(_message(3, 3, "1")))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    release.set()
+    await blocked
+    await worker.drain()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_routes_chat_to_one_worker(monkeypatch):
+    supervisor = ShardSupervisor(3)
+    supervisor.queues = [queue.Queue() for _ in range(3)]
+    updates = [dict(update, update_id=i) for i, update in enumerate(UPDATES * 3)]
+    for update in updates:
+        await supervisor.route(update)
+
+    sizes = [target.qsize() for target in supervisor.queues]
+    assert sorted(sizes) == [0, 0, len(updates)]
+    target = supervisor.queues[shard_for(1001, 3)]
+    assert [target.get_nowait() for _ in updates] == [(UPDATE, update) for update in updates]
+
+
+@pytest.mark.asyncio
+async def test_workers_answer_recorded_updates(monkeypatch):
+    # Рабочие процессы читают конфигурацию из унаследованного окружения
+    for name, value in TEST_ENV.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("FSM_STORAGE", "memory")
+    monkeypatch.setenv("CATALOG_ENGINE_ENABLED", "false")
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    methods = []
+
+    async def handle(request: web.Request) -> web.Response:
+        methods.append(request.match_info["method"])
+        result = SENT_MESSAGE if request.match_info["method"] == "sendMessage" else True
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    api_server = TestServer(app)
+    await api_server.start_server()
+
+    supervisor = ShardSupervisor(2, api_base=str(api_server.make_url("")).rstrip("/"))
+    supervisor.start()
+    try:
+        for update in UPDATES:
+            await supervisor.route(update)
+        for _ in range(300):
+            if len(methods) == 7:
+                break
+            await asyncio.sleep(0.05)
+
+        assert methods == [
+            "sendMessage",
+            "editMessageReplyMarkup", "answerCallbackQuery",
+            "editMessageText", "answerCallbackQuery",
+            "editMessageText", "answerCallbackQuery",
+        ]
+    finally:
+        await supervisor.stop()
+        await api_server.close()
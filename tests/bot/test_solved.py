@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.ingest import bulk_insert_problems
+from app.models import Base, HandleRecord, Problem
+from app.served import bit_positions
+from app.solved import CodeforcesClient, CodeforcesError, SolvedStore
+
+PROBLEMS = [
+    {'contestId': i, 'index': 'A', 'name': f'P{i}', 'points': 500.0, 'rating': 800, 'tags': ['dp']}
+    for i in range(1, 21)
+]
+
+
+def _submission(submission_id: int, contest_id: int, verdict: str = "OK") -> dict:
+    return {"id": submission_id, "verdict": verdict, "problem": {"contestId": contest_id, "index": "A"}}
+
+
+class StubApi:
+    def __init__(self):
+        self.submissions = {"alice": [_submission(3, 3), _submission(2, 2, "WRONG_ANSWER"), _submission(1, 1)]}
+        self.requests = []
+
+    def submit(self, handle: str, contest_id: int, verdict: str = "OK") -> None:
+        history = self.submissions[handle]
+        history.insert(0, _submission(history[0]["id"] + 1, contest_id, verdict))
+
+    async def user_status(self, request: web.Request) -> web.Response:
+        params = dict(request.query)
+        self.requests.append(params)
+        if params["handle"] not in self.submissions:
+            return web.json_response(
+                {"status": "FAILED", "comment": f"handle: User with handle {params['handle']} not found"}, status=400
+            )
+        start = int(params.get("from", 1)) - 1
+        end = start + int(params["count"]) if "count" in params else None
+        return web.json_response({"status": "OK", "result": self.submissions[params["handle"]][start:end]})
+
+
+@asynccontextmanager
+async def solved_store(tmp_path, **options):
+    api = StubApi()
+    app = web.Application()
+    app.router.add_get("/api/user.status", api.user_status)
+    server = TestServer(app)
+    await server.start_server()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'solved.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await bulk_insert_problems(connection, PROBLEMS)
+    store = SolvedStore(engine, CodeforcesClient(str(server.make_url("/api")), interval=0), **options)
+    try:
+        yield api, store
+    finally:
+        await store.close()
+        await server.close()
+        await engine.dispose()
+
+
+async def _contests(store: SolvedStore, bits: int) -> list:
+    async with store.engine.connect() as connection:
+        rows = await connection.scalars(select(Problem.contest_id).where(Problem.id.in_(bit_positions(bits))))
+        return sorted(rows)
+
+
+@pytest.mark.asyncio
+async def test_link_loads_accepted_problems_and_persists_handle(tmp_path):
+    async with solved_store(tmp_path) as (api, store):
+        assert await store.link(10, "alice", 1) == 2
+        assert await _contests(store, store.solved("alice", 1)) == [1, 3]
+        assert "count" not in api.requests[-1]
+
+        restarted = SolvedStore(store.engine, store.client)
+        assert await restarted.handle(10) == "alice"
+        assert await restarted.handle(11) is None
+
+        await store.unlink(10)
+        async with store.engine.connect() as connection:
+            assert await connection.scalar(select(HandleRecord.handle)) is None
+
+
+@pytest.mark.asyncio
+async def test_unknown_handle_is_not_linked(tmp_path):
+    async with solved_store(tmp_path) as (api, store):
+        with pytest.raises(CodeforcesError, match="not found"):
+            await store.link(10, "nobody", 1)
+
+        assert await store.handle(10) is None
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_fetches_only_new_submissions(tmp_path):
+    async with solved_store(tmp_path, page_size=2) as (api, store):
+        await store.sync("alice", 1)
+        for contest_id in (4, 5, 6):
+            api.submit("alice", contest_id)
+        api.submit("alice", 7, "TIME_LIMIT_EXCEEDED")
+        api.requests.clear()
+
+        bits = await store.sync("alice", 1)
+
+        assert await _contests(store, bits) == [1, 3, 4, 5, 6]
+        # Страницы по 2 посылки, пока не встретится уже учтённая посылка 3
+        assert [(r["from"], r["count"]) for r in api.requests] == [("1", "2"), ("3", "2"), ("5", "2")]
+
+
+@pytest.mark.asyncio
+async def test_unknown_problems_are_resolved_after_catalog_grows(tmp_path):
+    async with solved_store(tmp_path) as (api, store):
+        api.submit("alice", 21)
+        await store.sync("alice", 1)
+        async with store.engine.begin() as connection:
+            await bulk_insert_problems(connection, [dict(PROBLEMS[0], contestId=21)])
+
+        bits = await store.sync("alice", 1)
+
+        assert await _contests(store, bits) == [1, 3, 21]
+
+
+@pytest.mark.asyncio
+async def test_solved_refreshes_in_background(tmp_path):
+    async with solved_store(tmp_path, ttl=0) as (api, store):
+        assert store.solved("alice", 1) == 0
+        assert store.solved("alice", 1) == 0
+        await asyncio.gather(*store._tasks.values())
+        assert len(api.requests) == 1
+
+        api.submit("alice", 4)
+        stale = store.solved("alice", 1)
+        await asyncio.gather(*store._tasks.values())
+
+        assert await _contests(store, stale) == [1, 3]
+        assert await _contests(store, store.solved("alice", 1)) == [1, 3, 4]
+        # Смена эпохи каталога: задачи прошлой эпохи не используются до полной загрузки
+        assert store.solved("alice", 2) == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_api_is_reported_as_codeforces_error():
+    async def stall(request: web.Request) -> web.Response:
+        await asyncio.sleep(5)
+        return web.json_response({"status": "OK", "result": []})
+
+    app = web.Application()
+    app.router.add_get("/api/user.status", stall)
+    server = TestServer(app)
+    await server.start_server()
+    client = CodeforcesClient(str(server.make_url("/api")), interval=0, timeout=0.2)
+    try:
+        with pytest.raises(CodeforcesError, match="нет ответа"):
+            await client.user_status("alice")
+    finally:
+        await client.close()
+        await server.close()
@@ -0,0 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import FsmRecord
+from bot.states import QuizStates
+from bot.storage import DatabaseStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+@asynccontextmanager
+async def database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fsm.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(FsmRecord.__table__.create)
+    yield engine
+    await engine.dispose()
+
+
+async def _rows(engine) -> int:
+    async with engine.connect() as connection:
+        return await connection.scalar(select(func.count()).select_from(FsmRecord))
+
+
+@pytest.mark.asyncio
+async def test_state_survives_restart(tmp_path):
+    async with database(tmp_path) as engine:
+        storage = DatabaseStorage(engine)
+        await storage.set_state(KEY, QuizStates.waiting_for_difficulty_from)
+        await storage.update_data(KEY, {'chosen_topic': 'dp'})
+        await storage.update_data(KEY, {'difficulty_from': 1200})
+        await storage.close()
+
+        restarted = DatabaseStorage(engine)
+        assert await restarted.get_state(KEY) == QuizStates.waiting_for_difficulty_from.state
+        assert await restarted.get_data(KEY) == {'chosen_topic': 'dp', 'difficulty_from': 1200}
+        assert await restarted.get_data(StorageKey(bot_id=1, chat_id=11, user_id=11)) == {}
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched(tmp_path):
+    async with database(tmp_path) as engine:
+        storage = DatabaseStorage(engine, flush_interval=60)
+        for i in range(100):
+            await storage.update_data(StorageKey(bot_id=1, chat_id=i, user_id=i), {'page': i})
+
+        assert await _rows(engine) == 0
+        assert await storage.get_data(StorageKey(bot_id=1, chat_id=5, user_id=5)) == {'page': 5}
+
+        await storage.close()
+        assert await _rows(engine) == 100
+
+
+@pytest.mark.asyncio
+async def test_background_flush(tmp_path):
+    async with database(tmp_path) as engine:
+        storage = DatabaseStorage(engine, flush_interval=0.01)
+        await storage.set_state(KEY, QuizStates.waiting_for_topic)
+        await asyncio.sleep(0.2)
+
+        assert await _rows(engine) == 1
+        await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_later_write_wins_across_processes(tmp_path):
+    async with database(tmp_path) as engine:
+        first = DatabaseStorage(engine, flush_interval=60)
+        second = DatabaseStorage(engine, flush_interval=60)
+
+        await first.set_data(KEY, {'chosen_topic': 'dp'})
+        await asyncio.sleep(0.01)
+        await second.set_data(KEY, {'chosen_topic': 'math'})
+        await second.flush()
+        await first.flush()
+
+        assert await DatabaseStorage(engine).get_data(KEY) == {'chosen_topic': 'math'}
+        await first.close()
+        await second.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_and_expires(tmp_path):
+    async with database(tmp_path) as engine:
+        writer = DatabaseStorage(engine)
+        reader = DatabaseStorage(engine, cache_size=2, cache_ttl=0)
+        await writer.set_data(KEY, {'page': 1})
+        await writer.flush()
+        assert await reader.get_data(KEY) == {'page': 1}
+
+        await writer.set_data(KEY, {'page': 2})
+        await writer.flush()
+        for i in range(5):
+            await reader.get_state(StorageKey(bot_id=1, chat_id=100 + i, user_id=100 + i))
+
+        assert len(reader._entries) == 2
+        assert await reader.get_data(KEY) == {'page': 2}
+        await writer.close()
+        await reader.close()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.bot import get_dispatcher
+from bot.webhook import build_webhook_app
+
+UPDATES = json.loads((Path(__file__).parent.parent / "fixtures" / "updates.json").read_text())
+SECRET = "s3cret"
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+# Ответ Bot API на sendMessage
+SENT_MESSAGE = {"message_id": 1, "date": 0, "chat": {"id": 1001, "type": "private"}}
+
+class StubBotApi:
+    def __init__(self):
+        self.methods = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.methods.append(request.match_info["method"])
+        result = SENT_MESSAGE if request.match_info["method"] == "sendMessage" else True
+        return web.json_response({"ok": True, "result": result})
+
+
+async def _bot_api(api: StubBotApi) -> TestServer:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def _client(dispatcher: Dispatcher, api_server: TestServer, **options) -> TestClient:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(str(api_server.make_url("")).rstrip("/")))
+    bot = Bot(token="42:TEST", session=session)
+    client = TestClient(TestServer(build_webhook_app(dispatcher, bot, "/webhook", secret_token=SECRET, **options)))
+    await client.start_server()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_recorded_updates_answered_in_response(monkeypatch):
+    dp = get_dispatcher()
+    monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+    api = StubBotApi()
+    api_server = await _bot_api(api)
+    client = await _client(dp, api_server, answer_in_response=True)
+    try:
+        methods = []
+        for update in UPDATES:
+            response = await client.post("/webhook", json=update, headers=HEADERS)
+            assert response.status == 200
+            body = await response.text()
+            methods.append(next(m for m in ("sendMessage", "answerCallbackQuery") if m in body))
+
+        assert methods == ["sendMessage", "answerCallbackQuery", "answerCallbackQuery", "answerCallbackQuery"]
+        # Промежуточные вызовы выполняются обычными запросами, ответы — нет
+        assert api.methods == ["editMessageReplyMarkup", "editMessageText", "editMessageText"]
+    finally:
+        await client.close()
+        await api_server.close()
+
+
+@pytest.mark.asyncio
+async def test_background_mode_calls_bot_api(monkeypatch):
+    dp = get_dispatcher()
+    monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+    api = StubBotApi()
+    api_server = await _bot_api(api)
+    client = await _client(dp, api_server, answer_in_response=False)
+    try:
+        response = await client.post("/webhook", json=UPDATES[0], headers=HEADERS)
+        assert await response.json() == {}
+        for _ in range(100):
+            if api.methods:
+                break
+            await asyncio.sleep(0.01)
+
+        assert api.methods == ["sendMessage"]
+    finally:
+        await client.close()
+        await api_server.close()
+
+
+@pytest.mark.asyncio
+async def test_rejects_wrong_secret():
+    api_server = await _bot_api(StubBotApi())
+    client = await _client(Dispatcher(), api_server)
+    try:
+        response = await client.post("/webhook", json=UPDATES[0], headers={"X-Telegram-Bot-Api-Secret-Token": "x"})
+        assert response.status == 401
+    finally:
+        await client.close()
+        await api_server.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    dispatcher = Dispatcher()
+    active, peak = 0, 0
+
+    @dispatcher.message()
+    async def slow_handler(message):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+
+    api_server = await _bot_api(StubBotApi())
+    client = await _client(dispatcher, api_server, max_concurrency=2)
+    try:
+        updates = [dict(UPDATES[0], update_id=i) for i in range(6)]
+        responses = await asyncio.gather(*(client.post("/webhook", json=u, headers=HEADERS) for u in updates))
+
+        assert all(response.status == 200 for response in responses)
+        assert peak == 2
+    finally:
+        await client.close()
+        await api_server.close()
@@ -0,0 +1,74 @@
+import pytest
+
+from app.catalog import CatalogEngine
+from app.models import Problem
+
+
+@pytest.fixture
+def engine():
+    problems = [
+        Problem(id=i, contest_id=i, index='A', name=f'P{i}', rating=100 * i, points=250.0 * i if i % 4 else None)
+        for i in range(1, 21)
+    ]
+    problems.append(Problem(id=21, contest_id=21, index='A', name='Unrated', rating=None, points=500.0))
+    tags = {i: ['dp'] if i % 2 else ['dp', 'math'] for i in range(1, 22)}
+    engine = CatalogEngine()
+    engine.build(problems, tags)
+    return engine
+
+
+def test_not_ready_until_built():
+    assert not CatalogEngine().ready
+    assert not CatalogEngine(enabled=False).ready
+
+
+def test_pick_respects_tag_and_range(engine):
+    problems = engine.pick('math', 500, 1500, limit=10)
+
+    assert sorted(p.id for p in problems) == [6, 8, 10, 12, 14]
+
+
+def test_pick_limits_and_randomizes(engine):
+    problems = engine.pick('dp', 100, None, limit=5)
+
+    assert len(problems) == 5
+    assert len({p.id for p in problems}) == 5
+    assert all(p.rating is not None for p in problems)
+
+
+def test_pick_unknown_tag_or_empty_range(engine):
+    assert engine.pick('graphs', 0, None) == []
+    assert engine.pick('dp', 5000, 6000) == []
+
+
+def test_pick_prefers_problems_not_excluded(engine):
+    served = sum(1 << i for i in (6, 8, 10))
+
+    problems = engine.pick('math', 500, 1500, limit=2, exclude=served)
+
+    assert {p.id for p in problems} <= {12, 14}
+    assert len(problems) == 2
+
+
+def test_pick_tops_up_from_excluded_when_exhausted(engine):
+    served = sum(1 << i for i in (6, 8, 10, 12))
+
+    problems = engine.pick('math', 500, 1500, limit=3, exclude=served)
+
+    assert len(problems) == 3
+    assert 14 in {p.id for p in problems}
+
+
+
+def test_pick_points_respects_tag_and_range(engine):
+    problems = engine.pick_points('math', 1000, 3000, limit=10)
+
+    assert sorted(p.id for p in problems) == [6, 10]
+
+
+def test_pick_points_includes_unrated_and_skips_unscored(engine):
+    problems = engine.pick_points('dp', 0, None, limit=50)
+
+    assert sorted(p.id for p in problems) == [i for i in range(1, 22) if i % 4]
+    assert engine.pick_points('graphs', 0, None) == []
+    assert engine.pick_points('dp', 6000, 7000) == []
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.generation import CatalogGeneration, bump_generation, read_generation
+from app.models import GenerationRecord
+
+
+def test_generation_starts_at_zero_and_grows():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        GenerationRecord.__table__.create(connection)
+
+        assert read_generation(connection) == 0
+        assert bump_generation(connection) == 1
+        assert bump_generation(connection) == 2
+        assert read_generation(connection) == 2
+
+
+@pytest.mark.asyncio
+async def test_load_reads_generation_from_database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'generation.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(GenerationRecord.__table__.create)
+        await connection.run_sync(bump_generation)
+
+    generation = CatalogGeneration()
+    async with engine.connect() as connection:
+        await generation.load(connection)
+    await engine.dispose()
+
+    assert generation.value == 1
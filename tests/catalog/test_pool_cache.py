@@ -0,0 +1,62 @@
+import pytest
+
+from app import pool_cache as pool_cache_module
+from app.pool_cache import PoolCache, expression_key, rating_key
+from app.refresh import notify_catalog_refreshed
+from app.tag_query import parse_tag_expression
+
+
+def test_keys_normalize_bounds():
+    assert rating_key('dp', 800, 1000) == rating_key('dp', 800.0, 1000.0)
+    assert rating_key('dp', 800, None) != rating_key('dp', 800, 1000)
+    assert expression_key(parse_tag_expression('dp AND math'), 800, 1000) == \
+        expression_key(parse_tag_expression('dp & math'), 800.0, 1000)
+    assert expression_key(('tag', 'dp'), 800, 1000) != rating_key('dp', 800, 1000)
+
+
+def test_hit_miss_and_memory():
+    cache = PoolCache(max_entries=4, ttl=60)
+
+    assert cache.get('a') is None
+    pool = cache.put('a', range(1000))
+    assert cache.get('a') is pool
+    assert pool.itemsize == 4
+
+    assert cache.stats()['entries'] == 1
+    assert 4000 <= cache.stats()['bytes'] < 4200
+    assert cache.hit_rate == 0.5
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PoolCache(max_entries=2, ttl=60)
+    cache.put('a', [1])
+    cache.put('b', [2])
+    cache.get('a')
+
+    cache.put('c', [3])
+
+    assert cache.get('b') is None
+    assert list(cache.get('a')) == [1] and list(cache.get('c')) == [3]
+
+
+def test_expired_entry_is_dropped(monkeypatch):
+    cache = PoolCache(max_entries=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr(pool_cache_module.time, 'monotonic', lambda: now[0])
+    cache.put('a', [1])
+
+    now[0] += 11
+
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+@pytest.mark.asyncio
+async def test_cleared_on_catalog_refresh(monkeypatch):
+    cache = PoolCache()
+    monkeypatch.setattr(pool_cache_module, 'pool_cache', cache)
+    cache.put('a', [1])
+
+    await notify_catalog_refreshed()
+
+    assert cache.get('a') is None
@@ -0,0 +1,56 @@
+import pytest
+
+from app.models import Problem
+from app.search import NameIndex, trigrams
+
+NAMES = [
+    "Shortest Path Queries",
+    "Shortest Paths",
+    "Longest Increasing Subsequence",
+    "Path Queries on a Tree",
+    "Beautiful Array",
+    "Array Shrinking",
+]
+
+
+@pytest.fixture
+def index():
+    index = NameIndex()
+    index.build(Problem(id=i, contest_id=i, index='A', name=name) for i, name in enumerate(NAMES, 1))
+    return index
+
+
+def test_trigrams_match_pg_trgm():
+    assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+    assert trigrams("a-b") == {"  a", " a ", "  b", " b "}
+    assert trigrams("!!!") == set()
+
+
+def test_not_ready_until_built():
+    assert not NameIndex().ready
+    assert not NameIndex(enabled=False).ready
+
+
+def test_search_ranks_closest_names_first(index):
+    names = [p.name for p in index.search("shortest path", limit=3)]
+
+    assert names == ["Shortest Path Queries", "Shortest Paths", "Path Queries on a Tree"]
+
+
+def test_search_tolerates_typos_and_case(index):
+    assert index.search("logest increasng subsequnce", limit=1)[0].name == "Longest Increasing Subsequence"
+    assert index.search("ARRAY", limit=5)[0].name in {"Beautiful Array", "Array Shrinking"}
+
+
+def test_search_drops_dissimilar_names(index):
+    assert index.search("segment tree beats") == []
+    assert [p.name for p in index.search("tree")] == ["Path Queries on a Tree"]
+    assert index.search("") == []
+    assert len(index.search("a", limit=2)) <= 2
+
+
+def test_rebuild_replaces_index(index):
+    index.build([Problem(id=1, contest_id=1, index='A', name="Graph Coloring")])
+
+    assert index.search("shortest path") == []
+    assert index.search("graph")[0].name == "Graph Coloring"
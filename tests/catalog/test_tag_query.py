@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+
+from app.catalog import CatalogEngine
+from app.ingest import bulk_insert_problems
+from app.models import Base, Problem
+from app.tag_query import TagExpressionError, parse_tag_expression, quote_tag, to_sql_condition
+from benchmarks.synthetic import generate_problems
+
+EXPRESSIONS = [
+    "dp",
+    "dp AND graphs",
+    "dp AND graphs AND NOT math",
+    "(greedy | sortings) & !implementation",
+    '"dfs and similar" OR data structures',
+    "NOT dp",
+]
+
+
+def test_parse_precedence():
+    assert parse_tag_expression("a OR b AND NOT c") == (
+        'or', ('tag', 'a'), ('and', ('tag', 'b'), ('not', ('tag', 'c')))
+    )
+
+
+def test_parse_multi_word_and_quoted_tags():
+    assert parse_tag_expression('data structures & "dfs and similar"') == (
+        'and', ('tag', 'data structures'), ('tag', 'dfs and similar')
+    )
+
+
+@pytest.mark.parametrize("expression", ["", "dp AND", "(dp", "dp)", 'dp "x', "AND dp"])
+def test_parse_errors(expression):
+    with pytest.raises(TagExpressionError):
+        parse_tag_expression(expression)
+
+
+def test_quote_tag_round_trip():
+    for name in ["dp", "data structures", "dfs and similar", "2-sat"]:
+        assert parse_tag_expression(quote_tag(name)) == ('tag', name)
+
+
+async def _seed(url: str) -> None:
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await bulk_insert_problems(connection, generate_problems(2000))
+    await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def catalog_and_session(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tag_query") / "catalog.db"
+    asyncio.run(_seed(f"sqlite+aiosqlite:///{path}"))
+    session = Session(create_engine(f"sqlite:///{path}"), expire_on_commit=False)
+
+    problems = session.scalars(select(Problem)).all()
+    catalog = CatalogEngine()
+    catalog.build(problems, {problem.id: [tag.name for tag in problem.tags] for problem in problems})
+    yield catalog, session
+    session.close()
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_bitsets_match_sql(catalog_and_session, expression):
+    catalog, session = catalog_and_session
+    node = parse_tag_expression(expression)
+    condition = to_sql_condition(node)
+
+    expected = set(session.scalars(
+        select(Problem.id).where(condition, Problem.rating >= 1000, Problem.rating <= 2000)
+    ))
+    picked = catalog.pick_expression(node, 1000, 2000, limit=len(expected) + 1)
+
+    assert {problem.id for problem in picked} == expected
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_pick_expression_limit(catalog_and_session, expression):
+    catalog, session = catalog_and_session
+    node = parse_tag_expression(expression)
+    matching = len(session.scalars(select(Problem.id).where(to_sql_condition(node))).all())
+
+    picked = catalog.pick_expression(node, 500, None, limit=10)
+
+    assert len(picked) == min(10, matching)
+    assert len({problem.id for problem in picked}) == len(picked)
@@ -2,3 +2,10 @@ import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tests.env import TEST_ENV  # noqa: E402
+
+# Конфигурация читается при импорте constants, поэтому значения по умолчанию
+# задаются до импорта модулей приложения и не зависят от .env разработчика
+for _name, _value in TEST_ENV.items():
+    os.environ.setdefault(_name, _value)
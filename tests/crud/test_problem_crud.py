@@ -1,7 +1,8 @@
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+from app.crud import problem_crud
 from app.crud.problem_crud import ProblemCRUD
 from app.models import Problem
 
@@ -29,7 +30,8 @@ async def test_create(crud):
         category="Algorithms",
         points=100,
         solved_count=0,
-        tags=["dp"]
+        tags=["dp"],
+        rating=800
     )
     crud.session.create.assert_called_once_with(
         contest_id=1,
@@ -38,7 +40,8 @@ async def test_create(crud):
         category="Algorithms",
         points=100,
         solved_count=0,
-        tags=["dp"]
+        tags=["dp"],
+        rating=800
     )
     assert isinstance(result, Problem)
     assert result.name == "Test Problem"
@@ -75,10 +78,71 @@ async def test_get_by_tag(crud):
 
 
 @pytest.mark.asyncio
-async def test_get_random_by_tag_and_points_range(crud):
+async def test_get_random_by_tag_and_points_range(crud, monkeypatch):
+    monkeypatch.setattr(problem_crud, "catalog", MagicMock(ready=False))
     crud.session.get_random_by_tag_and_points_range = AsyncMock(return_value=[Problem(id=1)])
 
     result = await crud.get_random_by_tag_and_points_range("dp", 50, 100, 5)
     crud.session.get_random_by_tag_and_points_range.assert_called_once_with("dp", 50, 100, 5)
     assert isinstance(result, list)
     assert all(isinstance(p, Problem) for p in result)
+
+
+@pytest.mark.asyncio
+async def test_get_random_by_tag_and_points_range_from_catalog(crud, monkeypatch):
+    catalog = MagicMock(ready=True)
+    catalog.pick_points.return_value = [Problem(id=1)]
+    monkeypatch.setattr(problem_crud, "catalog", catalog)
+    crud.session.get_random_by_tag_and_points_range = AsyncMock()
+
+    result = await crud.get_random_by_tag_and_points_range("dp", 50, 100, 5)
+    catalog.pick_points.assert_called_once_with("dp", 50, 100, 5)
+    crud.session.get_random_by_tag_and_points_range.assert_not_called()
+    assert result == catalog.pick_points.return_value
+
+
+@pytest.mark.asyncio
+async def test_get_random_by_tag_and_rating_range(crud, monkeypatch):
+    monkeypatch.setattr(problem_crud, "catalog", MagicMock(ready=False))
+    crud.session.get_random_by_tag_and_rating_range = AsyncMock(return_value=[Problem(id=1)])
+
+    result = await crud.get_random_by_tag_and_rating_range("dp", 800, 1200, 5)
+    crud.session.get_random_by_tag_and_rating_range.assert_called_once_with("dp", 800, 1200, 5, 0)
+    assert isinstance(result, list)
+    assert all(isinstance(p, Problem) for p in result)
+
+
+@pytest.mark.asyncio
+async def test_get_random_by_tag_and_rating_range_from_catalog(crud, monkeypatch):
+    catalog = MagicMock(ready=True)
+    catalog.pick.return_value = [Problem(id=1)]
+    monkeypatch.setattr(problem_crud, "catalog", catalog)
+    crud.session.get_random_by_tag_and_rating_range = AsyncMock()
+
+    result = await crud.get_random_by_tag_and_rating_range("dp", 800, 1200, 5)
+    catalog.pick.assert_called_once_with("dp", 800, 1200, 5, 0)
+    crud.session.get_random_by_tag_and_rating_range.assert_not_called()
+    assert result == catalog.pick.return_value
+
+
+@pytest.mark.asyncio
+async def test_search_by_name_uses_index(crud, monkeypatch):
+    index = MagicMock(ready=True)
+    index.search.return_value = [Problem(id=1)]
+    monkeypatch.setattr(problem_crud, "name_index", index)
+    crud.session.search_by_name = AsyncMock()
+
+    result = await crud.search_by_name("path", 5)
+    index.search.assert_called_once_with("path", 5)
+    crud.session.search_by_name.assert_not_called()
+    assert result == index.search.return_value
+
+
+@pytest.mark.asyncio
+async def test_search_by_name_without_index(crud, monkeypatch):
+    monkeypatch.setattr(problem_crud, "name_index", MagicMock(ready=False))
+    crud.session.search_by_name = AsyncMock(return_value=[Problem(id=1)])
+
+    result = await crud.search_by_name("path", 5)
+    crud.session.search_by_name.assert_called_once_with("path", 5)
+    assert result == crud.session.search_by_name.return_value
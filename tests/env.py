@@ -0,0 +1,16 @@
+"""
+Переменные окружения, с которыми тесты запускают приложение.
+
+Значения нужны только для того, чтобы конфигурация разбиралась (URL базы
+данных, токен бота): тесты не подключаются к PostgreSQL и Telegram, а
+подменяют движок и Bot API.
+"""
+
+TEST_ENV = {
+    "DB_USER": "postgres",
+    "PASSWORD": "postgres",
+    "HOST": "localhost",
+    "PORT": "5432",
+    "DATABASE": "test",
+    "TOKEN": "42:TEST",
+}
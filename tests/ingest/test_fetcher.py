@@ -0,0 +1,101 @@
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.fetcher import CHUNK_SIZE, ProblemsetSnapshot
+
+PAYLOAD = json.dumps({"status": "OK", "result": {"problems": [], "problemStatistics": []}}).encode()
+
+
+class StubApi:
+    def __init__(self, body: bytes = PAYLOAD, etag: str = None):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.headers))
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304)
+        headers = {"ETag": self.etag} if self.etag else {}
+        return web.Response(body=self.body, headers=headers, content_type="application/json")
+
+
+async def _serve(api: StubApi) -> TestServer:
+    app = web.Application()
+    app.router.add_get("/api/problemset.problems", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_conditional_request_skips_unchanged(tmp_path):
+    api = StubApi(etag='"v1"')
+    server = await _serve(api)
+    try:
+        snapshot = ProblemsetSnapshot(str(tmp_path), str(server.make_url("/api/problemset.problems")))
+
+        assert await snapshot.fetch()
+        assert b"".join(await snapshot.chunks()) == PAYLOAD
+        assert gzip.decompress(snapshot.path.read_bytes()) == PAYLOAD
+        await snapshot.mark_ingested()
+
+        reloaded = ProblemsetSnapshot(str(tmp_path), snapshot.url)
+        assert not await reloaded.fetch()
+        assert api.requests[-1]["If-None-Match"] == '"v1"'
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_not_ingested_snapshot_is_retried_on_304(tmp_path):
+    api = StubApi(etag='"v1"')
+    server = await _serve(api)
+    try:
+        snapshot = ProblemsetSnapshot(str(tmp_path), str(server.make_url("/api/problemset.problems")))
+
+        assert await snapshot.fetch()
+        assert await snapshot.fetch()
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_content_hash_without_etag(tmp_path):
+    api = StubApi()
+    server = await _serve(api)
+    try:
+        snapshot = ProblemsetSnapshot(str(tmp_path), str(server.make_url("/api/problemset.problems")))
+
+        assert await snapshot.fetch()
+        await snapshot.mark_ingested()
+        assert not await snapshot.fetch()
+
+        api.body = PAYLOAD.replace(b"[]", b"[ ]", 1)
+        assert await snapshot.fetch()
+    finally:
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_read_in_bounded_chunks(tmp_path):
+    body = json.dumps({"status": "OK", "result": {"problems": [{"name": str(i)} for i in range(50_000)]}}).encode()
+    server = await _serve(StubApi(body))
+    try:
+        snapshot = ProblemsetSnapshot(str(tmp_path), str(server.make_url("/api/problemset.problems")))
+        assert await snapshot.fetch()
+
+        chunks = list(await snapshot.chunks())
+
+        assert b"".join(chunks) == body
+        assert len(chunks) > 1 and max(map(len, chunks)) <= CHUNK_SIZE
+
+        snapshot.path.write_bytes(snapshot.path.read_bytes()[:-100])
+        with pytest.raises(EOFError):
+            list(await snapshot.chunks())
+    finally:
+        await server.close()
@@ -0,0 +1,128 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from app.ingest import YIELD_EVERY, SyncReport, _batches, apply_statistics, bulk_insert_problems, delta_sync_problems
+from app.models import Base, Problem, Tag, problem_tags
+
+
+@asynccontextmanager
+async def connected():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.connect() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        yield connection
+    await engine.dispose()
+
+
+async def _problem(connection, contest_id, index):
+    async with AsyncSession(connection) as session:
+        return (await session.scalars(
+            select(Problem).filter_by(contest_id=contest_id, index=index).options(selectinload(Problem.tags))
+        )).one()
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_problems():
+    problems = [
+        {'contestId': 1, 'index': 'A', 'name': 'First', 'type': 'PROGRAMMING', 'tags': ['dp', 'math', 'dp']},
+        {'contestId': 1, 'index': 'B', 'name': 'Second', 'points': 1000.0, 'rating': 1200, 'tags': ['math']},
+        {'contestId': 2, 'index': 'A', 'name': 'Third', 'tags': []},
+    ]
+    statistics = [{'contestId': 1, 'index': 'A', 'solvedCount': 10}, {'contestId': 2, 'index': 'A', 'solvedCount': 5}]
+
+    async with connected() as connection:
+        count = await bulk_insert_problems(connection, problems, batch_size=2)
+        await apply_statistics(connection, statistics, batch_size=1)
+
+        assert count == 3
+        assert await connection.scalar(select(func.count()).select_from(Tag)) == 2
+        assert await connection.scalar(select(func.count()).select_from(problem_tags)) == 3
+
+        first = await _problem(connection, 1, 'A')
+        assert first.solved_count == 10
+        assert sorted(tag.name for tag in first.tags) == ['dp', 'math']
+
+        second = await _problem(connection, 1, 'B')
+        assert second.solved_count == 0
+        assert second.points == 1000.0
+        assert second.rating == 1200
+        assert first.rating is None
+        assert second.category == 'unknown'
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_reuses_existing_tags():
+    async with connected() as connection:
+        await connection.execute(Tag.__table__.insert(), {'name': 'dp'})
+
+        await bulk_insert_problems(connection, [{'contestId': 1, 'index': 'A', 'name': 'P', 'tags': ['dp']}])
+
+        assert await connection.scalar(select(func.count()).select_from(Tag)) == 1
+
+
+@pytest.mark.asyncio
+async def test_delta_sync_problems():
+    problems = [
+        {'contestId': 1, 'index': 'A', 'name': 'First', 'tags': ['dp', 'math']},
+        {'contestId': 1, 'index': 'B', 'name': 'Second', 'tags': ['math']},
+    ]
+    async with connected() as connection:
+        await bulk_insert_problems(connection, problems)
+        await apply_statistics(connection, [{'contestId': 1, 'index': 'A', 'solvedCount': 10}])
+
+        fetched = [
+            {'contestId': 1, 'index': 'A', 'name': 'First', 'tags': ['dp', 'graphs']},
+            {'contestId': 1, 'index': 'B', 'name': 'Second', 'tags': ['math']},
+            {'contestId': 2, 'index': 'A', 'name': 'Third', 'tags': ['math']},
+        ]
+        statistics = [
+            {'contestId': 1, 'index': 'A', 'solvedCount': 10}, {'contestId': 2, 'index': 'A', 'solvedCount': 3}
+        ]
+        report = await delta_sync_problems(connection, fetched, statistics, batch_size=2)
+
+        assert report == SyncReport(inserted=1, updated=1, unchanged=1)
+        assert await connection.scalar(select(func.count()).select_from(Problem)) == 3
+
+        first = await _problem(connection, 1, 'A')
+        assert sorted(tag.name for tag in first.tags) == ['dp', 'graphs']
+        third = await _problem(connection, 2, 'A')
+        assert third.solved_count == 3
+        assert [tag.name for tag in third.tags] == ['math']
+
+
+@pytest.mark.asyncio
+async def test_delta_sync_updates_solved_count():
+    problems = [{'contestId': 1, 'index': 'A', 'name': 'First', 'tags': []}]
+    async with connected() as connection:
+        await bulk_insert_problems(connection, problems)
+        await apply_statistics(connection, [{'contestId': 1, 'index': 'A', 'solvedCount': 10}])
+
+        report = await delta_sync_problems(connection, problems, [{'contestId': 1, 'index': 'A', 'solvedCount': 11}])
+
+        assert report == SyncReport(inserted=0, updated=1, unchanged=0)
+        assert await connection.scalar(select(Problem.solved_count)) == 11
+
+
+@pytest.mark.asyncio
+async def test_batches_yield_to_event_loop():
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = ticks
+    batches = [batch async for batch in _batches(range(2000), 1000)]
+    task.cancel()
+
+    assert [len(batch) for batch in batches] == [1000, 1000]
+    assert ticks - started >= 2000 // YIELD_EVERY
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.problemset_stream import ProblemsetStream
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "problemset.json"
+
+
+def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 1 << 20])
+def test_stream_matches_json_load(chunk_size):
+    raw = FIXTURE.read_bytes()
+    expected = json.loads(raw)
+
+    stream = ProblemsetStream(_chunks(raw, chunk_size))
+
+    assert stream.status == "OK"
+    assert list(stream.problems()) == expected["result"]["problems"]
+    assert list(stream.statistics()) == expected["result"]["problemStatistics"]
+
+
+def test_failed_status():
+    stream = ProblemsetStream([b'{"status": "FAILED", "comment": "Call limit exceeded"}'])
+
+    assert stream.status == "FAILED"
+    assert stream.comment == "Call limit exceeded"
+    assert list(stream.problems()) == []
+
+
+def test_truncated_payload():
+    raw = FIXTURE.read_bytes()[:200]
+
+    with pytest.raises(ValueError):
+        list(ProblemsetStream(_chunks(raw, 16)).problems())
+
+
+def test_stream_reads_synthetic_catalog():
+    from benchmarks.synthetic import TAG_FREQUENCIES, generate_catalog, problemset_bytes
+
+    catalog = generate_catalog(2000, seed=1)
+    stream = ProblemsetStream(_chunks(problemset_bytes(catalog), 4096))
+    problems = list(stream.problems())
+
+    assert problems == catalog["result"]["problems"]
+    assert len(list(stream.statistics())) == 2000
+    assert all(set(p["tags"]) <= set(TAG_FREQUENCIES) and len(set(p["tags"])) == len(p["tags"]) for p in problems)
+    assert 0 < sum("rating" not in p for p in problems) < 400
+    assert generate_catalog(2000, seed=1) == catalog
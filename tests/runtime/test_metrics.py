@@ -0,0 +1,179 @@
+import socket
+
+import aiohttp
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.filters.command import Command
+from aiogram.methods import SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy import create_engine, text
+
+from app.database import build_engine
+from app.metrics import (
+    BOT_API_SECONDS,
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_QUERY_SECONDS,
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    Counter,
+    Histogram,
+    TimedQueuePool,
+    instrument_engine,
+    serve_metrics,
+)
+from bot.callbacks import CallbackRouter
+from bot import bot as bot_module
+from bot.middlewares import BotApiTimingMiddleware, HandlerTimingMiddleware, setup_handler_metrics
+from bot.outbound import SendScheduler
+
+USER = User(id=1, is_bot=False, first_name="Test")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Тестовая гистограмма", ("handler",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "start")
+
+    lines = histogram.render()
+
+    assert lines[:2] == ["# HELP test_latency_seconds Тестовая гистограмма", "# TYPE test_latency_seconds histogram"]
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{handler="start",le="0.1"} 2',
+        'test_latency_seconds_bucket{handler="start",le="1"} 3',
+        'test_latency_seconds_bucket{handler="start",le="+Inf"} 4',
+        'test_latency_seconds_sum{handler="start"} 3.65',
+        'test_latency_seconds_count{handler="start"} 4',
+    ]
+    assert histogram.count("start") == 4 and histogram.count("other") == 0
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_events_total", "Тестовый счётчик", ("name",))
+    counter.inc(2, 'say "hi"')
+    counter.inc(1, 'say "hi"')
+
+    assert counter.value('say "hi"') == 3
+    assert counter.render()[2] == 'test_events_total{name="say \\"hi\\""} 3'
+
+
+def test_engine_events_time_queries_by_statement():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    selects, others = DB_QUERY_SECONDS.count("SELECT"), DB_QUERY_SECONDS.count("OTHER")
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT missing FROM t"))
+        connection.execute(text("select 2"))
+
+    assert DB_QUERY_SECONDS.count("SELECT") == selects + 2
+    assert DB_QUERY_SECONDS.count("OTHER") == others + 1
+
+
+@pytest.mark.asyncio
+async def test_async_engine_times_pool_checkout(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}", metrics=True)
+    checkouts = DB_POOL_CHECKOUT_SECONDS.count()
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    await engine.dispose()
+
+    assert isinstance(engine.pool, TimedQueuePool)
+    assert DB_POOL_CHECKOUT_SECONDS.count() == checkouts + 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_times_handlers_and_callback_codes():
+    dispatcher = Dispatcher()
+    bot = Bot(token="42:TEST")
+    router = CallbackRouter()
+
+    @dispatcher.message(Command("start"))
+    async def cmd_start(message: Message):
+        return None
+
+    @dispatcher.message()
+    async def cmd_fail(message: Message):
+        raise RuntimeError("сбой")
+
+    @router.handler("p", int)
+    async def paginate(callback, page):
+        return None
+
+    @dispatcher.callback_query()
+    async def route(callback: CallbackQuery):
+        return await router.dispatch(callback)
+
+    setup_handler_metrics(dispatcher, router)
+    chat = Chat(id=1, type="private")
+    start = Message(message_id=1, date=0, chat=chat, from_user=USER, text="/start")
+    fail = Message(message_id=2, date=0, chat=chat, from_user=USER, text="привет")
+    callback = CallbackQuery(id="1", from_user=USER, chat_instance="1", data="p:2")
+    counts = HANDLER_SECONDS.count("cmd_start"), HANDLER_SECONDS.count("paginate"), HANDLER_ERRORS.value("cmd_fail")
+
+    await dispatcher.feed_update(bot, Update(update_id=1, message=start))
+    await dispatcher.feed_update(bot, Update(update_id=2, callback_query=callback))
+    with pytest.raises(RuntimeError):
+        await dispatcher.feed_update(bot, Update(update_id=3, message=fail))
+    await bot.session.close()
+
+    assert HANDLER_SECONDS.count("cmd_start") == counts[0] + 1
+    assert HANDLER_SECONDS.count("paginate") == counts[1] + 1
+    assert HANDLER_ERRORS.value("cmd_fail") == counts[2] + 1
+
+
+@pytest.mark.asyncio
+async def test_bot_api_middleware_times_requests_by_method():
+    async def make_request(bot, method):
+        return "ok"
+
+    count = BOT_API_SECONDS.count("sendMessage")
+
+    assert await BotApiTimingMiddleware()(make_request, None, SendMessage(chat_id=1, text="x")) == "ok"
+    assert BOT_API_SECONDS.count("sendMessage") == count + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_registry():
+    port = _free_port()
+    runner = await serve_metrics("127.0.0.1", port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                body = await response.text()
+    finally:
+        await runner.cleanup()
+
+    assert response.status == 200 and response.content_type == "text/plain"
+    assert "# TYPE bot_handler_seconds histogram" in body
+    assert "# TYPE fill_db_rows_total counter" in body
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("enabled", [True, False])
+async def test_factories_wire_metrics(enabled, monkeypatch):
+    from bot.handlers import router
+
+    monkeypatch.setattr(bot_module, "METRICS_ENABLED", enabled)
+    monkeypatch.setattr(bot_module, "SEND_SCHEDULER_ENABLED", True)
+    # Роутер обработчиков подключается к одному диспетчеру, а диспетчер приложения мог быть уже создан
+    monkeypatch.setattr(router, "_parent_router", None)
+
+    bot = bot_module.create_bot(token="42:TEST")
+    dispatcher = bot_module.create_dispatcher(storage=MemoryStorage())
+    await bot.session.close()
+
+    timing = [HandlerTimingMiddleware] if enabled else []
+    assert [type(m) for m in bot.session.middleware] == [SendScheduler] + ([BotApiTimingMiddleware] if enabled else [])
+    assert [type(m) for m in dispatcher.message.middleware] == timing
+    assert [type(m) for m in dispatcher.callback_query.middleware] == timing
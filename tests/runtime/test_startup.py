@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from tests.env import TEST_ENV
+
+ROOT = Path(__file__).parent.parent.parent
+# Настройки задаются явно, чтобы проверка ленивого запуска не зависела от .env разработчика
+ENV = {**os.environ, **TEST_ENV}
+
+
+def _run(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=ENV, capture_output=True, text=True, timeout=120, check=True
+    )
+    return result.stdout.strip()
+
+
+def test_main_import_skips_bot_and_database_driver():
+    loaded = _run(
+        "import sys, main, app.database as db\n"
+        "print(db.AsyncSessionLocal.kw.get('bind') is None,"
+        " [m for m in ('aiogram', 'apscheduler', 'asyncpg', 'psycopg2') if m in sys.modules])"
+    )
+
+    assert loaded == "True []"
+
+
+def test_handlers_import_standalone():
+    assert _run("import bot.handlers, bot.bot; print(bot.bot.get_dispatcher().sub_routers == [bot.handlers.router])") == "True"
+
+
+def test_engine_created_on_first_session():
+    created = _run(
+        "from app.database import AsyncSessionLocal, get_engine\n"
+        "session = AsyncSessionLocal()\n"
+        "print(session.bind is get_engine() is AsyncSessionLocal.kw['bind'])"
+    )
+
+    assert created == "True"
@@ -0,0 +1,156 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.ingest import bulk_insert_problems
+from app.models import Base
+from app.pool_cache import pool_cache
+from app.service.problem_service import ProblemService
+
+PROBLEMS = [
+    {'contestId': i, 'index': 'A', 'name': f'P{i}', 'points': float(500 + 100 * (i % 10)),
+     'rating': 800 + 100 * (i % 20) if i % 3 else None, 'tags': ['dp'] if i % 2 else ['math']}
+    for i in range(1, 201)
+]
+
+
+@asynccontextmanager
+async def seeded_session():
+    pool_cache.clear()
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await bulk_insert_problems(connection, PROBLEMS)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_random_problems_match_filters():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        problems = await service.get_random_by_tag_and_points_range('dp', 700, 1000, limit=10)
+
+        assert len(problems) == 10
+        assert len({p.id for p in problems}) == 10
+        assert all(p.contest_id % 2 == 1 and 700 <= p.points <= 1000 for p in problems)
+
+
+@pytest.mark.asyncio
+async def test_random_problems_return_whole_small_range():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        problems = await service.get_random_by_tag_and_points_range('math', 1300, 1300, limit=50)
+
+        assert sorted(p.contest_id for p in problems) == [i for i in range(1, 201) if i % 10 == 8]
+
+
+@pytest.mark.asyncio
+async def test_random_problems_by_rating_skip_unrated():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        problems = await service.get_random_by_tag_and_rating_range('dp', 1000, 1300, limit=50)
+
+        expected = [i for i in range(1, 201) if i % 2 and i % 3 and 1000 <= 800 + 100 * (i % 20) <= 1300]
+        assert sorted(p.contest_id for p in problems) == expected
+
+
+@pytest.mark.asyncio
+async def test_random_keys_are_distinct():
+    async with seeded_session() as session:
+        problems = await ProblemService(session).get_all()
+
+        assert len({p.random_key for p in problems}) == len(problems)
+
+
+@pytest.mark.asyncio
+async def test_create_attaches_existing_and_new_tags():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        await service.create(1000, 'A', 'New', 'PROGRAMMING', 500.0, 10, ['dp', 'games'], 1400)
+        problems = await service.get_random_by_tag_and_rating_range('games', 1400, 1400)
+
+        assert [(p.contest_id, p.index) for p in problems] == [(1000, 'A')]
+        assert len(await service.get_by_tag('dp')) == 101
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cached', [True, False])
+async def test_random_problems_skip_excluded_until_exhausted(cached, monkeypatch):
+    monkeypatch.setattr(pool_cache, 'enabled', cached)
+    async with seeded_session() as session:
+        service = ProblemService(session)
+        matching = await service.get_random_by_tag_and_rating_range('dp', 800, 1000, limit=100)
+        served = sum(1 << p.id for p in matching[:-2])
+
+        fresh = await service.get_random_by_tag_and_rating_range('dp', 800, 1000, limit=2, exclude=served)
+        topped_up = await service.get_random_by_tag_and_rating_range('dp', 800, 1000, limit=5, exclude=served)
+
+        assert {p.id for p in fresh} == {p.id for p in matching[-2:]}
+        assert len(topped_up) == 5
+        assert {p.id for p in matching[-2:]} <= {p.id for p in topped_up}
+
+
+@pytest.mark.asyncio
+async def test_rating_range_pool_is_cached():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+        hits = pool_cache.hits
+
+        first = await service.get_random_by_tag_and_rating_range('dp', 800, 1500, limit=5)
+        second = await service.get_random_by_tag_and_rating_range('dp', 800.0, 1500.0, limit=5)
+        expression = await service.get_random_by_tag_expression(('tag', 'dp'), 800, 1500, limit=5)
+
+        assert pool_cache.hits == hits + 1
+        assert len(first) == len(second) == len(expression) == 5
+        assert all(p.contest_id % 2 == 1 and 800 <= p.rating <= 1500 for p in first + second + expression)
+
+
+@pytest.mark.asyncio
+async def test_rating_range_without_cache_samples_in_database(monkeypatch):
+    monkeypatch.setattr(pool_cache, 'enabled', False)
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        problems = await service.get_random_by_tag_and_rating_range('dp', 800, 1500, limit=5)
+
+        assert len(problems) == 5
+        assert all(p.contest_id % 2 == 1 and 800 <= p.rating <= 1500 for p in problems)
+        assert pool_cache.stats()['entries'] == 0
+
+
+@pytest.mark.asyncio
+async def test_database_sampling_is_not_a_window_of_random_keys(monkeypatch):
+    monkeypatch.setattr(pool_cache, 'enabled', False)
+    async with seeded_session() as session:
+        service = ProblemService(session)
+        pool = await service.get_random_by_tag_and_rating_range('dp', 800, 1500, limit=100)
+        order = [p.id for p in sorted(pool, key=lambda p: p.random_key)]
+        # Группы из трёх соседних по random_key задач с учётом перехода через начало
+        windows = {frozenset(order[(i + j) % len(order)] for j in range(3)) for i in range(len(order))}
+
+        draws = [
+            frozenset(p.id for p in await service.get_random_by_tag_and_rating_range('dp', 800, 1500, limit=3))
+            for _ in range(20)
+        ]
+
+        assert all(len(draw) == 3 for draw in draws)
+        assert any(draw not in windows for draw in draws)
+
+
+
+@pytest.mark.asyncio
+async def test_search_by_name_matches_substring():
+    async with seeded_session() as session:
+        service = ProblemService(session)
+
+        problems = await service.search_by_name('p19', limit=5)
+
+        assert [p.name for p in problems] == ['P19', 'P190', 'P191', 'P192', 'P193']
+        assert await service.search_by_name('p_1') == []